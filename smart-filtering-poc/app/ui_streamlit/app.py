@@ -15,18 +15,30 @@ if str(SRC_DIR) not in sys.path:
     sys.path.append(str(SRC_DIR))
 
 from smart_filtering.config import load_config, resolve_path
+from smart_filtering.embedder.embed import get_embedder
+from smart_filtering.embedder.vectors import CV_EMBEDDINGS_FILE, attach_jd_embeddings, ingest_cv_embeddings
 from smart_filtering.assessor.grade import calculate_assessment_score
 from smart_filtering.assessor.questions import get_assessment_questions
 from smart_filtering.explainer.explain import generate_explanation
 from smart_filtering.normalizer.skills_taxonomy import get_canonical_skill
 from smart_filtering.generator.run_generation import create_cvs_as_docx
 from smart_filtering.generator.run_jd_generation import create_jds_as_docx, JD_ROLES
-from smart_filtering.parser.docx_parser import parse_docx_cv, parse_docx_jd
-from smart_filtering.ranker.score import calculate_score
+from smart_filtering.parser.archive import is_archive
+from smart_filtering.parser.loader import PARSE_CACHE_DIR, load_docx_dir, load_docx_source
+from smart_filtering.ranker.cascade import DEFAULT_EXPLAIN, DEFAULT_TOP_M, STAGE_LABELS, rank_cascade
+from smart_filtering.ranker.compiled import CompiledJD
+from smart_filtering.ranker.features import extract_features_batch
+from smart_filtering.ranker.skill_index import SKILL_INDEX_FILE, load_or_build_skill_index, must_have_candidates
+from smart_filtering.ranker.skill_matrix import SkillMatrix
+from smart_filtering.ranker.score import calculate_scores_batch, score_details
+from smart_filtering.ranker.topk import rank_top_k
 
 
 st.set_page_config(layout="wide", page_title="Smart Candidate Filtering & Assessment")
 
+# Every session shares one embedder: merge their concurrent encodes into batched calls (idempotent per rerun)
+get_embedder().start_micro_batching()
+
 st.markdown(
     """
     <style>
@@ -59,43 +71,65 @@ st.markdown(
 )
 
 
+def _processed_dir() -> Path:
+    return resolve_path(load_config().get("data", {}).get("processed_dir", "data/processed"), project_root=PROJECT_ROOT)
+
+
 @st.cache_data
 def load_data(jd_dir: str, cv_dir: str):
-    """Loads JDs and CVs from specified directories."""
-    jds = []
+    """Loads JDs and CVs from specified directories (`cv_dir` may also be a zip/tar archive of CVs)."""
+    processed_dir = _processed_dir()
+    # Only new or modified DOCX files are parsed again
+    parse_cache_dir = processed_dir / PARSE_CACHE_DIR
     if not os.path.exists(jd_dir) or not any(f.endswith(".docx") for f in os.listdir(jd_dir) if not f.startswith("~")):
         # Autogenera JDs si no existen (útil en despliegues cloud/limpios)
         os.makedirs(jd_dir, exist_ok=True)
         create_jds_as_docx(jd_dir, JD_ROLES)
 
-    for filename in os.listdir(jd_dir):
-        if filename.endswith(".docx") and not filename.startswith("~"):
-            file_path = os.path.join(jd_dir, filename)
-            jd_data = parse_docx_jd(file_path)
-            if jd_data and jd_data.get("id"):
-                jds.append(jd_data)
+    jd_result = load_docx_dir(jd_dir, kind="jd", cache_dir=parse_cache_dir)
+    # JD vectors are computed once here; the sidebar only edits years/weights
+    jds = [attach_jd_embeddings(jd_data) for jd_data in jd_result.records]
 
     if not jds:
         st.warning("No JDs found. Por favor ejecuta el script de generación de JD.")
 
-    cvs = []
-    if not os.path.exists(cv_dir) or not any(f.endswith(".docx") for f in os.listdir(cv_dir) if not f.startswith("~")):
+    if not is_archive(cv_dir) and (
+        not os.path.exists(cv_dir) or not any(f.endswith(".docx") for f in os.listdir(cv_dir) if not f.startswith("~"))
+    ):
         os.makedirs(cv_dir, exist_ok=True)
         create_cvs_as_docx(cv_dir, num_cvs=15)
 
-    for filename in os.listdir(cv_dir):
-        if filename.endswith(".docx") and not filename.startswith("~"):
-            file_path = os.path.join(cv_dir, filename)
-            cv_data = parse_docx_cv(file_path)
-            if cv_data and cv_data.get("id"):
-                cvs.append(cv_data)
+    # Archives are read member by member in memory, never extracted
+    cv_result = load_docx_source(cv_dir, kind="cv", cache_dir=parse_cache_dir)
+    cvs = cv_result.records
+    parse_errors = jd_result.errors + cv_result.errors
+    if parse_errors:
+        st.warning(
+            f"{len(parse_errors)} documento(s) no se pudieron leer: "
+            + "; ".join(f"{os.path.basename(path)} ({error})" for path, error in parse_errors[:5])
+        )
 
     if not cvs:
         st.warning("No CVs found. Por favor ejecuta el script de generación de CV.")
 
+    # Vectores de CV calculados una vez al ingerir (y persistidos en processed_dir)
+    ingest_cv_embeddings(cvs, cache_path=processed_dir / CV_EMBEDDINGS_FILE)
     return jds, cvs
 
 
+@st.cache_resource
+def load_skill_structures(jd_dir: str, cv_dir: str):
+    """
+    CV x skill bit-matrix and skill -> CVs inverted index (persisted) of the
+    corpus of load_data, once per corpus for every JD/slider rerun. Kept out of
+    load_data: st.cache_data pickles its result and the shared skill
+    vocabulary holds a lock.
+    """
+    _, cvs = load_data(jd_dir, cv_dir)
+    skill_index = load_or_build_skill_index(cvs, _processed_dir() / SKILL_INDEX_FILE)
+    return SkillMatrix.from_cvs(cvs), skill_index
+
+
 def display_cv_details(cv_data: Dict[str, Any]):
     """Displays CV details in a formatted way."""
     loc = cv_data.get("location", {})
@@ -160,12 +194,15 @@ CONFIG = load_config()
 data_cfg = CONFIG.get("data", {})
 ranking_cfg = CONFIG.get("ranking", {})
 
-cv_input_directory = resolve_path(data_cfg.get("cvs_dir", "data/raw/cvs"), project_root=PROJECT_ROOT)
+cv_input_directory = resolve_path(
+    data_cfg.get("cvs_archive") or data_cfg.get("cvs_dir", "data/raw/cvs"), project_root=PROJECT_ROOT
+)
 jd_input_directory = resolve_path(data_cfg.get("jds_dir", "data/raw/jds"), project_root=PROJECT_ROOT)
 
 default_skill_weight_strength = float(ranking_cfg.get("default_skill_weight_strength", 0.25))
 
 all_jds, all_cvs = load_data(str(jd_input_directory), str(cv_input_directory))
+cv_skill_matrix, cv_skill_index = load_skill_structures(str(jd_input_directory), str(cv_input_directory))
 
 st.markdown(
     """
@@ -207,6 +244,11 @@ with st.sidebar:
     )
 
     show_only_pass = st.toggle("Mostrar solo candidatos que pasan KO", value=False)
+    top_k = st.number_input("Mostrar solo los K mejores (0 = todos)", min_value=0, value=0, step=10)
+    use_cascade = st.toggle("Ranking en cascada (embeddings solo para los M mejores por reglas)", value=False)
+    cascade_m = 0
+    if use_cascade:
+        cascade_m = st.number_input("M: candidatos de la etapa semántica (0 = todos)", min_value=0, value=int(DEFAULT_TOP_M or 0), step=50)
 
     st.divider()
     st.subheader("Ponderar skills/experiencia (opcional)")
@@ -253,28 +295,73 @@ with st.sidebar:
 selected_jd_eval["weights"] = dict(selected_jd_eval.get("weights", {}))
 selected_jd_eval["weights"]["experience"] = selected_jd_eval["weights"].get("experience", 0.0) * exp_weight_boost
 
-# Process CVs
-scored_cvs: List[Dict[str, Any]] = []
-for cv in all_cvs:
-    score_result = calculate_score(
-        cv,
+# JD-side work (canonical skills, city coordinates, weights) once per rerun, i.e. per slider change
+compiled_jd = CompiledJD(selected_jd_eval, skill_weights=user_skill_weights, skill_weight_strength=skill_alignment_weight)
+
+# Hiding KOs: only CVs with every must-have (posting-list intersection) are scored at all
+if show_only_pass:
+    candidate_docs = must_have_candidates(cv_skill_index, compiled_jd)
+    candidate_cvs = [all_cvs[doc] for doc in candidate_docs.tolist()]
+    candidate_skill_matrix = cv_skill_matrix.take(candidate_docs)
+else:
+    candidate_cvs, candidate_skill_matrix = all_cvs, cv_skill_matrix
+
+cascade_explanations = None
+if use_cascade:
+    # Rule score for every candidate, embeddings for the top-M, explanations for the final top-K when
+    # ranking.cascade.explain is on (otherwise only the selected candidate's is generated, below)
+    cascade = rank_cascade(
+        candidate_cvs,
+        selected_jd_eval,
+        top_m=int(cascade_m),
+        top_k=int(top_k),
+        explain=DEFAULT_EXPLAIN,
+        compiled=compiled_jd,
+        skill_matrix=candidate_skill_matrix,
+        exclude_ko=show_only_pass,
+    )
+    candidate_cvs = [candidate_cvs[doc] for doc in cascade.docs.tolist()]
+    batch_features, batch_scores, cascade_explanations = cascade.features, cascade.batch, cascade.explanations
+    st.caption(
+        "Cascada: "
+        + " → ".join(f"{STAGE_LABELS[stage]} {cascade.sizes[stage]} CVs en {seconds * 1000:.1f} ms" for stage, seconds in cascade.timings.items())
+    )
+elif top_k:
+    # Exact top-K: CVs whose score bound cannot reach the K-th best are never scored
+    top = rank_top_k(
+        candidate_cvs,
         selected_jd_eval,
-        skill_weights=user_skill_weights,
-        skill_weight_strength=skill_alignment_weight,
+        int(top_k),
+        compiled=compiled_jd,
+        skill_matrix=candidate_skill_matrix,
+        exclude_ko=show_only_pass,
     )
-    scored_cvs.append(
-        {
-            "cv_id": cv["id"],
-            "name": cv["name"],
-            "score": score_result["score"],
-            "ko_reason": score_result.get("ko_reason") or "OK",
-            "experience_years_total": cv.get("experience_years_total", 0),
-            "location_city": cv.get("location", {}).get("city", ""),
-            "distance_km": score_result["features"].get("distance_to_jd_city_km"),
-            "score_details": score_result,
-            "original_cv": cv,
-        }
+    candidate_cvs = [candidate_cvs[doc] for doc in top.docs.tolist()]
+    batch_features, batch_scores = top.features, top.batch
+else:
+    # Process CVs (columnar scorer: one pass per feature column, not per CV)
+    batch_features = extract_features_batch(
+        candidate_cvs, selected_jd_eval, compiled=compiled_jd, skill_matrix=candidate_skill_matrix
+    )
+    batch_scores = calculate_scores_batch(
+        candidate_cvs, selected_jd_eval, features=batch_features, compiled=compiled_jd, skill_matrix=candidate_skill_matrix
+    )
+scored_cvs: List[Dict[str, Any]] = [
+    {
+        "cv_id": cv["id"],
+        "name": cv["name"],
+        "score": score,
+        "ko_reason": ko_reason or "OK",
+        "experience_years_total": cv.get("experience_years_total", 0),
+        "location_city": cv.get("location", {}).get("city", ""),
+        "distance_km": features.get("distance_to_jd_city_km"),
+        "row": row,
+        "original_cv": cv,
+    }
+    for row, (cv, features, score, ko_reason) in enumerate(
+        zip(candidate_cvs, batch_features, batch_scores["score"].tolist(), batch_scores["ko_reason"].tolist())
     )
+]
 
 if show_only_pass:
     filtered_cvs = [cv for cv in scored_cvs if cv["ko_reason"] == "OK"]
@@ -313,6 +400,8 @@ with col1:
         )
         selected_candidate_data = ranked_cvs[selected_candidate_index]
         selected_cv = selected_candidate_data["original_cv"]
+        row = selected_candidate_data["row"]
+        selected_score_details = score_details(batch_scores, row, batch_features[row])
 
         st.markdown("---")
         st.subheader(f"{selected_candidate_data['name']} · Score {selected_candidate_data['score']*100:.1f}")
@@ -322,10 +411,13 @@ with col1:
 with col2:
     if ranked_cvs:
         st.subheader("Explicación del ranking")
-        explanation = generate_explanation(selected_cv, selected_jd_eval, selected_candidate_data["score_details"])
+        if cascade_explanations is not None:
+            explanation = cascade_explanations[row]
+        else:
+            explanation = generate_explanation(selected_cv, selected_jd_eval, selected_score_details)
         st.markdown(explanation)
         st.caption("Componentes de score")
-        render_score_components(selected_candidate_data["score_details"])
+        render_score_components(selected_score_details)
 
         st.markdown("---")
         st.subheader("Mini-assessment simulado")
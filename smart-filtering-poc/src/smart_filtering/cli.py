@@ -3,14 +3,33 @@ from __future__ import annotations
 import argparse
 import csv
 import random
+import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List
 
 from smart_filtering.config import load_config, resolve_path
+from smart_filtering.embedder.vectors import (
+    CV_EMBEDDINGS_FILE,
+    DeferredCVIngest,
+    attach_jd_embeddings,
+    ingest_cv_embeddings,
+)
 from smart_filtering.generator.run_generation import create_cvs_as_docx
 from smart_filtering.generator.run_jd_generation import create_jds_as_docx, JD_ROLES
-from smart_filtering.parser.docx_parser import parse_docx_cv, parse_docx_jd
-from smart_filtering.ranker.score import calculate_score
+from smart_filtering.parser.loader import PARSE_CACHE_DIR, LoadResult, load_docx_dir, load_docx_source
+from smart_filtering.ranker.ann import ANN_INDEX_FILE, IVFIndex, load_or_build_cv_index, retrieve_candidates
+from smart_filtering.ranker.cascade import STAGE_LABELS, CascadeResult, rank_cascade
+from smart_filtering.ranker.compiled import CompiledJD
+from smart_filtering.ranker.features import extract_features_batch
+from smart_filtering.ranker.score import calculate_scores_batch
+from smart_filtering.ranker.skill_index import (
+    SKILL_INDEX_FILE,
+    SkillIndex,
+    load_or_build_skill_index,
+    must_have_candidates,
+)
+from smart_filtering.ranker.skill_matrix import SkillMatrix
+from smart_filtering.ranker.topk import rank_top_k
 
 
 def _build_parser() -> argparse.ArgumentParser:
@@ -63,6 +82,12 @@ def _build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Directorio de CVs DOCX (default: config.data.cvs_dir)",
     )
+    rank_parser.add_argument(
+        "--cvs-archive",
+        type=str,
+        default=None,
+        help="Zip o tar(.gz) con CVs DOCX, leído sin extraer a disco; sustituye a --cvs-dir (default: config.data.cvs_archive)",
+    )
     rank_parser.add_argument(
         "--jds-dir",
         type=str,
@@ -81,6 +106,46 @@ def _build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Peso adicional de skill alignment (default: config.ranking.default_skill_weight_strength)",
     )
+    rank_parser.add_argument(
+        "--ann-top-m",
+        type=int,
+        default=None,
+        help="Solo puntúa los M CVs semánticamente más cercanos al JD (índice ANN; por defecto puntúa todos)",
+    )
+    rank_parser.add_argument(
+        "--ann-n-probe",
+        type=int,
+        default=None,
+        help="Listas del índice ANN que se exploran por consulta: más recall, más lento (default: config.ranking.ann.n_probe)",
+    )
+    rank_parser.add_argument(
+        "--only-pass",
+        action="store_true",
+        help="Exporta solo los CVs que pasan los KO; con el índice invertido de skills solo se puntúan los que tienen todas las must-have",
+    )
+    rank_parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="Exporta solo los K mejores (mismo resultado que ordenar todos; descarta sin puntuar los CVs cuya cota de score no alcanza al K-ésimo)",
+    )
+    rank_parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Ranking en cascada: score por reglas para todos, embeddings solo para los M mejores y explicaciones para los K finales (default: config.ranking.cascade)",
+    )
+    rank_parser.add_argument(
+        "--cascade-m",
+        type=int,
+        default=None,
+        help="CVs que pasan a la etapa semántica de la cascada (default: config.ranking.cascade.top_m; 0 = todos)",
+    )
+    rank_parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Procesos para parsear los DOCX (default: config.parser.workers; 0 = uno por CPU, 1 = sin paralelismo)",
+    )
 
     return parser
 
@@ -95,29 +160,39 @@ def _resolve_output_dir(out_arg: str | None, config_key: str, project_root: Path
     return resolve_path(target, project_root=project_root)
 
 
-def _load_jds(jd_dir: Path) -> List[Dict[str, Any]]:
-    jds: List[Dict[str, Any]] = []
-    for path in sorted(jd_dir.glob("*.docx")):
-        if path.name.startswith("~"):  # skip temp
-            continue
-        jd = parse_docx_jd(str(path))
-        if jd and jd.get("id"):
-            jds.append(jd)
-    return jds
+def _report_errors(result: LoadResult, label: str) -> None:
+    for path, error in result.errors:
+        print(f"{label} omitido {path}: {error}", file=sys.stderr)
+
 
+def _load_jds(jd_dir: Path, workers: int | None = None, cache_dir: Path | None = None) -> List[Dict[str, Any]]:
+    result = load_docx_dir(jd_dir, kind="jd", workers=workers, cache_dir=cache_dir)
+    _report_errors(result, "JD")
+    return [attach_jd_embeddings(jd) for jd in result.records]
 
-def _load_cvs(cv_dir: Path) -> List[Dict[str, Any]]:
-    cvs: List[Dict[str, Any]] = []
-    for path in sorted(cv_dir.glob("*.docx")):
-        if path.name.startswith("~"):
-            continue
-        cv = parse_docx_cv(str(path))
-        if cv and cv.get("id"):
-            cvs.append(cv)
-    return cvs
 
+def _load_cvs(cv_source: Path, workers: int | None = None, cache_dir: Path | None = None) -> List[Dict[str, Any]]:
+    # A folder or a zip/tar archive of DOCX files
+    result = load_docx_source(cv_source, kind="cv", workers=workers, cache_dir=cache_dir)
+    _report_errors(result, "CV")
+    return result.records
 
-def _rank(jds: List[Dict[str, Any]], cvs: List[Dict[str, Any]], jd_role: str | None, skill_weight_strength: float) -> List[Dict[str, Any]]:
+
+def _rank(
+    jds: List[Dict[str, Any]],
+    cvs: List[Dict[str, Any]],
+    jd_role: str | None,
+    skill_weight_strength: float,
+    ann_top_m: int | None = None,
+    ann_index: IVFIndex | None = None,
+    ann_n_probe: int | None = None,
+    only_pass: bool = False,
+    skill_index: SkillIndex | None = None,
+    top_k: int | None = None,
+    cascade: bool = False,
+    cascade_m: int | None = None,
+    prepare: Callable[[List[Dict[str, Any]]], Any] | None = None,
+) -> List[Dict[str, Any]]:
     if not jds:
         raise ValueError("No se encontraron JDs para rankear.")
     if not cvs:
@@ -132,24 +207,77 @@ def _rank(jds: List[Dict[str, Any]], cvs: List[Dict[str, Any]], jd_role: str | N
     else:
         jd = jds[0]
 
-    scored = []
-    for cv in cvs:
-        score_result = calculate_score(cv, jd, skill_weights=None, skill_weight_strength=skill_weight_strength)
-        scored.append(
-            {
-                "cv_id": cv["id"],
-                "name": cv["name"],
-                "score": score_result["score"],
-                "reason": score_result.get("reason", ""),
-                "experience_years_total": cv.get("experience_years_total", 0),
-                "location_city": cv.get("location", {}).get("city", ""),
-            }
+    compiled = CompiledJD(jd, skill_weight_strength=skill_weight_strength)
+    if only_pass:
+        # Exact must-have filter first, so the ANN top-M is taken among CVs that can pass
+        index = skill_index if skill_index is not None else SkillIndex.build(cvs)
+        cvs = [cvs[doc] for doc in must_have_candidates(index, compiled).tolist()]
+
+    if ann_top_m:
+        # The index covers the whole pool; after the must-have filter the (smaller) survivors are searched exactly
+        index = ann_index if not only_pass else None
+        cvs = retrieve_candidates(cvs, jd, ann_top_m, index=index, n_probe=ann_n_probe)
+
+    skill_matrix = SkillMatrix.from_cvs(cvs)
+    explanations = None
+    if cascade:
+        result = rank_cascade(
+            cvs,
+            jd,
+            top_m=cascade_m,
+            top_k=top_k,
+            compiled=compiled,
+            skill_matrix=skill_matrix,
+            exclude_ko=only_pass,
+            prepare=prepare,
+        )
+        _print_cascade_timings(result)
+        cvs, scores, explanations = [cvs[doc] for doc in result.docs.tolist()], result.batch, result.explanations
+    elif top_k:
+        # Already sorted, and only the CVs that could make the top-K were scored
+        top = rank_top_k(
+            cvs, jd, top_k, compiled=compiled, skill_matrix=skill_matrix, exclude_ko=only_pass, prepare=prepare
         )
+        cvs, scores = [cvs[doc] for doc in top.docs.tolist()], top.batch
+    else:
+        batch_features = extract_features_batch(cvs, jd, compiled=compiled, skill_matrix=skill_matrix)
+        scores = calculate_scores_batch(cvs, jd, features=batch_features, compiled=compiled, skill_matrix=skill_matrix)
+    scored = [
+        {
+            "cv_id": cv["id"],
+            "name": cv["name"],
+            "score": score,
+            "reason": reason,
+            "experience_years_total": cv.get("experience_years_total", 0),
+            "location_city": cv.get("location", {}).get("city", ""),
+        }
+        for cv, score, reason, ko in zip(cvs, scores["score"].tolist(), scores["reason"].tolist(), scores["ko"].tolist())
+        if not (only_pass and ko)
+    ]
+    if explanations is not None:
+        for row, explanation in zip(scored, explanations):
+            row["explanation"] = explanation
 
     scored.sort(key=lambda x: x["score"], reverse=True)
     return scored
 
 
+def _print_cascade_timings(result: CascadeResult) -> None:
+    stages = [
+        f"{STAGE_LABELS[stage]} {result.sizes[stage]} CVs en {seconds * 1000:.1f} ms" for stage, seconds in result.timings.items()
+    ]
+    print(f"Cascada: {' -> '.join(stages)}")
+
+
+def _print_progress(label: str):
+    """Progress callback for long steps: rewrites one console line, newline when complete."""
+
+    def report(done: int, total: int) -> None:
+        print(f"\r{label}: {done}/{total}", end="\n" if done >= total else "", flush=True)
+
+    return report
+
+
 def _write_csv(rows: List[Dict[str, Any]], out_path: Path) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     if not rows:
@@ -190,6 +318,10 @@ def main(argv: list[str] | None = None) -> int:
         data_cfg = cfg.get("data", {})
         ranking_cfg = cfg.get("ranking", {})
         cvs_dir = resolve_path(args.cvs_dir or data_cfg.get("cvs_dir", "data/raw/cvs"), project_root=project_root)
+        cvs_archive = args.cvs_archive or (None if args.cvs_dir else data_cfg.get("cvs_archive"))
+        cvs_source = resolve_path(cvs_archive, project_root=project_root) if cvs_archive else cvs_dir
+        if cvs_archive and not cvs_source.is_file():
+            parser.error(f"No existe el archivo de CVs {cvs_source}")
         jds_dir = resolve_path(args.jds_dir or data_cfg.get("jds_dir", "data/raw/jds"), project_root=project_root)
 
         outputs_dir = data_cfg.get("outputs_dir", "data/outputs")
@@ -200,9 +332,40 @@ def main(argv: list[str] | None = None) -> int:
         if skill_weight_strength is None:
             skill_weight_strength = float(ranking_cfg.get("default_skill_weight_strength", 0.25))
 
-        jds = _load_jds(jds_dir)
-        cvs = _load_cvs(cvs_dir)
-        rows = _rank(jds, cvs, args.jd_role, skill_weight_strength)
+        processed_dir = resolve_path(data_cfg.get("processed_dir", "data/processed"), project_root=project_root)
+
+        parse_cache_dir = processed_dir / PARSE_CACHE_DIR
+        jds = _load_jds(jds_dir, workers=args.parse_workers, cache_dir=parse_cache_dir)
+        cvs = _load_cvs(cvs_source, workers=args.parse_workers, cache_dir=parse_cache_dir)
+        cv_embeddings_path = processed_dir / CV_EMBEDDINGS_FILE
+        embeddings_progress = _print_progress("Embeddings de CVs")
+        # --top-k and --cascade only need vectors for the CVs they score; the ANN index needs the whole pool
+        deferred = None
+        if (args.top_k or args.cascade) and not args.ann_top_m:
+            deferred = DeferredCVIngest(cvs, cache_path=cv_embeddings_path, progress=embeddings_progress)
+        else:
+            cvs = ingest_cv_embeddings(cvs, cache_path=cv_embeddings_path, progress=embeddings_progress)
+        skill_index = load_or_build_skill_index(cvs, processed_dir / SKILL_INDEX_FILE) if args.only_pass else None
+        # The index covers the whole pool, so it is not needed when --only-pass narrows it first
+        use_ann_index = args.ann_top_m and not args.only_pass
+        ann_index = load_or_build_cv_index(cvs, processed_dir / ANN_INDEX_FILE) if use_ann_index else None
+        rows = _rank(
+            jds,
+            cvs,
+            args.jd_role,
+            skill_weight_strength,
+            ann_top_m=args.ann_top_m,
+            ann_index=ann_index,
+            ann_n_probe=args.ann_n_probe,
+            only_pass=args.only_pass,
+            skill_index=skill_index,
+            top_k=args.top_k,
+            cascade=args.cascade,
+            cascade_m=args.cascade_m,
+            prepare=deferred,
+        )
+        if deferred is not None:
+            deferred.save()
         _write_csv(rows, out_path)
         print(f"Shortlist exportada a {out_path}")
         return 0
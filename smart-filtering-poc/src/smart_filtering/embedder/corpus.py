@@ -0,0 +1,141 @@
+# src/embedder/corpus.py
+
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+ProgressCallback = Callable[[int, int], None]
+
+# Per-worker state, set once by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(model_name: str, model: Any, torch_threads: int) -> None:
+    """Runs once in each worker: build (or receive) the encoder and cap its CPU threads."""
+    if model is None:
+        from smart_filtering.embedder.embed import _load_sentence_transformer
+
+        model = _load_sentence_transformer(model_name)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(torch_threads)
+    _WORKER["model"] = model
+    _WORKER["outputs"] = {}
+
+
+def _output(path: str, shape: Tuple[int, int]) -> np.memmap:
+    outputs = _WORKER["outputs"]
+    if path not in outputs:
+        outputs[path] = np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+    return outputs[path]
+
+
+def embedding_dim(model: Any) -> Optional[int]:
+    """Output dimension declared by an encoder (SentenceTransformer or HashingEncoder-like), None if unknown."""
+    if hasattr(model, "get_sentence_embedding_dimension"):
+        dim = model.get_sentence_embedding_dimension()
+        return int(dim) if dim else None
+    dim = getattr(model, "dim", None)
+    return int(dim) if dim else None
+
+
+def _worker_dim() -> int:
+    """Dimension of the worker's encoder; only this int goes back to the parent."""
+    model = _WORKER["model"]
+    dim = embedding_dim(model)
+    # Encoders that do not declare it: one text, measured here, never sent back
+    return dim if dim is not None else int(_encode_chunk([" "], 1).shape[1])
+
+
+def _encode_chunk(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(
+        _WORKER["model"].encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32
+    )
+
+
+def _write_chunk(start: int, texts: List[str], batch_size: int, path: str, shape: Tuple[int, int]) -> int:
+    """Encode a chunk and write it into rows [start, start + len(texts)) of the shared output."""
+    out = _output(path, shape)
+    out[start:start + len(texts)] = _encode_chunk(texts, batch_size)
+    out.flush()
+    return len(texts)
+
+
+def encode_corpus(
+    texts: List[str],
+    model_name: str,
+    model: Any = None,
+    n_workers: int = 2,
+    chunk_size: int = 256,
+    batch_size: int = 64,
+    out_path: Optional[Union[str, Path]] = None,
+    progress: Optional[ProgressCallback] = None,
+    start_method: str = "spawn",
+) -> np.ndarray:
+    """
+    Encode `texts` with `n_workers` processes, each with its own encoder
+    (loaded from `model_name`, or a pickled copy of `model` when given).
+
+    The output dimension comes from the encoder (`model`, or asked of a
+    worker's). Chunks of `chunk_size` texts are streamed to the pool and every
+    worker writes its rows into one float32 memmap at the chunk's offset, so
+    only (start, count) travels back and row i always belongs to texts[i]
+    whatever the completion order. `progress(done, total)` is called in this process
+    after each chunk. Returns the memmap at `out_path` when given, otherwise
+    an in-memory copy (the temporary file is removed).
+    """
+    total = len(texts)
+    if total == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    starts = list(range(0, total, chunk_size))
+    n_workers = max(1, min(n_workers, len(starts)))
+    torch_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    context = multiprocessing.get_context(start_method)
+
+    tmp_path = None
+    if out_path is None:
+        fd, tmp_path = tempfile.mkstemp(suffix=".f32", prefix="corpus_")
+        os.close(fd)
+    path = str(out_path if out_path is not None else tmp_path)
+
+    done = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, model, torch_threads),
+        ) as pool:
+            dim = embedding_dim(model) if model is not None else None
+            if dim is None:
+                dim = pool.submit(_worker_dim).result()
+            shape = (total, dim)
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            np.memmap(path, dtype=np.float32, mode="w+", shape=shape).flush()
+
+            # Keep at most 2 chunks per worker in flight so huge corpora are not queued all at once
+            pending = set()
+            for start in starts:
+                pending.add(pool.submit(_write_chunk, start, texts[start:start + chunk_size], batch_size, path, shape))
+                if len(pending) >= 2 * n_workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done += future.result()
+                        if progress is not None:
+                            progress(done, total)
+            for future in pending:
+                done += future.result()
+                if progress is not None:
+                    progress(done, total)
+
+        if out_path is not None:
+            return np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+        return np.array(np.memmap(path, dtype=np.float32, mode="r", shape=shape))
+    finally:
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
@@ -0,0 +1,108 @@
+# src/embedder/dispatcher.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+EmbedFn = Callable[[List[str], Optional[int]], np.ndarray]
+
+
+class _Request:
+    __slots__ = ("texts", "batch_size", "future")
+
+    def __init__(self, texts: List[str], batch_size: Optional[int]):
+        self.texts = texts
+        self.batch_size = batch_size
+        self.future: "Future[np.ndarray]" = Future()
+
+
+class MicroBatchDispatcher:
+    """
+    Coalesces embedding requests from concurrent threads (e.g. several
+    Streamlit sessions sharing get_embedder()) into one encode call.
+
+    A single background thread owns the model: it takes the first pending
+    request, keeps collecting for `window_ms` (or until `max_batch_texts`
+    texts are queued), runs `embed_fn` once on all their texts and hands each
+    caller its own rows through a Future. Errors are propagated to every
+    caller of the failed batch.
+    """
+
+    def __init__(self, embed_fn: EmbedFn, window_ms: float = 5.0, max_batch_texts: int = 256):
+        self.embed_fn = embed_fn
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch_texts = max(1, int(max_batch_texts))
+        self.stats: Dict[str, int] = {"requests": 0, "batches": 0, "texts": 0}
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embedder-micro-batch", daemon=True)
+        self._thread.start()
+
+    def in_dispatcher_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, texts: List[str], batch_size: Optional[int] = None) -> "Future[np.ndarray]":
+        """Queue `texts`; the Future resolves to their (len(texts), D) rows."""
+        if self._closed:
+            raise RuntimeError("MicroBatchDispatcher is closed")
+        request = _Request(list(texts), batch_size)
+        self._queue.put(request)
+        return request.future
+
+    def embed(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Blocking submit: waits for the batch this request ends up in."""
+        return self.submit(texts, batch_size).result()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Finish the queued requests and stop the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        n_texts = len(first.texts)
+        deadline = time.monotonic() + self.window_s
+        while n_texts < self.max_batch_texts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # let _run see the stop signal after this batch
+                break
+            batch.append(request)
+            n_texts += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            texts = [text for request in batch for text in request.texts]
+            sizes = [request.batch_size for request in batch if request.batch_size]
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            try:
+                vectors = self.embed_fn(texts, max(sizes) if sizes else None)
+            except Exception as exc:  # surfaced to every waiting caller
+                for request in batch:
+                    request.future.set_exception(exc)
+                continue
+
+            start = 0
+            for request in batch:
+                request.future.set_result(vectors[start:start + len(request.texts)])
+                start += len(request.texts)
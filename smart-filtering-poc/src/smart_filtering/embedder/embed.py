@@ -2,42 +2,266 @@
 
 import os
 from functools import lru_cache
-from typing import List, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-from smart_filtering.config import load_config
+from smart_filtering.config import load_config, resolve_path
+from smart_filtering.embedder.cache import LRUEmbeddingCache
+from smart_filtering.embedder.corpus import ProgressCallback, encode_corpus
+from smart_filtering.embedder.dispatcher import MicroBatchDispatcher
+from smart_filtering.embedder.hashing import HashingEncoder
+from smart_filtering.embedder.planner import EncodePlan
+from smart_filtering.embedder.store import EmbeddingStore
 
 CONFIG = load_config()
 DEFAULT_MODEL_NAME = CONFIG.get("models", {}).get("embedding", "paraphrase-multilingual-MiniLM-L12-v2")
 EMBEDDER_MODE = os.getenv("SMART_FILTERING_EMBEDDER_MODE", "").lower()  # "offline" forces dummy model
+# "sentence-transformers" (default) | "hashing"; SMART_FILTERING_EMBEDDER_MODE=hashing overrides it
+EMBEDDER_BACKEND = "hashing" if EMBEDDER_MODE == "hashing" else CONFIG.get("embedder", {}).get(
+    "backend", "sentence-transformers"
+)
+# Texts per encoder call when the caller gives no batch_size (each call is one length bucket)
+ENCODE_BATCH_SIZE = int(CONFIG.get("embedder", {}).get("encode_batch_size", 64))
+# Multi-process corpus encoding (Embedder.embed_corpus); like parser.workers: 0 = one per CPU, 1 = in-process
+CORPUS_CFG = CONFIG.get("embedder", {}).get("corpus", {})
+
+
+def resolve_corpus_workers(workers: int) -> int:
+    """embedder.corpus.workers semantics: 0 = one process per CPU, otherwise the given count."""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+CORPUS_WORKERS = resolve_corpus_workers(int(CORPUS_CFG.get("workers", 1)))
+CORPUS_CHUNK_SIZE = int(CORPUS_CFG.get("chunk_size", 512))
+# Coalesce concurrent embed_text calls (multi-user UI) into one encode per window
+MICRO_BATCHING_CFG = CONFIG.get("embedder", {}).get("micro_batching", {})
+
+
+def _load_sentence_transformer(model_name: str) -> Any:
+    """Import sentence_transformers (and torch with it) only when a model is really needed."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
 
 
 class Embedder:
-    """Wrapper around SentenceTransformer to keep the model cached."""
+    """
+    Wrapper around SentenceTransformer to keep the model cached.
+    Each request is first deduplicated (EncodePlan); lookups then go memory
+    cache -> persistent `store` -> model, so only texts that were never seen
+    before reach the model, in length-sorted batches. The model itself is
+    loaded on the first encode, so creating an Embedder is cheap.
+    """
 
-    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        store: Optional[EmbeddingStore] = None,
+        model: Any = None,
+        memory_cache: Optional[LRUEmbeddingCache] = None,
+    ):
         self.model_name = model_name
-        if EMBEDDER_MODE == "offline":
-            # Dummy model that returns zero vectors, useful when offline
-            self.model = None
-        else:
-            self.model = SentenceTransformer(model_name)
-
-    def embed_text(self, texts: Union[str, List[str]]) -> np.ndarray:
-        """Generate embeddings for a string or list of strings."""
+        self.store = store
+        self.memory_cache = memory_cache
+        self.stats = {"requested": 0, "unique": 0, "encoded": 0, "store_hits": 0}
+        # Pre-built encoder (anything with a SentenceTransformer-like `encode`)
+        self._model = model
+        self._model_injected = model is not None
+        self._dispatcher: Optional[MicroBatchDispatcher] = None
+        # Offline: dummy model that returns zero vectors, useful when offline
+        self.offline = model is None and EMBEDDER_MODE == "offline"
+
+    @property
+    def model(self) -> Any:
+        """The underlying encoder, loaded on first access (None when offline)."""
+        if self._model is None and not self.offline:
+            self._model = _load_sentence_transformer(self.model_name)
+        return self._model
+
+    def _encode(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Encode already-unique texts, one model call per length bucket of `batch_size` texts."""
+        self.stats["encoded"] += len(texts)
+        plan = EncodePlan(texts, batch_size or ENCODE_BATCH_SIZE)
+        return plan.run(lambda batch: self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True))
+
+    def start_micro_batching(
+        self,
+        window_ms: float = MICRO_BATCHING_CFG.get("window_ms", 5.0),
+        max_batch_texts: int = MICRO_BATCHING_CFG.get("max_batch_texts", 256),
+    ) -> MicroBatchDispatcher:
+        """
+        Route embed_text calls from every thread through one MicroBatchDispatcher,
+        which owns the model and merges requests arriving within `window_ms`.
+        Idempotent, so it can be called on every Streamlit rerun.
+        """
+        if self._dispatcher is None:
+            self._dispatcher = MicroBatchDispatcher(self._embed_now, window_ms, max_batch_texts)
+        return self._dispatcher
+
+    def stop_micro_batching(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.close()
+            self._dispatcher = None
+
+    def embed_text(self, texts: Union[str, List[str]], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Generate embeddings for a string or list of strings.
+        Repeated texts are encoded once and scattered back to every position;
+        `batch_size` caps the texts per model call. With micro-batching on, the
+        call is queued and merged with concurrent ones.
+        """
         if isinstance(texts, str):
             texts = [texts]
-        if self.model is None:
+        if self.offline:
             return np.zeros((len(texts), 5))
-        return self.model.encode(texts, convert_to_numpy=True)
+        dispatcher = self._dispatcher
+        if dispatcher is not None and not dispatcher.in_dispatcher_thread():
+            return dispatcher.embed(texts, batch_size)
+        return self._embed_now(texts, batch_size)
+
+    def _embed_now(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        plan = EncodePlan(texts, batch_size or ENCODE_BATCH_SIZE)
+        self.stats["requested"] += plan.n_requested
+        self.stats["unique"] += plan.n_unique
+        return plan.scatter(self._lookup_or_encode(plan.unique_texts, batch_size))
+
+    def embed_corpus(
+        self,
+        texts: List[str],
+        n_workers: Optional[int] = None,
+        chunk_size: int = CORPUS_CHUNK_SIZE,
+        batch_size: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> np.ndarray:
+        """
+        embed_text for a whole corpus: same dedup and cache tiers, but the texts
+        that still need the model are encoded by `n_workers` processes (each
+        with its own model) writing into a shared memmap. Rows keep the order
+        of `texts`. `progress(done, total)` reports encoded texts; with
+        n_workers == 1 (embedder.corpus.workers; 0 = one per CPU) it falls back
+        to embed_text.
+        """
+        n_workers = CORPUS_WORKERS if n_workers is None else resolve_corpus_workers(n_workers)
+        if self.offline or n_workers <= 1:
+            vectors = self.embed_text(texts, batch_size=batch_size)
+            if progress is not None:
+                progress(len(texts), len(texts))
+            return vectors
+
+        def encode(missing: List[str], batch_size: Optional[int]) -> np.ndarray:
+            self.stats["encoded"] += len(missing)
+            return encode_corpus(
+                missing,
+                self.model_name,
+                # Workers load their own copy by name; injected encoders (tests, hashing) are pickled
+                model=self._model if self._model_injected else None,
+                n_workers=n_workers,
+                chunk_size=chunk_size,
+                batch_size=batch_size or ENCODE_BATCH_SIZE,
+                progress=progress,
+            )
+
+        plan = EncodePlan(texts, batch_size or ENCODE_BATCH_SIZE)
+        self.stats["requested"] += plan.n_requested
+        self.stats["unique"] += plan.n_unique
+        return plan.scatter(self._lookup_or_encode(plan.unique_texts, batch_size, encode=encode))
+
+    def _lookup_or_encode(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        encode: Optional[Callable[[List[str], Optional[int]], np.ndarray]] = None,
+    ) -> np.ndarray:
+        """One row per (unique) text from the memory cache, the store or `encode` (the model by default)."""
+        encode = encode or self._encode
+        if (self.store is None and self.memory_cache is None) or not texts:
+            return encode(texts, batch_size)
+
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        if self.memory_cache is not None:
+            vectors = [self.memory_cache.get(text) for text in texts]
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+
+        if missing and self.store is not None:
+            stored = self.store.get_many([texts[i] for i in missing])
+            for i, vec in zip(missing, stored):
+                if vec is not None:
+                    vectors[i] = vec
+                    self.stats["store_hits"] += 1
+                    if self.memory_cache is not None:
+                        self.memory_cache.put(texts[i], vec)
+            missing = [i for i in missing if vectors[i] is None]
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = encode(missing_texts, batch_size)
+            if self.store is not None:
+                self.store.add(missing_texts, encoded)
+            for row, i in enumerate(missing):
+                vectors[i] = encoded[row]
+                if self.memory_cache is not None:
+                    self.memory_cache.put(texts[i], encoded[row])
+        return np.vstack(vectors).astype(np.float32, copy=False)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Counters for each tier: request dedup (requested/unique texts and the
+        resulting dedup_ratio), memory hits/misses/evictions, store hits and
+        model encodes.
+        """
+        stats: Dict[str, Any] = dict(self.stats)
+        requested = self.stats["requested"]
+        stats["dedup_ratio"] = 1.0 - self.stats["unique"] / requested if requested else 0.0
+        stats["memory"] = self.memory_cache.stats() if self.memory_cache is not None else None
+        stats["store_size"] = len(self.store) if self.store is not None else None
+        stats["micro_batching"] = dict(self._dispatcher.stats) if self._dispatcher is not None else None
+        return stats
+
+
+def _build_hashing_encoder() -> HashingEncoder:
+    """Model-free backend configured under embedder.hashing."""
+    hashing_cfg = CONFIG.get("embedder", {}).get("hashing", {})
+    return HashingEncoder(
+        dim=hashing_cfg.get("dim", 512),
+        ngram_range=(hashing_cfg.get("ngram_min", 3), hashing_cfg.get("ngram_max", 5)),
+        skill_weight=hashing_cfg.get("skill_weight", 2.0),
+        category_weight=hashing_cfg.get("category_weight", 1.0),
+    )
+
+
+def _build_store(model_name: str) -> Optional[EmbeddingStore]:
+    """Persistent store under data.processed_dir, unless disabled in config or offline."""
+    embedder_cfg = CONFIG.get("embedder", {})
+    if EMBEDDER_MODE == "offline" or not embedder_cfg.get("persistent_cache", True):
+        return None
+    processed_dir = resolve_path(CONFIG.get("data", {}).get("processed_dir", "data/processed"))
+    return EmbeddingStore(processed_dir / "embeddings", model_name)
+
+
+def _build_memory_cache() -> Optional[LRUEmbeddingCache]:
+    """In-process LRU tier bounded by embedder.memory_cache_mb (0 disables it)."""
+    budget_mb = float(CONFIG.get("embedder", {}).get("memory_cache_mb", 64))
+    if EMBEDDER_MODE == "offline" or budget_mb <= 0:
+        return None
+    return LRUEmbeddingCache(max_bytes=int(budget_mb * 1024 * 1024))
 
 
 @lru_cache(maxsize=1)
 def get_embedder(model_name: str = DEFAULT_MODEL_NAME) -> Embedder:
     """Return a cached embedder instance to avoid re-loading the model per request."""
-    return Embedder(model_name=model_name)
+    if EMBEDDER_BACKEND == "hashing" and EMBEDDER_MODE != "offline":
+        # Hashing is cheaper than any cache lookup, so it runs without the store/LRU tiers
+        encoder = _build_hashing_encoder()
+        return Embedder(model_name=encoder.name, model=encoder)
+    embedder = Embedder(
+        model_name=model_name,
+        store=_build_store(model_name),
+        memory_cache=_build_memory_cache(),
+    )
+    if MICRO_BATCHING_CFG.get("enabled", False) and EMBEDDER_MODE != "offline":
+        embedder.start_micro_batching()
+    return embedder
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+# src/embedder/hashing.py
+
+import re
+import unicodedata
+import zlib
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from smart_filtering.normalizer.skills_taxonomy import SKILL_SYNONYM_MAP, get_skill_category
+
+_TOKEN_RE = re.compile(r"[\w.+#/]+")
+_SIGN_BIT = 1 << 31
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(_strip_accents(text.lower()))
+
+
+class HashingEncoder:
+    """
+    Model-free encoder with a SentenceTransformer-like `encode`, so Embedder can
+    use it as its model. Each text becomes a signed feature-hashing vector of:
+      - character n-grams of every token (robust to typos, plural/singular, es/en variants),
+      - canonical skills found in the text (single tokens and "machine learning"
+        style bigrams, resolved through the skills taxonomy),
+      - the taxonomy category of each of those skills, so "aws" and "gcp" share signal.
+    Vectors are L2-normalized and fully deterministic (crc32, no Python hash seed).
+    """
+
+    def __init__(
+        self,
+        dim: int = 512,
+        ngram_range: Tuple[int, int] = (3, 5),
+        skill_weight: float = 2.0,
+        category_weight: float = 1.0,
+    ):
+        self.dim = int(dim)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.skill_weight = float(skill_weight)
+        self.category_weight = float(category_weight)
+
+    @property
+    def name(self) -> str:
+        """Identifies the feature space; used as the Embedder model_name so cached vectors never mix."""
+        low, high = self.ngram_range
+        return f"hashing-d{self.dim}-n{low}{high}"
+
+    def _add(self, vector: np.ndarray, feature: str, weight: float) -> None:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % self.dim] += -weight if h & _SIGN_BIT else weight
+
+    def _skills(self, tokens: List[str]) -> List[str]:
+        skills = []
+        candidates = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        for token in candidates:
+            skill = SKILL_SYNONYM_MAP.get(token)
+            if skill is not None:
+                skills.append(skill)
+        return skills
+
+    def encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = _tokens(text)
+        low, high = self.ngram_range
+        for token in tokens:
+            padded = f"<{token}>"
+            for n in range(low, high + 1):
+                for start in range(max(1, len(padded) - n + 1)):
+                    self._add(vector, "g:" + padded[start:start + n], 1.0)
+
+        for skill in self._skills(tokens):
+            self._add(vector, "s:" + skill, self.skill_weight)
+            category = get_skill_category(skill)
+            if category:
+                self._add(vector, "c:" + category, self.category_weight)
+
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+    def encode(
+        self, texts: Union[str, List[str]], batch_size: Optional[int] = None, convert_to_numpy: bool = True
+    ) -> np.ndarray:
+        """(N, dim) float32 matrix; `batch_size` / `convert_to_numpy` exist for API parity only."""
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.encode_one(text) for text in texts])
+
+
+if __name__ == "__main__":
+    import time
+
+    encoder = HashingEncoder()
+    sentences = [
+        "python pyspark sql airflow",
+        "py spark postgresql apache_airflow",
+        "Ingeniero de Datos",
+        "Data Engineer",
+        "scrum jira planning",
+    ]
+    matrix = encoder.encode(sentences)
+    print("Cosine vs first sentence:", np.round(matrix @ matrix[0], 3).tolist())
+
+    start = time.perf_counter()
+    encoder.encode(sentences * 2000)
+    elapsed = time.perf_counter() - start
+    print(f"{len(sentences) * 2000} texts in {elapsed:.3f}s ({elapsed / (len(sentences) * 2000) * 1e6:.1f} us/text)")
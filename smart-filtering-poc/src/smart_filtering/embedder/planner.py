@@ -0,0 +1,60 @@
+# src/embedder/planner.py
+
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from smart_filtering.embedder.store import normalize_text
+
+
+class EncodePlan:
+    """
+    How one embed request reaches the encoder: identical texts (after
+    normalize_text) are encoded once, and the unique texts are grouped into
+    length-sorted batches so each batch pads to similar lengths.
+
+    `unique_texts[inverse[i]]` is the text encoded for request position i.
+    """
+
+    def __init__(self, texts: List[str], batch_size: int):
+        self.n_requested = len(texts)
+        self.batch_size = max(1, int(batch_size))
+        first_seen: Dict[str, int] = {}
+        inverse = np.empty(len(texts), dtype=np.int64)
+        self.unique_texts: List[str] = []
+        for i, text in enumerate(texts):
+            key = normalize_text(text)
+            row = first_seen.get(key)
+            if row is None:
+                row = first_seen[key] = len(self.unique_texts)
+                self.unique_texts.append(text)
+            inverse[i] = row
+        self.inverse = inverse
+
+    @property
+    def n_unique(self) -> int:
+        return len(self.unique_texts)
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Share of requested texts that did not need their own encode."""
+        return 1.0 - self.n_unique / self.n_requested if self.n_requested else 0.0
+
+    def buckets(self) -> List[List[int]]:
+        """Unique-text indices, sorted by length and cut into batches of `batch_size`."""
+        order = sorted(range(self.n_unique), key=lambda i: len(self.unique_texts[i]))
+        return [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+    def run(self, encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Encode each bucket with `encode` and return one row per unique text, in unique order."""
+        out = None
+        for bucket in self.buckets():
+            encoded = np.asarray(encode([self.unique_texts[i] for i in bucket]))
+            if out is None:
+                out = np.empty((self.n_unique, encoded.shape[1]), dtype=encoded.dtype)
+            out[bucket] = encoded
+        return out if out is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def scatter(self, unique_vectors: np.ndarray) -> np.ndarray:
+        """Rows for the original request order (duplicates share the same vector)."""
+        return unique_vectors[self.inverse]
@@ -0,0 +1,134 @@
+# src/embedder/quantize.py
+
+from typing import Dict, Optional
+
+import numpy as np
+
+QUANTIZED_DTYPES = ("float32", "float16", "int8")
+
+
+class QuantizedMatrix:
+    """
+    Embedding matrix stored as float16, or int8 with one scale per row
+    (row ~= data[row] * scales[row]).
+
+    Cosine similarity is scale-invariant, so `data` can be scored directly
+    (ranker/similarity casts each chunk on the fly); `scales` are only needed
+    to get the original magnitudes back with dequantize().
+    """
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.data = data
+        self.scales = scales
+
+    @property
+    def dtype(self) -> str:
+        return str(self.data.dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def dequantize(self) -> np.ndarray:
+        matrix = self.data.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix
+
+
+def quantize(matrix: np.ndarray, dtype: str = "int8") -> QuantizedMatrix:
+    """Quantize a (N, D) float matrix to `dtype` (float32 keeps it as-is)."""
+    if dtype not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {QUANTIZED_DTYPES}")
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    if dtype != "int8":
+        return QuantizedMatrix(matrix.astype(dtype))
+
+    # Symmetric per-row scale: the largest component maps to +/-127; zero rows stay zero
+    max_abs = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(matrix.shape[0], dtype=np.float32)
+    scales = (max_abs / 127.0).astype(np.float32)
+    safe = np.where(scales > 0, scales, 1.0)
+    data = np.clip(np.rint(matrix / safe[:, None]), -127, 127).astype(np.int8)
+    return QuantizedMatrix(data, scales)
+
+
+def dequantize_vector(vector: np.ndarray, scale: Optional[float] = None) -> np.ndarray:
+    """float32 copy of one (possibly quantized) row."""
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector * scale if scale is not None else vector
+
+
+def compare_rankings(reference: np.ndarray, approx: np.ndarray, k: int = 20) -> Dict[str, float]:
+    """
+    Accuracy of `approx` scores against float32 `reference` scores for the same
+    candidates: score deltas, top-k overlap and Spearman rank correlation.
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    approx = np.asarray(approx, dtype=np.float64)
+    delta = np.abs(reference - approx)
+    k = min(k, reference.shape[0])
+    top_ref = set(np.argsort(-reference, kind="stable")[:k].tolist())
+    top_approx = set(np.argsort(-approx, kind="stable")[:k].tolist())
+
+    ranks_ref = np.argsort(np.argsort(-reference, kind="stable"))
+    ranks_approx = np.argsort(np.argsort(-approx, kind="stable"))
+    n = reference.shape[0]
+    spearman = 1.0 - 6.0 * float(np.sum((ranks_ref - ranks_approx) ** 2)) / (n * (n**2 - 1)) if n > 1 else 1.0
+
+    return {
+        "max_abs_delta": float(delta.max()) if delta.size else 0.0,
+        "mean_abs_delta": float(delta.mean()) if delta.size else 0.0,
+        "top_k_overlap": len(top_ref & top_approx) / k if k else 1.0,
+        "spearman": spearman,
+    }
+
+
+def quantization_report(corpus: np.ndarray, queries: np.ndarray, dtype: str, k: int = 20) -> Dict[str, float]:
+    """
+    Rank the corpus against each query with float32 and with `dtype` storage and
+    report the worst-case deltas / mean overlap across queries, plus memory saved.
+    """
+    # Imported here: ranker depends on embedder, not the other way around
+    from smart_filtering.ranker.similarity import cosine_similarity_matrix
+
+    corpus = np.asarray(corpus, dtype=np.float32)
+    quantized = quantize(corpus, dtype)
+    reference = cosine_similarity_matrix(corpus, queries)
+    approx = cosine_similarity_matrix(quantized.data, queries)
+
+    per_query = [compare_rankings(reference[:, j], approx[:, j], k=k) for j in range(reference.shape[1])]
+    return {
+        "dtype": dtype,
+        "bytes_float32": int(corpus.nbytes),
+        "bytes_quantized": quantized.nbytes,
+        "max_abs_delta": max(r["max_abs_delta"] for r in per_query),
+        "mean_abs_delta": float(np.mean([r["mean_abs_delta"] for r in per_query])),
+        "top_k_overlap": float(np.mean([r["top_k_overlap"] for r in per_query])),
+        "spearman": float(np.min([r["spearman"] for r in per_query])),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    from smart_filtering.config import load_config, resolve_path
+    from smart_filtering.embedder.vectors import CV_EMBEDDINGS_FILE
+
+    processed_dir = resolve_path(load_config().get("data", {}).get("processed_dir", "data/processed"))
+    path = processed_dir / CV_EMBEDDINGS_FILE
+    if path.exists():
+        with np.load(path) as data:
+            scales = data["skills_vec_scale"] if "skills_vec_scale" in data else None
+            corpus = QuantizedMatrix(data["skills_vec"], scales).dequantize()
+        print(f"Corpus: {path} ({corpus.shape[0]} CVs)")
+    else:
+        corpus = np.random.default_rng(0).normal(size=(2000, 384)).astype(np.float32)
+        print("Corpus: random 2000 x 384 (run `smart-filtering rank` first to use real CV vectors)")
+
+    queries = corpus[: min(20, corpus.shape[0])] + 0.05
+    for dtype in ("float16", "int8"):
+        print(json.dumps(quantization_report(corpus, queries, dtype), indent=2))
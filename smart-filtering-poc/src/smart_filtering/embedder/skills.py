@@ -0,0 +1,176 @@
+# src/embedder/skills.py
+
+import hashlib
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from smart_filtering.embedder.embed import CONFIG
+from smart_filtering.normalizer.skills_taxonomy import SKILL_SYNONYM_MAP
+
+SKILL_TABLE_FILE = "skill_table.npz"
+SKILL_POOLING_CFG = CONFIG.get("embedder", {}).get("skill_pooling", {})
+SKILL_POOLING_ENABLED = bool(SKILL_POOLING_CFG.get("enabled", True))
+# Weight of each CV skill by declared level; None/empty = plain mean of the skill vectors
+LEVEL_WEIGHTS: Dict[str, float] = SKILL_POOLING_CFG.get("level_weights") or {}
+
+_POOL_CHUNK_ROWS = 4096
+
+SkillSet = Union[Mapping[str, Any], Iterable[str]]
+
+
+def taxonomy_vocabulary() -> List[str]:
+    """Every canonical skill and synonym of the taxonomy, sorted so the table layout is stable."""
+    return sorted(SKILL_SYNONYM_MAP)
+
+
+def _table_fingerprint(model_name: str, vocabulary: Sequence[str]) -> str:
+    payload = "\x1f".join([model_name, *vocabulary])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def pooling_key() -> str:
+    """Describes how skill-set vectors are built, for fingerprints of persisted CV vectors."""
+    if not SKILL_POOLING_ENABLED:
+        return "text"
+    levels = ",".join(f"{level}={weight}" for level, weight in sorted(LEVEL_WEIGHTS.items()))
+    return f"pooled[{levels}]"
+
+
+class SkillEmbeddingTable:
+    """
+    One L2-normalized embedding per skill name (taxonomy skills and synonyms),
+    so a skill-set vector is a weighted sum of table rows instead of a model
+    call on the joined skill string. Skills outside the taxonomy are embedded
+    the first time they show up and kept in memory.
+    """
+
+    def __init__(self, model_name: str, vocabulary: Sequence[str], matrix: np.ndarray):
+        self.model_name = model_name
+        self.vocabulary = list(vocabulary)
+        self.fingerprint = _table_fingerprint(model_name, self.vocabulary)
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        self._index = {skill: row for row, skill in enumerate(self.vocabulary)}
+        self._extra: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index) + len(self._extra)
+
+    def __contains__(self, skill: str) -> bool:
+        return skill in self._index or skill in self._extra
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1])
+
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    @classmethod
+    def build(cls, embedder: Any, vocabulary: Optional[Sequence[str]] = None) -> "SkillEmbeddingTable":
+        """Embed every skill name in one batched call."""
+        vocabulary = list(vocabulary) if vocabulary is not None else taxonomy_vocabulary()
+        return cls(embedder.model_name, vocabulary, cls._normalize_rows(embedder.embed_text(vocabulary)))
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(f, vocabulary=np.array(self.vocabulary), matrix=self.matrix, fingerprint=self.fingerprint)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], model_name: str, vocabulary: Sequence[str]) -> Optional["SkillEmbeddingTable"]:
+        """The persisted table, or None when missing or built for another model/taxonomy."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != _table_fingerprint(model_name, vocabulary):
+                return None
+            return cls(model_name, data["vocabulary"].tolist(), data["matrix"])
+
+    def _ensure_skills(self, skills: Iterable[str], embedder: Any) -> None:
+        unknown = sorted({s for s in skills if s not in self._index and s not in self._extra})
+        if not unknown:
+            return
+        vectors = self._normalize_rows(embedder.embed_text(unknown))
+        with self._lock:
+            for skill, vector in zip(unknown, vectors):
+                self._extra.setdefault(skill, vector)
+
+    @staticmethod
+    def _weights(skills: SkillSet, level_weights: Mapping[str, float]) -> Dict[str, float]:
+        if isinstance(skills, Mapping):
+            return {
+                skill: float(level_weights.get(str(level).lower(), 1.0)) if level_weights else 1.0
+                for skill, level in skills.items()
+            }
+        return {skill: 1.0 for skill in skills}
+
+    def pool_many(
+        self, skill_sets: Sequence[SkillSet], embedder: Any, level_weights: Optional[Mapping[str, float]] = None
+    ) -> np.ndarray:
+        """
+        (N, dim) weighted mean of the skill vectors of each set. A set is either a
+        {skill: level} mapping (weighted by `level_weights`) or a list of skills
+        (uniform weights). Empty sets give zero rows, which score 0.0.
+        """
+        level_weights = LEVEL_WEIGHTS if level_weights is None else level_weights
+        weights = [self._weights(skills, level_weights) for skills in skill_sets]
+        self._ensure_skills((skill for w in weights for skill in w), embedder)
+
+        # Dense (chunk, vocab) weight matrix times the table: one matmul per chunk of sets
+        names = self.vocabulary + list(self._extra)
+        columns = {skill: col for col, skill in enumerate(names)}
+        table = np.vstack([self.matrix] + [self._extra[skill] for skill in names[len(self.vocabulary):]])
+        out = np.zeros((len(weights), self.dim), dtype=np.float32)
+        for start in range(0, len(weights), _POOL_CHUNK_ROWS):
+            chunk = weights[start:start + _POOL_CHUNK_ROWS]
+            dense = np.zeros((len(chunk), len(names)), dtype=np.float32)
+            for row, skill_weights in enumerate(chunk):
+                total = sum(skill_weights.values())
+                for skill, weight in skill_weights.items():
+                    dense[row, columns[skill]] += weight / total if total else 0.0
+            out[start:start + len(chunk)] = dense @ table
+        return out
+
+    def pool(self, skills: SkillSet, embedder: Any, level_weights: Optional[Mapping[str, float]] = None) -> np.ndarray:
+        """Single skill-set vector, see pool_many."""
+        return self.pool_many([skills], embedder, level_weights=level_weights)[0]
+
+
+# One table per embedder instance (get_embedder() is cached, so one per process in practice)
+_TABLES: "weakref.WeakKeyDictionary[Any, SkillEmbeddingTable]" = weakref.WeakKeyDictionary()
+_TABLES_LOCK = threading.Lock()
+
+
+def get_skill_table(embedder: Any) -> SkillEmbeddingTable:
+    """
+    The skill table for `embedder`, built on first use. When the
+    embedder has a persistent store the table is kept next to it and only
+    rebuilt when the model or the taxonomy vocabulary changes.
+    """
+    with _TABLES_LOCK:
+        table = _TABLES.get(embedder)
+        if table is not None:
+            return table
+
+        vocabulary = taxonomy_vocabulary()
+        store = getattr(embedder, "store", None)
+        path = store.path / SKILL_TABLE_FILE if store is not None else None
+        table = SkillEmbeddingTable.load(path, embedder.model_name, vocabulary) if path is not None else None
+        if table is None:
+            table = SkillEmbeddingTable.build(embedder, vocabulary)
+            if path is not None:
+                table.save(path)
+        _TABLES[embedder] = table
+        return table
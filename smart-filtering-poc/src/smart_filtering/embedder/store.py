@@ -0,0 +1,202 @@
+# src/embedder/store.py
+
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single writer only
+    fcntl = None
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.txt"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace, so trivially different strings share a vector."""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def text_key(text: str) -> str:
+    """Content hash used as the store key for a text."""
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+class EmbeddingStore:
+    """
+    Append-only, content-addressed embedding store on disk, one folder per model.
+
+    Layout under <root_dir>/<model_slug>/:
+      - vectors.f32: raw float32 rows, read through a memory map.
+      - index.txt: one text hash per line; line number == row in vectors.f32.
+      - meta.json: model name and vector dimension.
+
+    Rows are only ever appended, so a crash can at worst leave a partial tail,
+    which is trimmed on the next load. Several processes (CLI and UI) may share a
+    folder: appends and trims hold an flock on .lock, and each append first picks
+    up rows other writers added, so row numbers always match the files on disk.
+    """
+
+    def __init__(self, root_dir: Union[str, Path], model_name: str):
+        self.model_name = model_name
+        self.path = Path(root_dir) / _model_slug(model_name)
+        self.dim: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        self._n_rows = 0  # rows in vectors.f32 known to this instance
+        self._index_bytes = 0  # size of index.txt when last read
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._loaded = False  # index is read on first use, not at construction
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._index)
+
+    def __contains__(self, text: str) -> bool:
+        self._ensure_loaded()
+        return text_key(text) in self._index
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process writing to this folder."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with (self.path / LOCK_FILE).open("a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        if not (self.path / META_FILE).exists():
+            return
+        # Under the file lock: a half-written tail may be another writer's append in progress
+        with self._file_lock():
+            self._read_from_disk()
+
+    def _read_from_disk(self) -> None:
+        """(Re)read meta and index from disk and trim an interrupted append. Caller holds the file lock."""
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("model_name") != self.model_name:
+            raise ValueError(
+                f"Embedding store at {self.path} belongs to model {meta.get('model_name')!r}, not {self.model_name!r}"
+            )
+        self.dim = int(meta["dim"])
+
+        index_path = self.path / INDEX_FILE
+        keys = index_path.read_text(encoding="utf-8").split() if index_path.exists() else []
+        vectors_path = self.path / VECTORS_FILE
+        row_bytes = self.dim * 4
+        data_size = vectors_path.stat().st_size if vectors_path.exists() else 0
+
+        n_rows = min(len(keys), data_size // row_bytes)
+        if n_rows != len(keys) or n_rows * row_bytes != data_size:
+            # Interrupted append: drop the incomplete tail on both files
+            keys = keys[:n_rows]
+            index_path.write_text("".join(f"{k}\n" for k in keys), encoding="utf-8")
+            if vectors_path.exists():
+                with vectors_path.open("r+b") as f:
+                    f.truncate(n_rows * row_bytes)
+
+        index: Dict[str, int] = {}
+        for row, key in enumerate(keys):
+            index.setdefault(key, row)
+        self._index = index
+        self._n_rows = n_rows
+        self._index_bytes = index_path.stat().st_size if index_path.exists() else 0
+        self._matrix = None
+
+    def _disk_changed(self) -> bool:
+        index_path = self.path / INDEX_FILE
+        size = index_path.stat().st_size if index_path.exists() else 0
+        return size != self._index_bytes
+
+    def _get_matrix(self) -> Optional[np.memmap]:
+        if self._matrix is None and self._n_rows:
+            self._matrix = np.memmap(
+                self.path / VECTORS_FILE, dtype=np.float32, mode="r", shape=(self._n_rows, self.dim)
+            )
+        return self._matrix
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return the stored vector for each text, or None when it is not in the store."""
+        self._ensure_loaded()
+        with self._lock:
+            matrix = self._get_matrix()
+            results: List[Optional[np.ndarray]] = []
+            for text in texts:
+                row = self._index.get(text_key(text))
+                results.append(np.array(matrix[row]) if row is not None else None)
+            return results
+
+    def add(self, texts: List[str], vectors: np.ndarray) -> int:
+        """Append vectors for texts not yet stored. Returns the number of new rows."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(texts) != vectors.shape[0]:
+            raise ValueError("texts and vectors must have the same number of rows")
+
+        self._ensure_loaded()
+        with self._lock, self._file_lock():
+            if self._disk_changed():
+                # Another process appended since we last read: row numbers continue after its rows
+                self._read_from_disk()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                (self.path / META_FILE).write_text(
+                    json.dumps({"model_name": self.model_name, "dim": self.dim}), encoding="utf-8"
+                )
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dim {self.dim}, got {vectors.shape[1]}")
+
+            new_keys: List[str] = []
+            new_rows: List[int] = []
+            seen = set()
+            for row, text in enumerate(texts):
+                key = text_key(text)
+                if key in self._index or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(row)
+            if not new_keys:
+                return 0
+
+            # Vectors first: an index line never points past the end of the data file
+            with (self.path / VECTORS_FILE).open("ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+            with (self.path / INDEX_FILE).open("a", encoding="utf-8") as f:
+                f.write("".join(f"{k}\n" for k in new_keys))
+
+            start = self._n_rows
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start + offset
+            self._n_rows += len(new_keys)
+            self._index_bytes = (self.path / INDEX_FILE).stat().st_size
+            self._matrix = None  # re-map on next read to see the new rows
+            return len(new_keys)
@@ -0,0 +1,350 @@
+# src/embedder/vectors.py
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from smart_filtering.embedder.corpus import ProgressCallback
+from smart_filtering.embedder.embed import CONFIG, CORPUS_WORKERS, Embedder, get_embedder
+from smart_filtering.embedder.quantize import dequantize_vector, quantize
+from smart_filtering.embedder.skills import SKILL_POOLING_ENABLED, get_skill_table, pooling_key
+
+CV_SLOTS = ("skills_vec", "title_vec", "profile_vec")
+CV_EMBEDDINGS_FILE = "cv_embeddings.npz"
+# float32 | float16 | int8 (per-vector scale) for the corpus vectors kept in memory and on disk
+CORPUS_DTYPE = CONFIG.get("embedder", {}).get("corpus_dtype", "float32")
+
+
+def cv_skills_text(cv: Dict[str, Any]) -> str:
+    """Text embedded for the CV side of skill_semantic_similarity."""
+    return " ".join(cv["skills"].keys())
+
+
+def cv_profile_text(cv: Dict[str, Any]) -> str:
+    """Richer profile text: title, each experience (role + skills) and education."""
+    parts = [cv.get("title") or ""]
+    for exp in cv.get("experiences", []):
+        exp_text = " ".join(filter(None, [exp.get("role", ""), ", ".join(exp.get("skills", []))]))
+        parts.append(exp_text)
+    parts.extend(cv.get("education", []))
+    return ". ".join(part for part in parts if part)
+
+
+def _cv_texts(cv: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "skills_vec": cv_skills_text(cv),
+        "title_vec": cv.get("title") or "",
+        "profile_vec": cv_profile_text(cv),
+    }
+
+
+def _cv_fingerprint(cv: Dict[str, Any], model_name: str) -> str:
+    texts = _cv_texts(cv)
+    # Pooled skills_vec also depends on the declared levels and the pooling settings
+    skill_levels = " ".join(f"{skill}:{level}" for skill, level in cv["skills"].items())
+    payload = "\x1f".join([model_name, pooling_key(), skill_levels] + [texts[slot] for slot in CV_SLOTS])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def jd_skills_text(jd: Dict[str, Any]) -> str:
+    """Text embedded for the JD side of skill_semantic_similarity."""
+    return " ".join(jd["must_have"] + jd["nice_to_have"])
+
+
+def cv_skills_vectors(cvs: List[Dict[str, Any]], embedder: Optional[Embedder] = None) -> Optional[np.ndarray]:
+    """
+    (N, D) skills_vec of each CV pooled from the skill table (level-weighted),
+    or None when embedder.skill_pooling is disabled and the joined skill text
+    must be encoded instead.
+    """
+    if not SKILL_POOLING_ENABLED:
+        return None
+    embedder = embedder or get_embedder()
+    return get_skill_table(embedder).pool_many([cv.get("skills") or {} for cv in cvs], embedder)
+
+
+def jd_skills_vector(jd: Dict[str, Any], embedder: Optional[Embedder] = None) -> Optional[np.ndarray]:
+    """Pooled jd_vec (must-have + nice-to-have, uniform weights), None when pooling is disabled."""
+    if not SKILL_POOLING_ENABLED:
+        return None
+    embedder = embedder or get_embedder()
+    return get_skill_table(embedder).pool(jd["must_have"] + jd["nice_to_have"], embedder)
+
+
+def attach_jd_embeddings(jd: Dict[str, Any], embedder: Optional[Embedder] = None) -> Dict[str, Any]:
+    """
+    Compute the JD-side vectors once and store them in jd["embeddings"]:
+    `jd_vec` (must-have + nice-to-have skills) and `role_vec` (role title).
+    Call again whenever the JD skills or role are edited.
+    """
+    embedder = embedder or get_embedder()
+    texts = {"jd_vec": jd_skills_text(jd), "role_vec": jd.get("role") or ""}
+    embeddings: Dict[str, Any] = {"jd_vec": [], "role_vec": [], "model": embedder.model_name}
+    pooled = jd_skills_vector(jd, embedder) if texts["jd_vec"] else None
+    if pooled is not None:
+        embeddings["jd_vec"] = pooled
+        del texts["jd_vec"]
+
+    slots = [slot for slot, text in texts.items() if text]
+    if slots:
+        vectors = embedder.embed_text([texts[slot] for slot in slots])
+        for slot, vector in zip(slots, vectors):
+            embeddings[slot] = vector
+    jd["embeddings"] = embeddings
+    return jd
+
+
+def attach_cv_embeddings(
+    cvs: List[Dict[str, Any]],
+    embedder: Optional[Embedder] = None,
+    batch_size: int = 256,
+    progress: Optional[ProgressCallback] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fill cv["embeddings"] with skills_vec, title_vec and profile_vec for every CV,
+    encoding all texts of the corpus in one batched call. With skill pooling,
+    skills_vec comes from the skill table and only the other slots are encoded.
+    Empty texts get a zero vector, which the similarity code scores as 0.0
+    (same as a missing text). With more than one embedder.corpus.workers the texts are
+    encoded by a process pool (Embedder.embed_corpus); `progress(done, total)`
+    reports encoded texts.
+    """
+    embedder = embedder or get_embedder()
+    pooled = cv_skills_vectors(cvs, embedder)
+    texts: List[str] = []
+    for cv in cvs:
+        cv_texts = _cv_texts(cv)
+        if pooled is not None:
+            cv_texts["skills_vec"] = ""  # filled from `pooled` below
+        texts.extend(cv_texts[slot] for slot in CV_SLOTS)
+
+    non_empty = [i for i, text in enumerate(texts) if text]
+    vectors: List[Any] = [[] for _ in texts]
+    if non_empty:
+        to_encode = [texts[i] for i in non_empty]
+        if CORPUS_WORKERS > 1:
+            encoded = embedder.embed_corpus(to_encode, batch_size=batch_size, progress=progress)
+        else:
+            encoded = embedder.embed_text(to_encode, batch_size=batch_size)
+            if progress is not None:
+                progress(len(to_encode), len(to_encode))
+        zero = np.zeros(encoded.shape[1], dtype=encoded.dtype)
+        vectors = [zero] * len(texts)
+        for row, i in enumerate(non_empty):
+            vectors[i] = encoded[row]
+
+    for n, cv in enumerate(cvs):
+        embeddings: Dict[str, Any] = {"model": embedder.model_name}
+        for k, slot in enumerate(CV_SLOTS):
+            embeddings[slot] = vectors[n * len(CV_SLOTS) + k]
+        if pooled is not None:
+            embeddings["skills_vec"] = pooled[n]
+        cv["embeddings"] = embeddings
+    return cvs
+
+
+def _slot_matrix(cvs: List[Dict[str, Any]], slot: str) -> np.ndarray:
+    """float32 (N, D) matrix of one slot, undoing int8 scales if the rows are quantized."""
+    return np.vstack(
+        [dequantize_vector(cv["embeddings"][slot], cv["embeddings"].get(f"{slot}_scale")) for cv in cvs]
+    )
+
+
+def _stored_as(cv: Dict[str, Any], dtype: str) -> bool:
+    """True when every CV slot is already stored as `dtype` (int8 rows with their scale)."""
+    embeddings = cv["embeddings"]
+    return all(
+        np.asarray(embeddings[slot]).dtype == dtype and (dtype != "int8" or f"{slot}_scale" in embeddings)
+        for slot in CV_SLOTS
+    )
+
+
+def quantize_cv_embeddings(cvs: List[Dict[str, Any]], dtype: str = CORPUS_DTYPE) -> List[Dict[str, Any]]:
+    """
+    Re-store the CV vectors of the corpus as `dtype`. Each cv["embeddings"][slot]
+    becomes a row view of one shared quantized matrix (plus `<slot>_scale` for
+    int8); similarity scoring works on those rows directly since cosine is
+    scale-invariant. CVs already stored as `dtype` (e.g. loaded from the
+    cache) are left untouched rather than quantized a second time.
+    """
+    rows = [
+        cv
+        for cv in cvs
+        if len((cv.get("embeddings") or {}).get("skills_vec", [])) > 0 and not _stored_as(cv, dtype)
+    ]
+    if not rows:
+        return cvs
+    for slot in CV_SLOTS:
+        quantized = quantize(_slot_matrix(rows, slot), dtype)
+        for n, cv in enumerate(rows):
+            cv["embeddings"][slot] = quantized.data[n]
+            cv["embeddings"].pop(f"{slot}_scale", None)
+            if quantized.scales is not None:
+                cv["embeddings"][f"{slot}_scale"] = float(quantized.scales[n])
+    return cvs
+
+
+def save_cv_embeddings(
+    cvs: List[Dict[str, Any]], path: Union[str, Path], dtype: str = CORPUS_DTYPE, merge: bool = False
+) -> None:
+    """
+    Persist the CV vectors (one matrix per slot, stored as `dtype`) with a
+    per-CV fingerprint of their source texts. With `merge`, rows already in
+    the file for other CV ids are kept (when stored with the same dtype), so
+    saving a subset of the corpus does not drop the rest.
+    """
+    rows = [cv for cv in cvs if len((cv.get("embeddings") or {}).get("skills_vec", [])) > 0]
+    if not rows:
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "ids": np.array([cv["id"] for cv in rows]),
+        "fingerprints": np.array([_cv_fingerprint(cv, cv["embeddings"]["model"]) for cv in rows]),
+    }
+    # Rows ingested with the same dtype are written as they are; only the rest go through quantize
+    stored = all(_stored_as(cv, dtype) for cv in rows)
+    for slot in CV_SLOTS:
+        if stored:
+            arrays[slot] = np.vstack([cv["embeddings"][slot] for cv in rows])
+            if dtype == "int8":
+                arrays[f"{slot}_scale"] = np.array([cv["embeddings"][f"{slot}_scale"] for cv in rows], dtype=np.float32)
+            continue
+        quantized = quantize(_slot_matrix(rows, slot), dtype)
+        arrays[slot] = quantized.data
+        if quantized.scales is not None:
+            arrays[f"{slot}_scale"] = quantized.scales
+    if merge and path.exists():
+        _merge_saved_rows(arrays, path)
+    # Write through a temp file so readers never see a half-written archive
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        np.savez(f, **arrays)
+    tmp_path.replace(path)
+
+
+def _merge_saved_rows(arrays: Dict[str, np.ndarray], path: Path) -> None:
+    """Append to `arrays` the rows of the file at `path` whose CV id is not in arrays["ids"]."""
+    with np.load(path) as data:
+        if set(data.files) != set(arrays) or data["skills_vec"].dtype != arrays["skills_vec"].dtype:
+            return  # written with another dtype: those rows are re-embedded when needed
+        keep = ~np.isin(data["ids"], arrays["ids"])
+        if not keep.any():
+            return
+        for key in arrays:
+            arrays[key] = np.concatenate([arrays[key], data[key][keep]])
+
+
+def load_cv_embeddings(cvs: List[Dict[str, Any]], path: Union[str, Path], model_name: str) -> int:
+    """
+    Attach persisted vectors to CVs whose id and source texts are unchanged,
+    in the dtype they were stored with. Returns how many CVs were served from disk.
+    """
+    path = Path(path)
+    if not path.exists():
+        return 0
+    with np.load(path) as data:
+        rows = {
+            (cv_id, fingerprint): row
+            for row, (cv_id, fingerprint) in enumerate(zip(data["ids"].tolist(), data["fingerprints"].tolist()))
+        }
+        matrices = {slot: data[slot] for slot in CV_SLOTS}
+        scales = {slot: data[f"{slot}_scale"] for slot in CV_SLOTS if f"{slot}_scale" in data}
+
+    loaded = 0
+    for cv in cvs:
+        row = rows.get((cv.get("id"), _cv_fingerprint(cv, model_name)))
+        if row is None:
+            continue
+        embeddings: Dict[str, Any] = {"model": model_name}
+        for slot in CV_SLOTS:
+            embeddings[slot] = matrices[slot][row]
+            if slot in scales:
+                embeddings[f"{slot}_scale"] = float(scales[slot][row])
+        cv["embeddings"] = embeddings
+        loaded += 1
+    return loaded
+
+
+def ingest_cv_embeddings(
+    cvs: List[Dict[str, Any]],
+    cache_path: Optional[Union[str, Path]] = None,
+    embedder: Optional[Embedder] = None,
+    dtype: str = CORPUS_DTYPE,
+    progress: Optional[ProgressCallback] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ingest step run right after parsing: reuse persisted CV vectors when the CV
+    is unchanged, embed the rest in one batch and persist the whole set again.
+    With a quantized `dtype` the in-memory corpus is re-stored as float16/int8.
+    `progress` is forwarded to attach_cv_embeddings.
+    """
+    embedder = embedder or get_embedder()
+    if cache_path is not None and not embedder.offline:
+        load_cv_embeddings(cvs, cache_path, embedder.model_name)
+
+    pending = [cv for cv in cvs if get_vector(cv, "skills_vec", embedder) is None]
+    if pending:
+        attach_cv_embeddings(pending, embedder=embedder, progress=progress)
+        if dtype != "float32":
+            quantize_cv_embeddings(cvs, dtype)
+        if cache_path is not None and not embedder.offline:
+            save_cv_embeddings(cvs, cache_path, dtype=dtype)
+    return cvs
+
+
+class DeferredCVIngest:
+    """
+    ingest_cv_embeddings split in time, for rankers that only need vectors for
+    the CVs that survive their cheap stages. Construction attaches the
+    persisted vectors of unchanged CVs (no model work); calling the object
+    with a group of CVs embeds the ones still missing, right before their
+    features are extracted; save() persists the new vectors, keeping the rows
+    of the CVs that were never embedded in this run.
+    """
+
+    def __init__(
+        self,
+        cvs: List[Dict[str, Any]],
+        cache_path: Optional[Union[str, Path]] = None,
+        embedder: Optional[Embedder] = None,
+        dtype: str = CORPUS_DTYPE,
+        progress: Optional[ProgressCallback] = None,
+    ):
+        self.embedder = embedder or get_embedder()
+        self.cache_path = cache_path if not self.embedder.offline else None
+        self.dtype = dtype
+        self.progress = progress
+        self.embedded: List[Dict[str, Any]] = []
+        if self.cache_path is not None:
+            load_cv_embeddings(cvs, self.cache_path, self.embedder.model_name)
+
+    def __call__(self, cvs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        pending = [cv for cv in cvs if get_vector(cv, "skills_vec", self.embedder) is None]
+        if pending:
+            attach_cv_embeddings(pending, embedder=self.embedder, progress=self.progress)
+            if self.dtype != "float32":
+                quantize_cv_embeddings(pending, self.dtype)
+            self.embedded.extend(pending)
+        return cvs
+
+    def save(self) -> None:
+        if self.embedded and self.cache_path is not None:
+            save_cv_embeddings(self.embedded, self.cache_path, dtype=self.dtype, merge=True)
+
+
+def get_vector(record: Dict[str, Any], slot: str, embedder: Optional[Embedder] = None) -> Optional[np.ndarray]:
+    """
+    Precomputed CV/JD vector for `slot`, or None when it is missing or was built
+    with another model (callers then fall back to embedding the text).
+    """
+    embeddings = record.get("embeddings") or {}
+    vector = embeddings.get(slot)
+    if vector is None or len(vector) == 0:
+        return None
+    model_name = (embedder or get_embedder()).model_name
+    if embeddings.get("model") != model_name:
+        return None
+    return np.asarray(vector)
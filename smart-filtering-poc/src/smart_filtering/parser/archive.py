@@ -0,0 +1,77 @@
+# src/parser/archive.py
+
+import posixpath
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Separates the archive path from the member name in the paths reported for archive members
+MEMBER_SEP = "!"
+# What reading one corrupt or truncated member raises (a damaged deflate stream in a zip surfaces as zlib.error)
+MEMBER_ERRORS = (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError, zlib.error)
+
+# (member name, bytes or None, error message or None)
+ArchiveMember = Tuple[str, Optional[bytes], Optional[str]]
+
+
+def is_archive(path: Union[str, Path]) -> bool:
+    """True for .zip / .tar[.gz|.bz2|.xz] files (by suffix: a .docx is a zip too)."""
+    path = Path(path)
+    return path.is_file() and path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def member_path(archive_path: Union[str, Path], member: str) -> str:
+    """'cvs.zip!batch1/cv_0001.docx': how an archive member is named in errors and in the parse cache."""
+    return f"{archive_path}{MEMBER_SEP}{member}"
+
+
+def _is_docx_member(name: str) -> bool:
+    base = posixpath.basename(name)
+    # Skip Word lock files (~$...) and the resource forks macOS adds to zips
+    return base.lower().endswith(".docx") and not base.startswith("~") and not name.startswith("__MACOSX/")
+
+
+def iter_archive_docx(archive_path: Union[str, Path]) -> Iterator[ArchiveMember]:
+    """
+    Yield (member name, bytes, None) for every .docx inside a zip or tar
+    archive, reading members into memory one at a time (nothing is extracted
+    to disk), or (member name, None, error) when a member cannot be read.
+    Zip members come in name order, like list_docx on a folder; tar archives
+    are read in a single forward pass ('r|*', any compression), so their
+    members keep the order they were stored in and reading stops at the
+    first unreadable one (the stream cannot be resumed past it).
+    """
+    archive_path = str(archive_path)
+    # By suffix first: a plain tar of .docx files ends with members' zip directories, so is_zipfile accepts it
+    name = archive_path.lower()
+    if name.endswith(".zip") or (not name.endswith(ARCHIVE_SUFFIXES) and zipfile.is_zipfile(archive_path)):
+        with zipfile.ZipFile(archive_path) as archive:
+            infos = sorted((info for info in archive.infolist() if not info.is_dir()), key=lambda info: info.filename)
+            for info in infos:
+                if not _is_docx_member(info.filename):
+                    continue
+                try:
+                    data = archive.read(info)
+                except MEMBER_ERRORS as e:
+                    yield info.filename, None, f"{type(e).__name__}: {e}"
+                    continue
+                yield info.filename, data, None
+        return
+    try:
+        archive = tarfile.open(archive_path, mode="r|*")
+    except tarfile.ReadError as e:
+        raise ValueError(f"{archive_path} is neither a zip nor a tar archive") from e
+    with archive:
+        for member in archive:
+            if not (member.isfile() and _is_docx_member(member.name)):
+                continue
+            try:
+                with archive.extractfile(member) as fh:
+                    data = fh.read()
+            except MEMBER_ERRORS as e:
+                yield member.name, None, f"{type(e).__name__}: {e}"
+                return
+            yield member.name, data, None
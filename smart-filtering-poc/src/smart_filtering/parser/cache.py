@@ -0,0 +1,177 @@
+# src/parser/cache.py
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+MANIFEST_FILE = "manifest.json"
+RECORDS_FILE = "records.pkl"
+# Bump when the parsed dict layout (or the records key) changes so old entries are dropped
+CACHE_VERSION = 2
+
+
+def file_sha1(path: Union[str, Path]) -> str:
+    digest = hashlib.sha1()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Incremental cache of parsed CV/JD dicts under <root_dir>/:
+      - manifest.json: per source file (kind + absolute path) its size,
+        mtime_ns and content sha1, i.e. the fingerprint it was parsed from.
+      - records.pkl: parsed dicts keyed by (kind, content sha1): a renamed or
+        copied file is not parsed again, and the same bytes parsed as a CV and
+        as a JD keep one record each.
+
+    A file whose size and mtime match the manifest is served without being
+    opened; if only the mtime changed, the content hash decides. Failed
+    parses are never cached, so they are retried on the next run.
+
+    Returned records are the cached objects themselves, so use one instance
+    per load (parser/loader does) and save() before handing records out.
+    """
+
+    def __init__(self, root_dir: Union[str, Path]):
+        self.path = Path(root_dir)
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._records: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._manifest)
+
+    @staticmethod
+    def _key(path: Union[str, Path], kind: str) -> str:
+        return f"{kind}:{os.path.abspath(path)}"
+
+    def _load(self) -> None:
+        manifest_path = self.path / MANIFEST_FILE
+        records_path = self.path / RECORDS_FILE
+        if not manifest_path.exists() or not records_path.exists():
+            return
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            with records_path.open("rb") as f:
+                records = pickle.load(f)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return  # unreadable cache: start empty, it is rebuilt on save()
+        if manifest.get("version") != CACHE_VERSION:
+            return
+        self._manifest = manifest.get("files", {})
+        self._records = records
+
+    def lookup(self, paths: Iterable[Union[str, Path]], kind: str) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Split `paths` into ({path: cached record}, [paths to parse])."""
+        hits: Dict[str, Dict[str, Any]] = {}
+        misses: List[str] = []
+        for path in map(str, paths):
+            entry = self._manifest.get(self._key(path, kind))
+            record = self._records.get((kind, entry["sha1"])) if entry else None
+            if record is None:
+                misses.append(path)
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                misses.append(path)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+                if stat.st_size != entry["size"] or file_sha1(path) != entry["sha1"]:
+                    misses.append(path)
+                    continue
+                entry["mtime_ns"] = stat.st_mtime_ns  # touched, same content
+                self._dirty = True
+            hits[path] = record
+        self.stats["hits"] += len(hits)
+        self.stats["misses"] += len(misses)
+        return hits, misses
+
+    def put(self, path: Union[str, Path], kind: str, record: Dict[str, Any]) -> None:
+        stat = os.stat(path)
+        sha1 = file_sha1(path)
+        self._manifest[self._key(path, kind)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1}
+        self._records[(kind, sha1)] = record
+        self._dirty = True
+
+    def lookup_content(self, path: str, kind: str, sha1: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached record for a document already read into memory (an archive
+        member), found by the sha1 of its bytes; `path` is registered for it.
+        """
+        record = self._records.get((kind, sha1))
+        if record is None:
+            self.stats["misses"] += 1
+            return None
+        self._set_content_entry(path, kind, sha1)
+        self.stats["hits"] += 1
+        return record
+
+    def put_content(self, path: str, kind: str, sha1: str, record: Dict[str, Any]) -> None:
+        self._set_content_entry(path, kind, sha1)
+        self._records[(kind, sha1)] = record
+        self._dirty = True
+
+    def _set_content_entry(self, path: str, kind: str, sha1: str) -> None:
+        # No size/mtime: in-memory documents are always identified by content
+        entry = {"size": None, "mtime_ns": None, "sha1": sha1}
+        key = self._key(path, kind)
+        if self._manifest.get(key) != entry:
+            self._manifest[key] = entry
+            self._dirty = True
+
+    def evict_missing(self, directory: Union[str, Path], kind: str, present: Iterable[Union[str, Path]]) -> int:
+        """Drop entries for files directly in `directory` that are no longer in `present`."""
+        directory = os.path.abspath(directory)
+        keep = {self._key(path, kind) for path in present}
+        stale = [
+            key
+            for key in self._manifest
+            if key not in keep and key.startswith(f"{kind}:") and os.path.dirname(key.split(":", 1)[1]) == directory
+        ]
+        for key in stale:
+            del self._manifest[key]
+        if stale:
+            self.stats["evicted"] += len(stale)
+            self._dirty = True
+        return len(stale)
+
+    def evict_missing_members(self, archive_path: Union[str, Path], kind: str, present: Iterable[str]) -> int:
+        """Drop entries for members of `archive_path` ('<archive>!<member>' paths) no longer in `present`."""
+        prefix = f"{kind}:{os.path.abspath(archive_path)}!"
+        keep = {self._key(path, kind) for path in present}
+        stale = [key for key in self._manifest if key not in keep and key.startswith(prefix)]
+        for key in stale:
+            del self._manifest[key]
+        if stale:
+            self.stats["evicted"] += len(stale)
+            self._dirty = True
+        return len(stale)
+
+    def save(self) -> None:
+        """Write manifest and records (only the ones still referenced) if anything changed."""
+        if not self._dirty:
+            return
+        # Manifest keys are '<kind>:<path>'
+        referenced = {(key.split(":", 1)[0], entry["sha1"]) for key, entry in self._manifest.items()}
+        self._records = {key: record for key, record in self._records.items() if key in referenced}
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Temp files + rename so an interrupted save never leaves a torn cache behind
+        records_tmp = self.path / (RECORDS_FILE + ".tmp")
+        with records_tmp.open("wb") as f:
+            pickle.dump(self._records, f, protocol=pickle.HIGHEST_PROTOCOL)
+        manifest_tmp = self.path / (MANIFEST_FILE + ".tmp")
+        manifest_tmp.write_text(
+            json.dumps({"version": CACHE_VERSION, "files": self._manifest}, separators=(",", ":")), encoding="utf-8"
+        )
+        records_tmp.replace(self.path / RECORDS_FILE)
+        manifest_tmp.replace(self.path / MANIFEST_FILE)
+        self._dirty = False
@@ -1,100 +1,135 @@
 # src/parser/docx_parser.py
-import re
-from typing import Dict, Any, List
+import io
+import zipfile
+from typing import Dict, Any, Iterable, List, Union
+from xml.etree.ElementTree import ParseError
 
 from docx import Document
 
+from smart_filtering.config import load_config
 from smart_filtering.generator.cv_generator import CITIES
-from smart_filtering.normalizer.skills_taxonomy import get_canonical_skill
+from smart_filtering.parser.fast_docx import UnsupportedDocx, read_docx_paragraphs_fast
+from smart_filtering.parser.sections import (
+    Section,
+    canonical_skill,
+    key_values,
+    list_items,
+    norm_key,
+    tokenize_sections,
+)
+
+# Streaming zip/XML reader first, python-docx for anything it cannot handle
+FAST_DOCX_ENABLED = bool(load_config().get("parser", {}).get("fast_docx", True))
+# Not a zip, malformed XML, a missing part or a layout the streaming reader does not support
+_FAST_DOCX_FALLBACK_ERRORS = (UnsupportedDocx, zipfile.BadZipFile, ParseError, KeyError)
 
 def parse_experience(text_block: str) -> Dict[str, Any]:
     """Parses a text block representing one work experience."""
     exp = {}
-    lines = text_block.strip().split('\n')
-    for line in lines:
-        if ':' in line:
-            key, value = line.split(':', 1)
+    for key, sep, value in key_values(text_block.split('\n')):
+        if sep:
             # Normalize key to match the dictionary keys used in the application
-            key = key.strip().lower().replace(' ', '_')
-            value = value.strip()
+            key = norm_key(key)
             if key == 'skills':
-                exp[key] = [get_canonical_skill(s.strip()) for s in value.split(',')]
+                exp[key] = list(map(canonical_skill, value.split(',')))
             else:
-                exp[key] = value
+                exp[key] = value.strip()
     return exp
 
+def _docx_source(source: Union[str, bytes]):
+    # A fresh stream per reader: a failed fast read must not leave python-docx mid-file
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+def read_docx_paragraphs(source: Union[str, bytes]) -> List[str]:
+    """
+    Text of every paragraph of a DOCX file (path) or of its bytes (e.g. an
+    archive member), in order. Raises on unreadable files.
+    Uses the streaming reader (parser/fast_docx.py) when enabled and falls back
+    to python-docx for packages it does not handle or cannot read, so broken
+    files still fail the same way; any other error is a bug and propagates.
+    """
+    if FAST_DOCX_ENABLED:
+        try:
+            return read_docx_paragraphs_fast(_docx_source(source))
+        except _FAST_DOCX_FALLBACK_ERRORS:
+            pass
+    document = Document(_docx_source(source))
+    return [para.text for para in document.paragraphs]
+
 def parse_docx_cv(file_path: str) -> Dict[str, Any]:
     """
     Parses a DOCX CV file and reconstructs the structured dictionary.
     """
     try:
-        document = Document(file_path)
-        # Rebuild the text content, preserving paragraph breaks
-        text = "\n".join([para.text for para in document.paragraphs if para.text])
+        paragraphs = read_docx_paragraphs(file_path)
     except Exception as e:
         print(f"Error reading or parsing DOCX file {file_path}: {e}")
         return {}
+    return parse_cv_paragraphs(paragraphs)
+
+_CV_TOP_LEVEL_KEYS = {"id", "name", "title", "experience_years_total", "remote_preference", "location_city", "location_country"}
+
 
-    # Initialize with default structure
-    cv_data = {
-        "experiences": [], 
+def _empty_cv() -> Dict[str, Any]:
+    return {
+        "experiences": [],
         "skills": {},
-        "education": [], 
+        "education": [],
         "languages": {},
         "certs": [],
         "location": {}
     }
-    
-    header_part = text.split('###')[0]
-    top_level_keys = ["id", "name", "title", "experience_years_total", "remote_preference", "location_city", "location_country"]
-    
-    for line in header_part.split('\n'):
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key_norm = key.strip().lower().replace(' ', '_')
-            value_norm = value.strip()
-            
-            if key_norm in top_level_keys:
+
+def parse_cv_paragraphs(paragraphs: List[str]) -> Dict[str, Any]:
+    """
+    Builds the CV dictionary from the paragraph texts of a CV document.
+    Sections come from parser/sections.tokenize_sections (one split of the
+    text, paragraph breaks preserved).
+    """
+    return _finish_cv(_cv_from_sections(tokenize_sections(paragraphs)))
+
+def _cv_from_sections(sections: Iterable[Section]) -> Dict[str, Any]:
+    cv_data = _empty_cv()
+    for section, lines in sections:
+        if section is None:
+            for key, sep, value in key_values(lines):
+                if not sep:
+                    continue
+                key_norm = norm_key(key)
                 if key_norm == 'location_city':
-                    cv_data["location"]["city"] = value_norm
+                    cv_data["location"]["city"] = value.strip()
                 elif key_norm == 'location_country':
-                    cv_data["location"]["country"] = value_norm
-                else:
-                    cv_data[key_norm] = value_norm
-
-    sections = re.split(r'###\s*(.*?)\s*###', text)
-    
-    for i in range(1, len(sections), 2):
-        section_title = sections[i].strip().lower()
-        section_content = sections[i+1].strip()
-        
-        if section_title == 'skills':
-            for line in section_content.split('\n'):
-                if ':' in line:
-                    skill, level = line.split(':', 1)
-                    canonical_skill = get_canonical_skill(skill.strip())
-                    cv_data["skills"][canonical_skill] = level.strip()
-        
-        elif section_title == 'education':
-            cv_data["education"] = [edu.strip() for edu in section_content.split('\n') if edu.strip()]
-
-        elif section_title == 'languages':
-            for line in section_content.split('\n'):
-                if ':' in line:
-                    lang, level = line.split(':', 1)
-                    cv_data["languages"][lang.strip()] = level.strip()
-
-        elif section_title == 'certifications':
-            cv_data["certs"] = [cert.strip() for cert in section_content.split('\n') if cert.strip()]
-            
-        elif section_title == 'experience':
-            experience_blocks = section_content.split('---')
-            for block in experience_blocks:
-                if block.strip():
-                    parsed_exp = parse_experience(block)
-                    if parsed_exp:
-                        cv_data["experiences"].append(parsed_exp)
+                    cv_data["location"]["country"] = value.strip()
+                elif key_norm in _CV_TOP_LEVEL_KEYS:
+                    cv_data[key_norm] = value.strip()
+
+        elif section == 'skills':
+            skills = cv_data["skills"]
+            for key, sep, value in key_values(lines):
+                if sep:
+                    skills[canonical_skill(key)] = value.strip()
+
+        elif section == 'experience':
+            # Blocks are cut on the text, as a --- may sit inside a line
+            for block in "\n".join(lines).split('---'):
+                parsed_exp = parse_experience(block)
+                if parsed_exp:
+                    cv_data["experiences"].append(parsed_exp)
+
+        elif section == 'education':
+            cv_data["education"] = list_items(lines)
+
+        elif section == 'languages':
+            languages = cv_data["languages"]
+            for key, sep, value in key_values(lines):
+                if sep:
+                    languages[key.strip()] = value.strip()
+
+        elif section == 'certifications':
+            cv_data["certs"] = list_items(lines)
+    return cv_data
 
+def _finish_cv(cv_data: Dict[str, Any]) -> Dict[str, Any]:
     if 'experience_years_total' in cv_data and cv_data['experience_years_total']:
         try:
             cv_data['experience_years_total'] = float(cv_data['experience_years_total'])
@@ -107,7 +142,7 @@ def parse_docx_cv(file_path: str) -> Dict[str, Any]:
         city_match = next((c for c in CITIES if c["city"].lower() == city.lower()), None)
         if city_match:
             cv_data["location"].update({"lat": city_match["lat"], "lon": city_match["lon"]})
-            
+
     return cv_data
 
 
@@ -116,12 +151,14 @@ def parse_docx_jd(file_path: str) -> Dict[str, Any]:
     Parses a DOCX JD file and reconstructs the structured dictionary.
     """
     try:
-        document = Document(file_path)
+        paragraphs = read_docx_paragraphs(file_path)
     except Exception as e:
         print(f"Error reading or parsing DOCX JD file {file_path}: {e}")
         return {}
+    return parse_jd_paragraphs(paragraphs)
 
-    jd_data = {
+def _empty_jd() -> Dict[str, Any]:
+    return {
         "must_have": [],
         "nice_to_have": [],
         "min_skill_years": {},
@@ -129,60 +166,64 @@ def parse_docx_jd(file_path: str) -> Dict[str, Any]:
         "location_policy": {},
         "description": ""
     }
-    
-    current_section = None
-    paragraphs = [p.text.strip() for p in document.paragraphs if p.text.strip()]
-
-    for para in paragraphs:
-        if para.startswith('###') and para.endswith('###'):
-            current_section = para.strip('# ').strip().lower()
-            continue
-
-        if current_section is None:
-            if ':' in para:
-                key, value = para.split(':', 1)
-                key_norm = key.strip().lower().replace(' ', '_')
-                value = value.strip()
+
+def parse_jd_paragraphs(paragraphs: List[str]) -> Dict[str, Any]:
+    """Builds the JD dictionary from the paragraph texts of a JD document."""
+    paragraphs = [para for para in map(str.strip, paragraphs) if para]
+    # JD markers are whole paragraphs: '###' inside a description line is text
+    jd_data = _jd_from_sections(tokenize_sections(paragraphs, inline_markers=False))
+
+    if 'max_km' in jd_data.get('location_policy', {}):
+        try:
+            jd_data['location_policy']['max_km'] = int(jd_data['location_policy']['max_km'])
+        except (ValueError, TypeError):
+            pass
+
+    jd_data["embeddings"] = {"jd_vec": []}
+
+    return jd_data
+
+def _jd_from_sections(sections: Iterable[Section]) -> Dict[str, Any]:
+    # JD lines are whole paragraphs, already stripped and non-empty
+    jd_data = _empty_jd()
+    description = []
+    for section, lines in sections:
+        if section is None:
+            for key, sep, value in key_values(lines):
+                if not sep:
+                    continue
+                key_norm = norm_key(key)
                 if key_norm in ['id', 'role']:
-                    jd_data[key_norm] = value
+                    jd_data[key_norm] = value.strip()
                 elif key_norm == 'min_total_years':
                     try:
-                        jd_data[key_norm] = int(value)
+                        jd_data[key_norm] = int(value.strip())
                     except ValueError:
                         jd_data[key_norm] = 0
-        
-        elif current_section == 'description':
-            jd_data['description'] += (' ' if jd_data['description'] else '') + para
 
-        elif current_section == 'must have':
-            jd_data['must_have'].extend([item.strip() for item in para.split(',')])
+        elif section == 'description':
+            description.extend(lines)
 
-        elif current_section == 'nice to have':
-            jd_data['nice_to_have'].extend([item.strip() for item in para.split(',')])
+        elif section == 'must have':
+            jd_data['must_have'].extend([item.strip() for para in lines for item in para.split(',')])
 
-        elif current_section == 'location policy':
-            if ':' in para:
-                key, value = para.split(':', 1)
-                key_norm = key.strip().lower().replace(' ', '_')
-                value = value.strip()
-                jd_data['location_policy'][key_norm] = value
+        elif section == 'nice to have':
+            jd_data['nice_to_have'].extend([item.strip() for para in lines for item in para.split(',')])
 
-        elif current_section == 'min skill years':
-            if ':' in para:
-                key, value = para.split(':', 1)
-                jd_data['min_skill_years'][key.strip()] = int(value.strip())
+        elif section == 'location policy':
+            for key, sep, value in key_values(lines):
+                if sep:
+                    jd_data['location_policy'][norm_key(key)] = value.strip()
 
-        elif current_section == 'weights':
-            if ':' in para:
-                key, value = para.split(':', 1)
-                jd_data['weights'][key.strip()] = float(value.strip())
+        elif section == 'min skill years':
+            for key, sep, value in key_values(lines):
+                if sep:
+                    jd_data['min_skill_years'][key.strip()] = int(value.strip())
 
-    if 'max_km' in jd_data.get('location_policy', {}):
-        try:
-            jd_data['location_policy']['max_km'] = int(jd_data['location_policy']['max_km'])
-        except (ValueError, TypeError):
-            pass
+        elif section == 'weights':
+            for key, sep, value in key_values(lines):
+                if sep:
+                    jd_data['weights'][key.strip()] = float(value.strip())
 
-    jd_data["embeddings"] = {"jd_vec": []}
-            
+    jd_data['description'] = ' '.join(description)
     return jd_data
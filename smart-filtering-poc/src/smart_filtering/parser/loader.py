@@ -0,0 +1,252 @@
+# src/parser/loader.py
+
+import hashlib
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from smart_filtering.config import load_config
+from smart_filtering.parser.archive import is_archive, iter_archive_docx, member_path
+from smart_filtering.parser.cache import ParseCache
+from smart_filtering.parser.docx_parser import parse_cv_paragraphs, parse_jd_paragraphs, read_docx_paragraphs
+
+CONFIG = load_config()
+PARSER_CFG = CONFIG.get("parser", {})
+# 0 = one worker per CPU; 1 parses in-process
+DEFAULT_WORKERS = int(PARSER_CFG.get("workers", 0) or 0)
+DEFAULT_CHUNK_SIZE = int(PARSER_CFG.get("chunk_size", 64))
+PARSE_CACHE_ENABLED = bool(PARSER_CFG.get("cache", True))
+PARSE_CACHE_DIR = "parse_cache"
+
+_PARSERS = {"cv": parse_cv_paragraphs, "jd": parse_jd_paragraphs}
+
+# (path, parsed record or None, error message or None)
+FileResult = Tuple[str, Optional[Dict[str, Any]], Optional[str]]
+
+
+class LoadResult:
+    """Parsed records in input order plus the (path, error) of every file that failed."""
+
+    def __init__(self, records: List[Dict[str, Any]], errors: List[Tuple[str, str]], cached: int = 0):
+        self.records = records
+        self.errors = errors
+        self.cached = cached  # records served from the parse cache
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+def list_docx(directory: Union[str, Path]) -> List[Path]:
+    """DOCX files of a folder in sorted order, skipping Word lock files (~$...)."""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    return [path for path in sorted(directory.glob("*.docx")) if not path.name.startswith("~")]
+
+
+def parse_file(path: str, kind: str = "cv", data: Optional[bytes] = None) -> FileResult:
+    """
+    Parse one CV/JD file, returning the error instead of raising or printing it.
+    With `data` the document is read from those bytes and `path` only labels it.
+    """
+    try:
+        record = _PARSERS[kind](read_docx_paragraphs(path if data is None else data))
+    except Exception as e:  # any broken file is reported, never fatal for the batch
+        return path, None, f"{type(e).__name__}: {e}"
+    if not record.get("id"):
+        return path, None, "Documento sin campo Id"
+    return path, record, None
+
+
+def _parse_chunk(paths: List[str], kind: str) -> List[FileResult]:
+    return [parse_file(path, kind) for path in paths]
+
+
+def _parse_blob_chunk(items: List[Tuple[str, bytes]], kind: str) -> List[FileResult]:
+    return [parse_file(path, kind, data) for path, data in items]
+
+
+def _resolve_workers(workers: Optional[int]) -> int:
+    workers = DEFAULT_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _parse_paths(paths: List[str], kind: str, workers: Optional[int], chunk_size: int) -> List[FileResult]:
+    chunk_size = max(1, chunk_size)
+    chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    workers = min(_resolve_workers(workers), len(chunks))
+    if workers <= 1:
+        return _parse_chunk(paths, kind)
+    # spawn: the UI process may hold torch threads, which fork does not copy safely
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return [item for chunk in pool.map(_parse_chunk, chunks, [kind] * len(chunks)) for item in chunk]
+
+
+def _parse_blobs(
+    items: Iterable[Tuple[str, bytes]], kind: str, workers: Optional[int], chunk_size: int
+) -> Iterator[FileResult]:
+    """
+    _parse_paths for documents held in memory, consumed lazily: at most
+    2 * workers chunks are read ahead of the pool, so an archive much larger
+    than RAM streams through. Results keep the input order.
+    """
+    items = iter(items)
+    chunks = iter(lambda: list(islice(items, max(1, chunk_size))), [])
+    head = list(islice(chunks, 2))
+    workers = _resolve_workers(workers)
+    if workers <= 1 or len(head) < 2:
+        # A single chunk is not worth the pool start-up
+        for chunk in chain(head, chunks):
+            yield from _parse_blob_chunk(chunk, kind)
+        return
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for chunk in chain(head, chunks):
+            pending.append(pool.submit(_parse_blob_chunk, chunk, kind))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load_docx_files(
+    paths: Sequence[Union[str, Path]],
+    kind: str = "cv",
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: Optional[ParseCache] = None,
+) -> LoadResult:
+    """
+    Parse `paths` as CVs or JDs (`kind`) with a process pool fed with chunks
+    of `chunk_size` files. Results keep the order of `paths` regardless of
+    which worker finishes first; unreadable files and documents without an
+    Id end up in LoadResult.errors. Small inputs or workers <= 1 are parsed
+    in-process to skip the pool start-up cost. With a `cache`, unchanged
+    files are served from it and only new or modified ones are parsed.
+    """
+    if kind not in _PARSERS:
+        raise ValueError(f"Unknown document kind {kind!r}; expected one of {sorted(_PARSERS)}")
+    paths = [str(path) for path in paths]
+    hits, to_parse = cache.lookup(paths, kind) if cache is not None else ({}, paths)
+    parsed = {path: (record, error) for path, record, error in _parse_paths(to_parse, kind, workers, chunk_size)}
+    if cache is not None:
+        for path, (record, error) in parsed.items():
+            if error is None:
+                cache.put(path, kind, record)
+
+    records: List[Dict[str, Any]] = []
+    errors: List[Tuple[str, str]] = []
+    for path in paths:
+        if path in hits:
+            records.append(hits[path])
+            continue
+        record, error = parsed[path]
+        if error is None:
+            records.append(record)
+        else:
+            errors.append((path, error))
+    return LoadResult(records, errors, cached=len(hits))
+
+
+def load_docx_dir(
+    directory: Union[str, Path],
+    kind: str = "cv",
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> LoadResult:
+    """
+    load_docx_files over list_docx(directory). With `cache_dir` (normally
+    <data.processed_dir>/parse_cache) the parse cache is read, updated, pruned
+    of files deleted from `directory` and saved again; a warm start on an
+    unchanged folder never opens a DOCX.
+    """
+    paths = list_docx(directory)
+    cache = ParseCache(cache_dir) if cache_dir is not None and PARSE_CACHE_ENABLED else None
+    result = load_docx_files(paths, kind=kind, workers=workers, chunk_size=chunk_size, cache=cache)
+    if cache is not None:
+        cache.evict_missing(directory, kind, paths)
+        cache.save()
+    return result
+
+
+def load_docx_archive(
+    archive_path: Union[str, Path],
+    kind: str = "cv",
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> LoadResult:
+    """
+    Parse the .docx members of a zip or tar(.gz) archive without extracting
+    it: member bytes are streamed from parser/archive.iter_archive_docx to
+    the worker pool in chunks. Members are reported as '<archive>!<member>'
+    in LoadResult.errors, including those that cannot even be read (corrupt
+    or truncated). With `cache_dir`, members are looked up in the
+    parse cache by the sha1 of their bytes, so a warm start decompresses the
+    archive but parses nothing that did not change.
+    """
+    if kind not in _PARSERS:
+        raise ValueError(f"Unknown document kind {kind!r}; expected one of {sorted(_PARSERS)}")
+    cache = ParseCache(cache_dir) if cache_dir is not None and PARSE_CACHE_ENABLED else None
+    members: List[Tuple[str, str]] = []  # (path, sha1) in archive order
+    hits: Dict[int, Dict[str, Any]] = {}
+    read_errors: Dict[int, str] = {}
+    to_parse: List[int] = []
+
+    def pending_members() -> Iterator[Tuple[str, bytes]]:
+        for member, data, error in iter_archive_docx(archive_path):
+            path = member_path(archive_path, member)
+            if error is not None:
+                read_errors[len(members)] = error
+                members.append((path, ""))
+                continue
+            sha1 = hashlib.sha1(data).hexdigest()
+            record = cache.lookup_content(path, kind, sha1) if cache is not None else None
+            if record is not None:
+                hits[len(members)] = record
+            else:
+                to_parse.append(len(members))
+                yield path, data
+            members.append((path, sha1))
+
+    parsed = dict(zip(to_parse, list(_parse_blobs(pending_members(), kind, workers, chunk_size))))
+
+    records: List[Dict[str, Any]] = []
+    errors: List[Tuple[str, str]] = []
+    for index, (path, sha1) in enumerate(members):
+        if index in hits:
+            records.append(hits[index])
+            continue
+        if index in read_errors:
+            errors.append((path, read_errors[index]))
+            continue
+        _, record, error = parsed[index]
+        if error is None:
+            records.append(record)
+            if cache is not None:
+                cache.put_content(path, kind, sha1, record)
+        else:
+            errors.append((path, error))
+    if cache is not None:
+        cache.evict_missing_members(archive_path, kind, [path for path, _ in members])
+        cache.save()
+    return LoadResult(records, errors, cached=len(hits))
+
+
+def load_docx_source(
+    source: Union[str, Path],
+    kind: str = "cv",
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> LoadResult:
+    """load_docx_archive for a zip/tar archive, load_docx_dir for a folder."""
+    loader = load_docx_archive if is_archive(source) else load_docx_dir
+    return loader(source, kind=kind, workers=workers, chunk_size=chunk_size, cache_dir=cache_dir)
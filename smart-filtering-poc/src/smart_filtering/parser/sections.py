@@ -0,0 +1,84 @@
+# src/parser/sections.py
+
+import re
+from functools import lru_cache
+from itertools import repeat
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from smart_filtering.normalizer.skills_taxonomy import get_canonical_skill
+
+MARKER = "###"
+
+# A section: its lower-cased title (None for the header before the first marker) and its raw lines
+Section = Tuple[Optional[str], List[str]]
+# A line split on its first ':' -> (key, ':', value); (line, '', '') when it has none. Never stripped.
+KeyValue = Tuple[str, str, str]
+
+
+# Only for irregular layouts; \s* lets a marker's closing ### sit on the next line
+_MARKER_RE = re.compile(r"###\s*(.*?)\s*###")
+
+
+def tokenize_sections(paragraphs: List[str], inline_markers: bool = True) -> List[Section]:
+    """
+    Cut the paragraph texts of a CV or JD into sections, shared by both parsers.
+
+    With `inline_markers` (CVs) '###' counts wherever it appears: the non-empty
+    paragraphs are joined into one text and cut with a single str.split on
+    '###' (one C pass, no regex), pieces alternating header, title, body...
+    That is exact when titles are one-line and '#'-free. The rare layouts
+    where it is not (a marker spanning lines, an unclosed ###) are cut with
+    one re.split instead; an unclosed ### then stays in the text of the
+    section it falls in.
+
+    Without it (JDs) only a whole paragraph starting and ending with '###'
+    is a marker and every other paragraph is one line, '###' included;
+    callers pass the paragraphs already stripped and non-empty.
+    """
+    if not inline_markers:
+        sections: List[Section] = []
+        section: Optional[str] = None
+        lines: List[str] = []
+        for para in paragraphs:
+            if para.startswith(MARKER) and para.endswith(MARKER):
+                sections.append((section, lines))
+                section, lines = para.strip("# ").strip().lower(), []
+            else:
+                lines.append(para)
+        sections.append((section, lines))
+        return sections
+
+    text = "\n".join([para for para in paragraphs if para])
+    pieces = text.split(MARKER)
+    titles = pieces[1::2]
+    joined = "".join(titles)
+    if len(pieces) % 2 == 0 or "\n" in joined or "#" in joined:
+        header = pieces[0]
+        pieces = _MARKER_RE.split(text)
+        pieces[0] = header  # header is everything before the first ###, marker or not
+        titles = pieces[1::2]
+    sections = [(None, pieces[0].split("\n"))]
+    sections.extend(zip([title.strip().lower() for title in titles], [body.split("\n") for body in pieces[2::2]]))
+    return sections
+
+
+def key_values(lines: Iterable[str]) -> Iterator[KeyValue]:
+    """The (key, value) events of a section: one (key, sep, value) per line, split on the first ':'."""
+    return map(str.partition, lines, repeat(":"))
+
+
+def list_items(lines: Iterable[str]) -> List[str]:
+    """Stripped, non-empty lines of a section."""
+    return [line for line in map(str.strip, lines) if line]
+
+
+@lru_cache(maxsize=4096)
+def norm_key(key: str) -> str:
+    """' Experience Years Total' -> 'experience_years_total' (memoized: keys repeat across documents)."""
+    return key.strip().lower().replace(" ", "_")
+
+
+@lru_cache(maxsize=4096)
+def canonical_skill(name: str) -> str:
+    """get_canonical_skill of a raw, unstripped skill name (memoized)."""
+    return get_canonical_skill(name.strip())
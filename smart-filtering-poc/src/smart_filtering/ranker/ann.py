@@ -0,0 +1,301 @@
+# src/ranker/ann.py
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from smart_filtering.config import load_config
+from smart_filtering.ranker.similarity import cosine_similarity_to, l2_normalize
+
+CONFIG = load_config()
+ANN_CFG = CONFIG.get("ranking", {}).get("ann", {})
+DEFAULT_N_PROBE = int(ANN_CFG.get("n_probe", 8))
+ANN_INDEX_FILE = "cv_ann_index.npz"
+
+_ASSIGN_CHUNK_ROWS = 16384
+# k-means only needs a sample to place centroids; every vector is still assigned to a list
+_TRAIN_POINTS_PER_LIST = 64
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max cosine) for each normalized row, in chunks to bound memory."""
+    labels = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_CHUNK_ROWS):
+        chunk = vectors[start:start + _ASSIGN_CHUNK_ROWS]
+        labels[start:start + _ASSIGN_CHUNK_ROWS] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """K-means on the unit sphere (cosine); returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, min(n_clusters, vectors.shape[0]))
+    centroids = vectors[rng.choice(vectors.shape[0], size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        order = np.argsort(labels, kind="stable")
+        present = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts[present])[:-1]])
+        sums[present] = np.add.reduceat(vectors[order], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random points so every list stays usable
+            sums[empty] = vectors[rng.choice(vectors.shape[0], size=int(empty.sum()))]
+        new_centroids = l2_normalize(sums)
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over normalized embeddings (pure NumPy).
+
+    Vectors are clustered with spherical k-means into `n_lists` lists; a query
+    only scores the vectors of its `n_probe` closest lists. `n_probe` is the
+    recall/speed knob: n_probe == n_lists is an exact search.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        offsets: np.ndarray,
+        model: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ):
+        self.centroids = centroids
+        self.vectors = vectors  # normalized, grouped by list
+        self.ids = ids  # ids in the same order as `vectors`
+        self.offsets = offsets  # list l spans vectors[offsets[l]:offsets[l + 1]]
+        self.model = model  # embedding model of the vectors; queries must come from the same one
+        self.fingerprint = fingerprint  # cv_index_fingerprint of the corpus, for build_cv_index indexes
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.vectors.shape[1])
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        ids: Sequence[Any],
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        seed: int = 0,
+        model: Optional[str] = None,
+    ) -> "IVFIndex":
+        """Cluster `vectors` (one row per id) into inverted lists. Default n_lists ~ sqrt(N)."""
+        vectors = l2_normalize(vectors).astype(np.float32)
+        ids = np.asarray(ids)
+        if vectors.shape[0] != ids.shape[0]:
+            raise ValueError("vectors and ids must have the same length")
+        if vectors.shape[0] == 0:
+            raise ValueError("Cannot build an index without vectors")
+        if n_lists is None:
+            n_lists = ANN_CFG.get("n_lists") or int(np.sqrt(vectors.shape[0]))
+
+        n_lists = max(1, min(int(n_lists), vectors.shape[0]))
+        train = vectors
+        max_train = n_lists * _TRAIN_POINTS_PER_LIST
+        if vectors.shape[0] > max_train:
+            train = vectors[np.random.default_rng(seed).choice(vectors.shape[0], size=max_train, replace=False)]
+        centroids = spherical_kmeans(train, n_lists, n_iter=n_iter, seed=seed).astype(np.float32)
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=centroids.shape[0]))])
+        return cls(centroids, vectors[order], ids[order], offsets.astype(np.int64), model)
+
+    def search(self, query: np.ndarray, k: int, n_probe: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Top-k (id, cosine similarity) pairs among the `n_probe` closest lists, best first."""
+        query = l2_normalize(query)[0].astype(np.float32)
+        n_probe = min(self.n_lists, n_probe or DEFAULT_N_PROBE)
+        lists = np.argsort(-(self.centroids @ query))[:n_probe]
+        rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        if rows.size == 0 or k <= 0:
+            return []
+
+        scores = self.vectors[rows] @ query
+        k = min(k, rows.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[rows[i]].item(), float(scores[i])) for i in top]
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write through a temp file so a crash mid-write never leaves a truncated index to load
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                vectors=self.vectors,
+                ids=self.ids,
+                offsets=self.offsets,
+                model=np.array("" if self.model is None else self.model),
+                fingerprint=np.array(self.fingerprint or ""),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], fingerprint: Optional[str] = None) -> Optional["IVFIndex"]:
+        """The persisted index, or None when missing, unreadable or (given `fingerprint`) built for another corpus."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                stored = str(data["fingerprint"]) if "fingerprint" in data else ""
+                if fingerprint is not None and stored != fingerprint:
+                    return None
+                model = str(data["model"]) if "model" in data else ""
+                arrays = (data["centroids"], data["vectors"], data["ids"], data["offsets"])
+                return cls(*arrays, model or None, stored or None)
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def _vector_rows(cvs: List[Dict[str, Any]], slot: str, model: Optional[str]) -> List[int]:
+    """Positions of the CVs with a precomputed `slot` vector built with `model`."""
+    return [
+        i
+        for i, cv in enumerate(cvs)
+        if len((cv.get("embeddings") or {}).get(slot, [])) > 0 and cv["embeddings"].get("model") == model
+    ]
+
+
+def _corpus_model(cvs: List[Dict[str, Any]], slot: str) -> Optional[str]:
+    """Embedding model of the first CV with a precomputed `slot` vector."""
+    vectored = (cv for cv in cvs if len((cv.get("embeddings") or {}).get(slot, [])) > 0)
+    return next((cv["embeddings"].get("model") for cv in vectored), None)
+
+
+def cv_index_fingerprint(cvs: List[Dict[str, Any]], slot: str = "skills_vec", model: Optional[str] = None) -> str:
+    """
+    sha1 of the model, the corpus size and every indexed position with its
+    vector bytes: a persisted index is only valid for the same vectors at
+    the same positions.
+    """
+    model = _corpus_model(cvs, slot) if model is None else model
+    digest = hashlib.sha1(f"{model}\x1f{slot}\x1f{len(cvs)}".encode("utf-8"))
+    for row in _vector_rows(cvs, slot, model):
+        vector = np.ascontiguousarray(cvs[row]["embeddings"][slot])
+        digest.update(f"\x1e{row}:{vector.dtype.str}:".encode("utf-8"))
+        digest.update(vector)
+    return digest.hexdigest()
+
+
+def build_cv_index(
+    cvs: List[Dict[str, Any]],
+    slot: str = "skills_vec",
+    n_lists: Optional[int] = None,
+    seed: int = 0,
+    model: Optional[str] = None,
+) -> IVFIndex:
+    """
+    Index the precomputed cv["embeddings"][slot] vectors (see
+    embedder/vectors.ingest_cv_embeddings) of the CVs built with `model`
+    (default: the model of the first CV with a vector). Ids are positions in
+    `cvs`, so duplicate CV ids stay distinct; CVs without a vector are not
+    indexed and retrieve_candidates passes them through.
+    """
+    if model is None:
+        model = _corpus_model(cvs, slot)
+    rows = _vector_rows(cvs, slot, model)
+    if not rows:
+        raise ValueError(f"No CV has a precomputed '{slot}'; run ingest_cv_embeddings first.")
+    vectors = np.vstack([cvs[i]["embeddings"][slot] for i in rows])
+    index = IVFIndex.build(vectors, rows, n_lists=n_lists, seed=seed, model=model)
+    index.fingerprint = cv_index_fingerprint(cvs, slot, model)
+    return index
+
+
+def load_or_build_cv_index(
+    cvs: List[Dict[str, Any]],
+    path: Optional[Union[str, Path]] = None,
+    slot: str = "skills_vec",
+    n_lists: Optional[int] = None,
+) -> Optional[IVFIndex]:
+    """
+    The index persisted at `path` if it was built from these exact vectors,
+    otherwise a new one (saved to `path`); k-means only runs when the corpus
+    changed. None when no CV has a precomputed vector (e.g. offline mode).
+    """
+    model = _corpus_model(cvs, slot)
+    if model is None and not _vector_rows(cvs, slot, model):
+        return None
+    fingerprint = cv_index_fingerprint(cvs, slot, model)
+    index = IVFIndex.load(path, fingerprint) if path is not None else None
+    if index is None:
+        index = build_cv_index(cvs, slot=slot, n_lists=n_lists, model=model)
+        if path is not None:
+            index.save(path)
+    return index
+
+
+def _exact_search(cvs: List[Dict[str, Any]], rows: List[int], slot: str, query: np.ndarray, k: int) -> List[int]:
+    """Positions (among `rows`) of the `k` vectors closest to `query`, best first: brute-force cosine."""
+    scores = cosine_similarity_to(np.vstack([cvs[row]["embeddings"][slot] for row in rows]), query)
+    k = min(k, len(rows))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [rows[i] for i in top.tolist()]
+
+
+def retrieve_candidates(
+    cvs: List[Dict[str, Any]],
+    jd: Dict[str, Any],
+    top_m: int,
+    index: Optional[IVFIndex] = None,
+    slot: str = "skills_vec",
+    query_slot: str = "jd_vec",
+    n_probe: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    The `top_m` CVs semantically closest to the JD (best first), so only they
+    go through calculate_score, followed by every CV without a comparable
+    precomputed vector, which cannot be ruled out. With `index` (a
+    build_cv_index / load_or_build_cv_index of exactly `cvs`) only its
+    `n_probe` closest lists are searched; without one the search is exact.
+    Returns all CVs unchanged when the JD has no usable vector (e.g. offline
+    mode) or one from another model or dimension, since there is nothing to
+    retrieve on.
+    """
+    embeddings = jd.get("embeddings") or {}
+    query = embeddings.get(query_slot)
+    if query is None or len(query) == 0 or not np.any(query) or len(cvs) <= top_m:
+        return cvs
+    query = np.asarray(query)
+    model = embeddings.get("model")
+    if index is None:
+        covered = _vector_rows(cvs, slot, model)
+        if not covered or len(cvs[covered[0]]["embeddings"][slot]) != len(query):
+            return cvs
+        hits = _exact_search(cvs, covered, slot, query, top_m)
+    else:
+        if index.model != model or index.dim != len(query):
+            return cvs
+        covered = index.ids.astype(np.int64)
+        if covered.size and int(covered.max()) >= len(cvs):
+            raise ValueError(f"The index covers {int(covered.max()) + 1}+ CVs but {len(cvs)} were given")
+        hits = [int(row) for row, _ in index.search(query, top_m, n_probe=n_probe)]
+
+    uncovered = np.ones(len(cvs), dtype=bool)
+    uncovered[covered] = False
+    return [cvs[row] for row in hits] + [cvs[row] for row in np.flatnonzero(uncovered).tolist()]
@@ -0,0 +1,133 @@
+# src/ranker/cascade.py
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from smart_filtering.config import load_config
+from smart_filtering.explainer.explain import generate_explanation
+from smart_filtering.ranker.compiled import CompiledJD
+from smart_filtering.ranker.features import extract_features_batch
+from smart_filtering.ranker.score import calculate_scores_batch, rule_ko_mask, rule_scores, score_details
+from smart_filtering.ranker.skill_matrix import SkillMatrix
+
+CONFIG = load_config()
+CASCADE_CFG = CONFIG.get("ranking", {}).get("cascade", {})
+DEFAULT_TOP_M = CASCADE_CFG.get("top_m", 200)
+DEFAULT_TOP_K = CASCADE_CFG.get("top_k", 20)
+DEFAULT_EXPLAIN = bool(CASCADE_CFG.get("explain", True))
+
+STAGES = ("rules", "semantic", "explain")
+# How the CLI and the UI name each stage when reporting timings
+STAGE_LABELS = {"rules": "reglas", "semantic": "semántica", "explain": "explicaciones"}
+
+
+class CascadeResult:
+    """
+    Result of rank_cascade, best first: `docs` are positions in the ranked
+    `cvs`, `batch` their calculate_scores_batch rows, `features` their
+    feature dicts and `explanations` their explanation text (None when the
+    explain stage did not run). `timings` holds the seconds spent in each
+    stage that ran and `sizes` how many CVs entered it (see STAGES).
+    """
+
+    def __init__(
+        self,
+        docs: np.ndarray,
+        batch: np.ndarray,
+        features: List[Dict[str, Any]],
+        explanations: Optional[List[str]],
+        timings: Dict[str, float],
+        sizes: Dict[str, int],
+    ):
+        self.docs = docs
+        self.batch = batch
+        self.features = features
+        self.explanations = explanations
+        self.timings = timings
+        self.sizes = sizes
+
+    def __len__(self) -> int:
+        return int(self.docs.shape[0])
+
+
+def rank_cascade(
+    cvs: List[Dict[str, Any]],
+    jd: Dict[str, Any],
+    top_m: Optional[int] = None,
+    top_k: Optional[int] = None,
+    explain: Optional[bool] = None,
+    compiled: Optional[CompiledJD] = None,
+    skill_matrix: Optional[SkillMatrix] = None,
+    exclude_ko: bool = False,
+    prepare: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+) -> CascadeResult:
+    """
+    Rank `cvs` in stages so latency is bounded by M and K, not by the pool:
+
+    1. rules: every CV gets the rule part of the score (must-have coverage,
+       experience, location, education and skill alignment, from the
+       SkillMatrix and one vectorized pass, no embeddings) and only the
+       `top_m` best go on (ties in corpus order).
+    2. semantic: those get the full features (embedding similarities) and
+       the exact score of calculate_scores_batch; the `top_k` best are kept.
+    3. explain (optional): generate_explanation for each of the top-K.
+
+    `top_m`, `top_k` and `explain` default to ranking.cascade in the config;
+    0 / null means no cut. Unlike rank_top_k this is an approximation: a CV
+    outside the rule top-M never reaches the semantic stage. `exclude_ko`
+    drops knocked-out CVs already in stage 1 (all KO rules are rule-based).
+    `prepare(stage_cvs)`, when given, runs at the start of stage 2 on the
+    top-M only (e.g. DeferredCVIngest, so the rest are never embedded).
+    """
+    compiled = CompiledJD.of(jd, compiled)
+    top_m = DEFAULT_TOP_M if top_m is None else top_m
+    top_k = DEFAULT_TOP_K if top_k is None else top_k
+    explain = DEFAULT_EXPLAIN if explain is None else explain
+    timings: Dict[str, float] = {}
+    sizes: Dict[str, int] = {}
+
+    # --- Stage 1: rule-based score over the whole pool ---
+    start = time.perf_counter()
+    sizes["rules"] = len(cvs)
+    if skill_matrix is None:
+        skill_matrix = SkillMatrix.from_cvs(cvs)
+    docs = np.arange(len(cvs))
+    if exclude_ko and cvs:
+        docs = np.flatnonzero(~rule_ko_mask(cvs, compiled, skill_matrix))
+    if top_m and top_m < docs.size:
+        rule_score = rule_scores(cvs, compiled, skill_matrix)[docs]
+        docs = np.sort(docs[np.argsort(-rule_score, kind="stable")[:top_m]])
+    timings["rules"] = time.perf_counter() - start
+
+    # --- Stage 2: embeddings and exact score for the top-M only ---
+    start = time.perf_counter()
+    sizes["semantic"] = int(docs.size)
+    stage_cvs = [cvs[doc] for doc in docs.tolist()]
+    stage_matrix = skill_matrix.take(docs)
+    if prepare is not None:
+        prepare(stage_cvs)
+    features = extract_features_batch(stage_cvs, jd, compiled=compiled, skill_matrix=stage_matrix)
+    batch = calculate_scores_batch(stage_cvs, jd, features=features, compiled=compiled, skill_matrix=stage_matrix)
+    # Best score first, ties in corpus order (like a stable sort of the whole pool)
+    order = np.lexsort((docs, -batch["score"]))
+    if exclude_ko:
+        order = order[~batch["ko"][order]]
+    if top_k:
+        order = order[:top_k]
+    docs, batch, features = docs[order], batch[order], [features[row] for row in order.tolist()]
+    timings["semantic"] = time.perf_counter() - start
+
+    # --- Stage 3: explanations for the final top-K ---
+    explanations = None
+    if explain:
+        start = time.perf_counter()
+        sizes["explain"] = int(docs.size)
+        explanations = [
+            generate_explanation(cvs[doc], jd, score_details(batch, row, features[row]))
+            for row, doc in enumerate(docs.tolist())
+        ]
+        timings["explain"] = time.perf_counter() - start
+
+    return CascadeResult(docs, batch, features, explanations, timings, sizes)
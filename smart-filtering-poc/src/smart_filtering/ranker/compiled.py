@@ -0,0 +1,78 @@
+# src/ranker/compiled.py
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from smart_filtering.generator.cv_generator import CITIES
+from smart_filtering.normalizer.skills_taxonomy import get_canonical_skill
+
+EMBEDDER_MODE = os.getenv("SMART_FILTERING_EMBEDDER_MODE", "").lower()
+
+WEIGHT_KEYS = ("skill_semantic", "title_semantic", "experience", "location", "education")
+# Extra weight of must-have coverage in the total (see ranker/score.py)
+MUST_HAVE_WEIGHT = 0.1
+
+
+class CompiledJD:
+    """
+    Everything feature extraction and scoring derive from the JD alone,
+    computed once instead of once per CV: canonical must-have and
+    min-skill-years skills, the JD city coordinates, the effective weights
+    (semantic weights zeroed in offline embedder mode) with their sum, and
+    the recruiter's skill-alignment weights.
+
+    Build it once per JD and per weight change (the UI rebuilds it after its
+    sliders) and pass it as `compiled=` to extract_features[_batch] and
+    calculate_score[s_batch]; those build one themselves when it is omitted.
+    `jd` is kept as-is for the fields that are only copied into results.
+    """
+
+    def __init__(
+        self,
+        jd: Dict[str, Any],
+        skill_weights: Optional[Dict[str, float]] = None,
+        skill_weight_strength: float = 0.0,
+    ):
+        self.jd = jd
+        self.min_total_years = jd.get("min_total_years", 0)
+
+        # (raw name, canonical name) keeps the JD spelling for KO messages
+        self.must_have: List[Tuple[str, str]] = [(s, get_canonical_skill(s)) for s in jd.get("must_have", [])]
+        self.min_skill_years: List[str] = [get_canonical_skill(s) for s in jd.get("min_skill_years", {})]
+
+        policy = jd.get("location_policy", {})
+        self.location_type = policy.get("type")
+        self.has_city = "city" in policy
+        self.max_km = policy.get("max_km", 0)
+        # Falloff span past max_km; a policy without max_km falls off over 2 km, as it always did
+        self.falloff_km = policy.get("max_km", 1) * 2
+        city = next((c for c in CITIES if c["city"] == policy.get("city")), None) if self.has_city else None
+        self.city_coords: Optional[Tuple[float, float]] = (city["lat"], city["lon"]) if city else None
+
+        weights = jd.get("weights", {})
+        self.weights = {key: weights.get(key, 0.0) for key in WEIGHT_KEYS}
+        if EMBEDDER_MODE == "offline":
+            # No semantic signal offline: drop its weight so the rest is re-balanced
+            self.weights["skill_semantic"] = 0.0
+            self.weights["title_semantic"] = 0.0
+        w = self.weights
+        sum_weights_base = w["skill_semantic"] + w["title_semantic"] + w["experience"] + w["location"] + w["education"]
+        self.skill_weight_strength = skill_weight_strength
+        self.sum_of_weights = sum_weights_base + MUST_HAVE_WEIGHT + skill_weight_strength
+
+        # Skill-alignment vector: canonical skill -> positive recruiter weight, in input order
+        self.skill_weights: Dict[str, float] = {
+            get_canonical_skill(k): v for k, v in (skill_weights or {}).items() if v and v > 0
+        }
+        self.total_skill_weight = sum(self.skill_weights.values())
+
+    @classmethod
+    def of(
+        cls,
+        jd: Dict[str, Any],
+        compiled: Optional["CompiledJD"] = None,
+        skill_weights: Optional[Dict[str, float]] = None,
+        skill_weight_strength: float = 0.0,
+    ) -> "CompiledJD":
+        """`compiled` when the caller already has one, otherwise a fresh one for `jd`."""
+        return compiled if compiled is not None else cls(jd, skill_weights, skill_weight_strength)
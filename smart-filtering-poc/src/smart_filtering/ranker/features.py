@@ -1,14 +1,19 @@
 # src/ranker/features.py
 
 import numpy as np
-from typing import Dict, Any, List
-from scipy.spatial.distance import cosine
+from typing import Dict, Any, List, Optional, Tuple
 from smart_filtering.embedder.embed import get_embedder
-from smart_filtering.normalizer.skills_taxonomy import get_canonical_skill
-from smart_filtering.generator.cv_generator import CITIES # Import CITIES for location calculation
-
-# Keep a cached embedder to avoid re-loading the model on every run
-embedder = get_embedder()
+from smart_filtering.embedder.planner import EncodePlan
+from smart_filtering.embedder.vectors import (
+    cv_skills_text,
+    cv_skills_vectors,
+    get_vector,
+    jd_skills_text,
+    jd_skills_vector,
+)
+from smart_filtering.ranker.compiled import CompiledJD
+from smart_filtering.ranker.skill_matrix import SkillMatrix
+from smart_filtering.ranker.similarity import cosine_similarity_matrix, cosine_similarity_to
 
 def calculate_haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -39,84 +44,242 @@ def get_semantic_similarity(text1: str, text2: str) -> float:
     if not text1 or not text2:
         return 0.0 # Or handle as appropriate for missing text
 
+    # get_embedder() is cached: the model is loaded once, on first use rather than at import
+    embedder = get_embedder()
     embedding1 = embedder.embed_text(text1)[0]
     embedding2 = embedder.embed_text(text2)[0]
+    return _pair_similarity(embedding1, embedding2)
+
+def _pair_similarity(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+    """Cosine similarity between two embeddings, 0.0 when either one is a zero vector."""
+    # Zero vectors (e.g., offline mode) stay zero after normalization, so they score 0.0
+    return float(cosine_similarity_to(embedding1, embedding2)[0])
 
-    # Avoid invalid values when embeddings are zero vectors (e.g., offline mode)
-    if not np.any(embedding1) or not np.any(embedding2):
+def get_record_similarity(
+    cv: Dict[str, Any], cv_slot: str, cv_text: str, jd: Dict[str, Any], jd_slot: str, jd_text: str
+) -> float:
+    """
+    Similarity of a CV text against a JD text, using the vectors precomputed in
+    cv["embeddings"][cv_slot] / jd["embeddings"][jd_slot] when available and
+    embedding only the missing side.
+    """
+    embedder = get_embedder()
+    cv_embedding = get_vector(cv, cv_slot, embedder)
+    jd_embedding = get_vector(jd, jd_slot, embedder)
+    if cv_embedding is None and jd_embedding is None:
+        return get_semantic_similarity(cv_text, jd_text)
+    if not cv_text or not jd_text:
         return 0.0
-    
-    # Cosine similarity is 1 - cosine distance
-    return 1 - cosine(embedding1, embedding2)
+    if cv_embedding is None:
+        cv_embedding = embedder.embed_text(cv_text)[0]
+    if jd_embedding is None:
+        jd_embedding = embedder.embed_text(jd_text)[0]
+    return _pair_similarity(cv_embedding, jd_embedding)
 
-def extract_features(cv: Dict[str, Any], jd: Dict[str, Any]) -> Dict[str, Any]:
+def _skill_embeddings(
+    cvs: List[Dict[str, Any]], jds: List[Dict[str, Any]]
+) -> Tuple[List[Optional[np.ndarray]], List[Optional[np.ndarray]]]:
     """
-    Extracts and calculates various features for a given CV and JD pair.
+    skills_vec / jd_vec of each record: the precomputed one when available,
+    otherwise pooled from the skill table. With pooling disabled the missing
+    ones stay None and the joined skill text is encoded as before.
     """
-    features = {}
+    embedder = get_embedder()
+    cv_vectors = [get_vector(cv, "skills_vec", embedder) for cv in cvs]
+    missing = [i for i, vector in enumerate(cv_vectors) if vector is None]
+    pooled = cv_skills_vectors([cvs[i] for i in missing], embedder) if missing else None
+    if pooled is not None:
+        for row, i in enumerate(missing):
+            cv_vectors[i] = pooled[row]
 
-    # --- Semantic Features ---
-    # Skill Semantic Similarity
-    cv_skills_text = " ".join(cv["skills"].keys())
-    jd_skills_text = " ".join(jd["must_have"] + jd["nice_to_have"])
-    features["skill_semantic_similarity"] = get_semantic_similarity(cv_skills_text, jd_skills_text)
+    jd_vectors = [get_vector(jd, "jd_vec", embedder) for jd in jds]
+    for i, vector in enumerate(jd_vectors):
+        if vector is None:
+            jd_vectors[i] = jd_skills_vector(jds[i], embedder)
+    return cv_vectors, jd_vectors
 
-    # Title Semantic Similarity
-    features["title_semantic_similarity"] = get_semantic_similarity(cv["title"], jd["role"])
+def _embedding_matrix(
+    texts: List[str],
+    embeddings: Optional[List[Optional[np.ndarray]]] = None,
+    batch_size: int = 256,
+) -> Optional[np.ndarray]:
+    """
+    Stack one vector per text, using the known `embeddings` and encoding the
+    rest in one batched call. Empty texts get zero rows (similarity 0.0).
+    Returns None when every text is empty.
+    """
+    non_empty = [i for i, text in enumerate(texts) if text]
+    if not non_empty:
+        return None
+
+    vectors: List[Optional[np.ndarray]] = list(embeddings) if embeddings else [None] * len(texts)
+    to_encode = [i for i in non_empty if vectors[i] is None]
+    if to_encode:
+        encoded = get_embedder().embed_text([texts[i] for i in to_encode], batch_size=batch_size)
+        for row, i in enumerate(to_encode):
+            vectors[i] = encoded[row]
+
+    dim = len(vectors[non_empty[0]])
+    matrix = np.zeros((len(texts), dim), dtype=np.float64)
+    for i in non_empty:
+        matrix[i] = vectors[i]
+    return matrix
+
+def get_batch_semantic_similarity(
+    texts: List[str],
+    query: str,
+    batch_size: int = 256,
+    query_embedding: Optional[np.ndarray] = None,
+    text_embeddings: Optional[List[Optional[np.ndarray]]] = None,
+) -> List[float]:
+    """
+    Similarity of every text in `texts` against a single `query`, encoding all
+    texts in one batched call instead of one encode per pair.
+    Known vectors can be passed as `query_embedding` and `text_embeddings`
+    (None entries are encoded); only the rest reach the embedder.
+    """
+    if query_embedding is None and not query:
+        return [0.0] * len(texts)
+    matrix = _embedding_matrix(texts, text_embeddings, batch_size=batch_size)
+    if matrix is None:
+        return [0.0] * len(texts)
+
+    if query_embedding is None:
+        query_embedding = get_embedder().embed_text(query)[0]
+    return cosine_similarity_to(matrix, query_embedding).tolist()
+
+def get_similarity_matrix(
+    cv_texts: List[str],
+    jd_texts: List[str],
+    cv_embeddings: Optional[List[Optional[np.ndarray]]] = None,
+    jd_embeddings: Optional[List[Optional[np.ndarray]]] = None,
+    batch_size: int = 256,
+) -> np.ndarray:
+    """
+    (N CVs x M JDs) similarity matrix from a single normalized matrix product,
+    chunked by ranker/similarity to stay within its memory budget.
+    """
+    cv_matrix = _embedding_matrix(cv_texts, cv_embeddings, batch_size=batch_size)
+    jd_matrix = _embedding_matrix(jd_texts, jd_embeddings, batch_size=batch_size)
+    if cv_matrix is None or jd_matrix is None:
+        return np.zeros((len(cv_texts), len(jd_texts)))
+    return cosine_similarity_matrix(cv_matrix, jd_matrix)
+
+def _unique_vectors(records: List[Dict[str, Any]], slot: str, texts: List[str], batch_size: int = 256):
+    """
+    Group records by normalized text and return (plan, matrix): one row per
+    unique text, from any record's precomputed `slot` vector or a batched encode.
+    """
+    embedder = get_embedder()
+    plan = EncodePlan(texts, batch_size)
+    embeddings: List[Optional[np.ndarray]] = [None] * plan.n_unique
+    for record, row in zip(records, plan.inverse):
+        if embeddings[row] is None:
+            embeddings[row] = get_vector(record, slot, embedder)
+    return plan, _embedding_matrix(plan.unique_texts, embeddings, batch_size=batch_size)
+
+def title_role_similarity_matrix(
+    cvs: List[Dict[str, Any]], jds: List[Dict[str, Any]], batch_size: int = 256
+) -> np.ndarray:
+    """
+    (N CVs x M JDs) title_semantic_similarity. CV titles repeat a lot ("Data
+    Engineer", "Project Manager"...), so it is computed as a small matrix of
+    distinct titles x distinct roles and then expanded to every CV and JD.
+    """
+    title_plan, titles = _unique_vectors(cvs, "title_vec", [cv["title"] or "" for cv in cvs], batch_size)
+    role_plan, roles = _unique_vectors(jds, "role_vec", [jd["role"] or "" for jd in jds], batch_size)
+    if titles is None or roles is None:
+        return np.zeros((len(cvs), len(jds)))
+    memo = cosine_similarity_matrix(titles, roles)
+    return memo[np.ix_(title_plan.inverse, role_plan.inverse)]
+
+def semantic_similarity_matrices(cvs: List[Dict[str, Any]], jds: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Skill and title similarity of every CV against every JD (N x M each),
+    reusing vectors precomputed at ingest when available.
+    """
+    cv_skill_vectors, jd_skill_vectors = _skill_embeddings(cvs, jds)
+    return {
+        "skill_semantic_similarity": get_similarity_matrix(
+            [cv_skills_text(cv) for cv in cvs],
+            [jd_skills_text(jd) for jd in jds],
+            cv_embeddings=cv_skill_vectors,
+            jd_embeddings=jd_skill_vectors,
+        ),
+        "title_semantic_similarity": title_role_similarity_matrix(cvs, jds),
+    }
+
+# (meets_min_skill_years, must_have_coverage, min_skill_years_coverage) of one CV
+SkillCoverage = Tuple[int, float, float]
+
+def _skill_coverage(cv: Dict[str, Any], compiled: CompiledJD) -> SkillCoverage:
+    skills = cv["skills"]
+    # Min skill years (simplified: check if any skill in JD's min_skill_years is present in CV)
+    meets_min_skill_years = 1 if all(skill in skills for skill in compiled.min_skill_years) else 0
+
+    must_total = len(compiled.must_have)
+    must_matches = sum(1 for _, skill in compiled.must_have if skill in skills)
+    must_have_coverage = must_matches / must_total if must_total else 1.0
+
+    min_skill_total = len(compiled.min_skill_years)
+    min_skill_matches = sum(1 for skill in compiled.min_skill_years if skill in skills)
+    min_skill_years_coverage = min_skill_matches / min_skill_total if min_skill_total else 1.0
+    return meets_min_skill_years, must_have_coverage, min_skill_years_coverage
+
+def _skill_coverage_batch(skill_matrix: SkillMatrix, compiled: CompiledJD) -> List[SkillCoverage]:
+    """_skill_coverage of every CV of `skill_matrix` from two column gathers."""
+    n = len(skill_matrix)
+    must_total = len(compiled.must_have)
+    min_skill_total = len(compiled.min_skill_years)
+    must_matches = skill_matrix.count([skill for _, skill in compiled.must_have])
+    min_skill_matches = skill_matrix.count(compiled.min_skill_years)
+    # int / int in NumPy rounds like Python's true division; tolist() gives back Python floats/ints
+    must_have_coverage = (must_matches / must_total).tolist() if must_total else [1.0] * n
+    min_skill_years_coverage = (min_skill_matches / min_skill_total).tolist() if min_skill_total else [1.0] * n
+    meets_min_skill_years = (min_skill_matches == min_skill_total).astype(int).tolist()
+    return list(zip(meets_min_skill_years, must_have_coverage, min_skill_years_coverage))
+
+def _extract_rule_features(
+    cv: Dict[str, Any], compiled: CompiledJD, skill_coverage: Optional[SkillCoverage] = None
+) -> Dict[str, Any]:
+    """
+    Non-semantic features (experience, location, coverage...) for a CV against a compiled JD.
+    `skill_coverage` comes precomputed from a SkillMatrix in the batch path.
+    """
+    features = {}
+    meets_min_skill_years, must_have_coverage, min_skill_years_coverage = (
+        skill_coverage if skill_coverage is not None else _skill_coverage(cv, compiled)
+    )
 
     # --- Experience Features ---
     features["total_experience_years"] = cv["experience_years_total"]
-    features["jd_min_total_years"] = jd["min_total_years"]
+    features["jd_min_total_years"] = compiled.min_total_years
 
     # Check if CV meets min total years
-    features["meets_min_total_years"] = 1 if cv["experience_years_total"] >= jd["min_total_years"] else 0
+    features["meets_min_total_years"] = 1 if cv["experience_years_total"] >= compiled.min_total_years else 0
 
-    # Min skill years (simplified: check if any skill in JD's min_skill_years is present in CV)
-    features["meets_min_skill_years"] = 1
-    for skill_req, min_years_req in jd["min_skill_years"].items():
-        canonical_skill_req = get_canonical_skill(skill_req)
-        if canonical_skill_req not in cv["skills"]:
-            features["meets_min_skill_years"] = 0
-            break
+    features["meets_min_skill_years"] = meets_min_skill_years
 
     # --- Location Features ---
     cv_loc = cv["location"]
-    jd_loc_policy = jd["location_policy"]
     features["distance_to_jd_city_km"] = None
 
     features["location_match_score"] = 0.0
-    if jd_loc_policy["type"] == "remote":
+    if compiled.location_type == "remote":
         features["location_match_score"] = 1.0
-    elif jd_loc_policy["type"] in ["hybrid", "on-site"] and "city" in jd_loc_policy and "lat" in cv_loc and "lon" in cv_loc:
-        jd_city_coords = next((c for c in CITIES if c["city"] == jd_loc_policy["city"]), None)
-        if jd_city_coords:
-            distance = calculate_haversine_distance(
-                cv_loc["lat"], cv_loc["lon"],
-                jd_city_coords["lat"], jd_city_coords["lon"]
-            )
+    elif compiled.location_type in ["hybrid", "on-site"] and compiled.has_city and "lat" in cv_loc and "lon" in cv_loc:
+        if compiled.city_coords:
+            distance = calculate_haversine_distance(cv_loc["lat"], cv_loc["lon"], *compiled.city_coords)
             features["distance_to_jd_city_km"] = distance
-            if distance <= jd_loc_policy.get("max_km", 0):
+            if distance <= compiled.max_km:
                 features["location_match_score"] = 1.0
             else:
-                features["location_match_score"] = max(0.0, 1 - (distance / (jd_loc_policy.get("max_km", 1) * 2)))
-        else:
-            features["location_match_score"] = 0.0
+                features["location_match_score"] = max(0.0, 1 - (distance / compiled.falloff_km))
 
     # --- Rule-based Features ---
-    must_total = len(jd.get("must_have", []))
-    must_matches = sum(
-        1 for s in jd.get("must_have", []) if get_canonical_skill(s) in cv["skills"]
-    )
-    features["must_have_coverage"] = must_matches / must_total if must_total else 1.0
-    features["meets_must_have_skills"] = 1 if features["must_have_coverage"] >= 1.0 else 0
-
-    min_skill_total = len(jd.get("min_skill_years", {}))
-    min_skill_matches = sum(
-        1 for s in jd.get("min_skill_years", {}) if get_canonical_skill(s) in cv["skills"]
-    )
-    features["min_skill_years_coverage"] = (
-        min_skill_matches / min_skill_total if min_skill_total else 1.0
-    )
+    features["must_have_coverage"] = must_have_coverage
+    features["meets_must_have_skills"] = 1 if must_have_coverage >= 1.0 else 0
+    features["min_skill_years_coverage"] = min_skill_years_coverage
 
     # Language match
     features["meets_language_requirements"] = 1
@@ -126,6 +289,71 @@ def extract_features(cv: Dict[str, Any], jd: Dict[str, Any]) -> Dict[str, Any]:
 
     return features
 
+def extract_features(cv: Dict[str, Any], jd: Dict[str, Any], compiled: Optional[CompiledJD] = None) -> Dict[str, Any]:
+    """
+    Extracts and calculates various features for a given CV and JD pair.
+    Pass `compiled` (a CompiledJD of `jd`) to reuse the JD-side work across calls.
+    """
+    features = {}
+
+    # --- Semantic Features ---
+    # Skill Semantic Similarity
+    (cv_skill_vector,), (jd_skill_vector,) = _skill_embeddings([cv], [jd])
+    if cv_skill_vector is not None and jd_skill_vector is not None:
+        features["skill_semantic_similarity"] = _pair_similarity(cv_skill_vector, jd_skill_vector)
+    else:
+        features["skill_semantic_similarity"] = get_record_similarity(
+            cv, "skills_vec", cv_skills_text(cv), jd, "jd_vec", jd_skills_text(jd)
+        )
+
+    # Title Semantic Similarity
+    features["title_semantic_similarity"] = get_record_similarity(
+        cv, "title_vec", cv["title"], jd, "role_vec", jd["role"]
+    )
+
+    features.update(_extract_rule_features(cv, CompiledJD.of(jd, compiled)))
+    return features
+
+def extract_features_batch(
+    cvs: List[Dict[str, Any]],
+    jd: Dict[str, Any],
+    batch_size: int = 256,
+    compiled: Optional[CompiledJD] = None,
+    skill_matrix: Optional[SkillMatrix] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Batch version of extract_features: encodes all CV skill texts and titles in a
+    few large batches and returns the same feature dicts, in the order of `cvs`.
+    Vectors precomputed at ingest (cv/jd["embeddings"]) are used as-is.
+    Skill coverage comes from `skill_matrix` (a SkillMatrix of exactly `cvs`,
+    built here when omitted), so reuse one across JDs of the same corpus.
+    """
+    if skill_matrix is not None and len(skill_matrix) != len(cvs):
+        raise ValueError(f"skill_matrix has {len(skill_matrix)} rows for {len(cvs)} CVs")
+    cv_skill_vectors, (jd_skill_vector,) = _skill_embeddings(cvs, [jd])
+    skill_similarities = get_batch_semantic_similarity(
+        [cv_skills_text(cv) for cv in cvs],
+        jd_skills_text(jd),
+        batch_size=batch_size,
+        query_embedding=jd_skill_vector,
+        text_embeddings=cv_skill_vectors,
+    )
+    title_similarities = title_role_similarity_matrix(cvs, [jd], batch_size=batch_size)[:, 0].tolist()
+
+    compiled = CompiledJD.of(jd, compiled)
+    if skill_matrix is None:
+        skill_matrix = SkillMatrix.from_cvs(cvs)
+    skill_coverage = _skill_coverage_batch(skill_matrix, compiled)
+    batch_features = []
+    for cv, skill_similarity, title_similarity, coverage in zip(cvs, skill_similarities, title_similarities, skill_coverage):
+        features = {
+            "skill_semantic_similarity": skill_similarity,
+            "title_semantic_similarity": title_similarity,
+        }
+        features.update(_extract_rule_features(cv, compiled, coverage))
+        batch_features.append(features)
+    return batch_features
+
 if __name__ == "__main__":
     import json
     from smart_filtering.generator.cv_generator import generate_cv
@@ -1,11 +1,29 @@
 # src/ranker/score.py
 
-import os
-from typing import Dict, Any, Optional
-from smart_filtering.ranker.features import extract_features
+import sys
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from smart_filtering.ranker.compiled import MUST_HAVE_WEIGHT, CompiledJD
+from smart_filtering.ranker.features import calculate_haversine_distance, extract_features, extract_features_batch
+from smart_filtering.ranker.skill_matrix import SkillMatrix
 from smart_filtering.normalizer.skills_taxonomy import get_canonical_skill
 
-EMBEDDER_MODE = os.getenv("SMART_FILTERING_EMBEDDER_MODE", "").lower()
+# Order matters: the total is summed in this order, like the score_components dict
+SCORE_COMPONENTS = ("skill_semantic", "title_semantic", "experience", "location", "education", "must_have", "skill_alignment")
+# One row per CV of calculate_scores_batch
+SCORE_DTYPE = np.dtype(
+    [("score", np.float64), ("ko", np.bool_), ("ko_reason", object), ("reason", object)]
+    + [(name, np.float64) for name in SCORE_COMPONENTS]
+)
+# Components that need no embeddings, computed for a whole pool by rule_score_components
+RULE_COMPONENTS = ("experience", "location", "education", "must_have", "skill_alignment")
+# Since 3.12 the builtin sum() of floats is compensated (Neumaier); the batch scorer replays it
+_COMPENSATED_SUM = sys.version_info >= (3, 12)
+# Margins that keep score_upper_bounds above the real score despite float rounding
+_BOUND_SLACK = 1e-9
+_BOUND_SLACK_KM = 1e-6
 
 def normalize_feature(value: float, min_val: float, max_val: float) -> float:
     """Min-max normalization to scale a feature to [0, 1]."""
@@ -18,35 +36,39 @@ def calculate_score(
     jd: Dict[str, Any],
     skill_weights: Optional[Dict[str, float]] = None,
     skill_weight_strength: float = 0.0,
+    features: Optional[Dict[str, Any]] = None,
+    compiled: Optional[CompiledJD] = None,
 ) -> Dict[str, Any]:
     """
     Calculates a weighted score for a CV against a JD, applying knock-out rules.
     Returns a dictionary with the score and a breakdown of features.
+    Pass `features` (e.g. from extract_features_batch) to skip per-CV feature extraction,
+    and `compiled` (CompiledJD(jd, skill_weights, skill_weight_strength)) when scoring
+    many CVs; it then supplies the skill weights and strength.
     """
-    features = extract_features(cv, jd)
+    compiled = CompiledJD.of(jd, compiled, skill_weights, skill_weight_strength)
+    if features is None:
+        features = extract_features(cv, jd, compiled=compiled)
 
     # --- Knock-out rules (hard filters) ---
     ko_reasons = []
     if features.get("meets_must_have_skills") == 0:
-        missing = [s for s in jd.get("must_have", []) if get_canonical_skill(s) not in cv.get("skills", {})]
+        missing = [s for s, skill in compiled.must_have if skill not in cv.get("skills", {})]
         if missing:
             ko_reasons.append(f"Faltan must-have: {', '.join(missing)}")
         else:
             ko_reasons.append("No cumple habilidades must-have")
 
     if features.get("meets_min_total_years") == 0:
-        ko_reasons.append(f"Experiencia total insuficiente ({features.get('total_experience_years', 0)} vs {jd.get('min_total_years', 0)})")
+        ko_reasons.append(f"Experiencia total insuficiente ({features.get('total_experience_years', 0)} vs {compiled.min_total_years})")
 
     if features.get("meets_min_skill_years") == 0:
         ko_reasons.append("No cumple mínima experiencia por skill")
 
-    loc_type = jd.get("location_policy", {}).get("type")
-    if loc_type == "on-site" and features.get("location_match_score", 0.0) == 0.0:
+    if compiled.location_type == "on-site" and features.get("location_match_score", 0.0) == 0.0:
         ko_reasons.append("Ubicación fuera de rango para un puesto on-site")
 
     # --- Calculate Weighted Score ---
-    weights = jd["weights"]
-    
     # Normalize experience years (assuming 0-15 years as a reasonable range for normalization)
     normalized_experience = normalize_feature(features["total_experience_years"], 0, 15)
     
@@ -55,56 +77,40 @@ def calculate_score(
 
     # Custom skill alignment (optional, weighted by recruiter input)
     skill_alignment = 0.0
-    if skill_weights:
-        normalized_skill_weights = {
-            get_canonical_skill(k): v for k, v in skill_weights.items() if v and v > 0
-        }
-        total_skill_weight = sum(normalized_skill_weights.values())
-        if total_skill_weight > 0:
-            matched_weight = sum(
-                weight for skill, weight in normalized_skill_weights.items() if skill in cv["skills"]
-            )
-            skill_alignment = matched_weight / total_skill_weight
+    if compiled.total_skill_weight > 0:
+        matched_weight = sum(
+            weight for skill, weight in compiled.skill_weights.items() if skill in cv["skills"]
+        )
+        skill_alignment = matched_weight / compiled.total_skill_weight
 
     # Cobertura: se usa solo como información, no penaliza. Cada skill suma, la que falta no resta.
     must_cov = features.get("must_have_coverage", 0.0)
-    min_skill_cov = features.get("min_skill_years_coverage", 0.0)
     coverage_factor = 1.0
 
     # Experience factor to soften penalty for being slightly under the min
     exp_factor = 1.0
-    if jd["min_total_years"]:
-        exp_factor = min(1.0, (cv.get("experience_years_total", 0) or 0) / jd["min_total_years"])
+    if compiled.min_total_years:
+        exp_factor = min(1.0, (cv.get("experience_years_total", 0) or 0) / compiled.min_total_years)
         exp_factor = max(0.3, exp_factor)  # keep some signal even if below
 
-    # Ensure all weights are present, default to 0 if not specified in JD
-    w_skill_sem = weights.get("skill_semantic", 0.0)
-    w_title_sem = weights.get("title_semantic", 0.0)
-    w_experience = weights.get("experience", 0.0)
-    w_location = weights.get("location", 0.0)
-    w_education = weights.get("education", 0.0)
-
-    # In modo offline de embeddings, elimina peso semántico y reequilibra
-    if EMBEDDER_MODE == "offline":
-        w_skill_sem = 0.0
-        w_title_sem = 0.0
+    # Weights default to 0 when missing; semantic ones are 0 in offline embedder mode (see CompiledJD)
+    weights = compiled.weights
 
     # Calculate score components
     score_components = {
-        "skill_semantic": features["skill_semantic_similarity"] * w_skill_sem,
-        "title_semantic": features["title_semantic_similarity"] * w_title_sem,
-        "experience": normalized_experience * w_experience * exp_factor,
-        "location": features["location_match_score"] * w_location,
-        "education": education_bonus * w_education,
-        "must_have": must_cov * 0.1,  # small extra weight to reward coverage
-        "skill_alignment": skill_alignment * skill_weight_strength,
+        "skill_semantic": features["skill_semantic_similarity"] * weights["skill_semantic"],
+        "title_semantic": features["title_semantic_similarity"] * weights["title_semantic"],
+        "experience": normalized_experience * weights["experience"] * exp_factor,
+        "location": features["location_match_score"] * weights["location"],
+        "education": education_bonus * weights["education"],
+        "must_have": must_cov * MUST_HAVE_WEIGHT,  # small extra weight to reward coverage
+        "skill_alignment": skill_alignment * compiled.skill_weight_strength,
     }
 
     total_score = sum(score_components.values())
-    sum_weights_base = w_skill_sem + w_title_sem + w_experience + w_location + w_education
-    sum_of_weights = sum_weights_base + 0.1 + skill_weight_strength  # include must-have and custom skill bump
-    if sum_of_weights > 0:
-        total_score /= sum_of_weights
+    # sum_of_weights includes must-have and custom skill bump
+    if compiled.sum_of_weights > 0:
+        total_score /= compiled.sum_of_weights
 
     total_score *= coverage_factor
     ko_reason = "; ".join(ko_reasons) if ko_reasons else None
@@ -119,6 +125,270 @@ def calculate_score(
         "score_components": score_components
     }
 
+def _builtin_sum(columns: Sequence[np.ndarray]) -> np.ndarray:
+    """Element-wise sum(values) of float columns with exactly the rounding of the builtin sum()."""
+    total = np.zeros_like(columns[0], dtype=np.float64) if columns else np.zeros(0)
+    compensation = np.zeros_like(total)
+    for column in columns:
+        step = total + column
+        if _COMPENSATED_SUM:
+            compensation += np.where(np.abs(total) >= np.abs(column), (total - step) + column, (column - step) + total)
+        total = step
+    if _COMPENSATED_SUM:
+        compensated = (compensation != 0) & np.isfinite(compensation)
+        total = np.where(compensated, total + compensation, total)
+    return total
+
+
+def _feature_column(features: List[Dict[str, Any]], key: str, default: Any = None) -> np.ndarray:
+    if default is None:
+        return np.fromiter((f[key] for f in features), dtype=np.float64, count=len(features))
+    return np.fromiter((f.get(key, default) for f in features), dtype=np.float64, count=len(features))
+
+
+def _ko_reasons(
+    skill_matrix: SkillMatrix, compiled: CompiledJD, features: List[Dict[str, Any]], ko_flags: Dict[str, np.ndarray]
+) -> List[Optional[str]]:
+    """
+    KO text of each CV, as calculate_score writes it. Flags come in as columns;
+    only knocked-out rows build a string, and the missing must-have text is
+    built once per distinct pattern of missing skills.
+    """
+    missing = ~skill_matrix.membership([skill for _, skill in compiled.must_have])
+    missing_texts: Dict[bytes, str] = {}
+    location_text = "Ubicación fuera de rango para un puesto on-site"
+
+    reasons: List[Optional[str]] = [None] * len(features)
+    knocked_out = ko_flags["must_have"] | ko_flags["total_years"] | ko_flags["skill_years"] | ko_flags["location"]
+    for i in np.flatnonzero(knocked_out).tolist():
+        parts = []
+        if ko_flags["must_have"][i]:
+            pattern = missing[i].tobytes()
+            if pattern not in missing_texts:
+                names = [s for (s, _), absent in zip(compiled.must_have, missing[i]) if absent]
+                missing_texts[pattern] = f"Faltan must-have: {', '.join(names)}" if names else "No cumple habilidades must-have"
+            parts.append(missing_texts[pattern])
+        if ko_flags["total_years"][i]:
+            parts.append(
+                f"Experiencia total insuficiente ({features[i].get('total_experience_years', 0)} vs {compiled.min_total_years})"
+            )
+        if ko_flags["skill_years"][i]:
+            parts.append("No cumple mínima experiencia por skill")
+        if ko_flags["location"][i]:
+            parts.append(location_text)
+        reasons[i] = "; ".join(parts)
+    return reasons
+
+
+def calculate_scores_batch(
+    cvs: List[Dict[str, Any]],
+    jd: Dict[str, Any],
+    skill_weights: Optional[Dict[str, float]] = None,
+    skill_weight_strength: float = 0.0,
+    features: Optional[List[Dict[str, Any]]] = None,
+    compiled: Optional[CompiledJD] = None,
+    skill_matrix: Optional[SkillMatrix] = None,
+) -> np.ndarray:
+    """
+    Columnar calculate_score for a whole CV list: the features become NumPy
+    columns (experience, coverage, location, similarities, KO flags) and every
+    component, the total and the KO rules are evaluated once per column
+    instead of once per CV. Returns a SCORE_DTYPE structured array aligned
+    with `cvs` (batch["score"], batch["ko_reason"], batch["experience"]...)
+    whose values are identical to calculate_score's, including rounding.
+    Pass `features` (from extract_features_batch) to reuse computed features
+    and `compiled` as in calculate_score. Skill checks (missing must-haves,
+    skill alignment) read `skill_matrix` (a SkillMatrix of `cvs`, built here
+    when omitted).
+    """
+    compiled = CompiledJD.of(jd, compiled, skill_weights, skill_weight_strength)
+    batch = np.zeros(len(cvs), dtype=SCORE_DTYPE)
+    if not cvs:
+        return batch
+    if skill_matrix is None:
+        skill_matrix = SkillMatrix.from_cvs(cvs)
+    if features is None:
+        features = extract_features_batch(cvs, jd, compiled=compiled, skill_matrix=skill_matrix)
+
+    # --- Knock-out rules (hard filters) ---
+    ko_flags = {
+        "must_have": np.array([f.get("meets_must_have_skills") == 0 for f in features], dtype=bool),
+        "total_years": np.array([f.get("meets_min_total_years") == 0 for f in features], dtype=bool),
+        "skill_years": np.array([f.get("meets_min_skill_years") == 0 for f in features], dtype=bool),
+    }
+    location_score = _feature_column(features, "location_match_score", 0.0)
+    ko_flags["location"] = (location_score == 0.0) & (compiled.location_type == "on-site")
+    ko_reason = _ko_reasons(skill_matrix, compiled, features, ko_flags)
+
+    # --- Weighted score, same operations and order as calculate_score ---
+    normalized_experience = _feature_column(features, "total_experience_years") / 15
+    education_bonus = np.where(np.array([bool(f["has_education"]) for f in features]), 1.0, 0.0)
+
+    skill_alignment = np.zeros(len(cvs))
+    if compiled.total_skill_weight > 0:
+        # Summed column by column in dict order (not a mat-vec product) to round like calculate_score
+        matched_weight = _builtin_sum(skill_matrix.weighted_columns(compiled.skill_weights))
+        skill_alignment = matched_weight / compiled.total_skill_weight
+
+    must_cov = _feature_column(features, "must_have_coverage", 0.0)
+    coverage_factor = 1.0
+
+    exp_factor = np.ones(len(cvs))
+    if compiled.min_total_years:
+        years = np.fromiter((cv.get("experience_years_total", 0) or 0 for cv in cvs), dtype=np.float64, count=len(cvs))
+        exp_factor = np.maximum(0.3, np.minimum(1.0, years / compiled.min_total_years))
+
+    weights = compiled.weights
+    components = {
+        "skill_semantic": _feature_column(features, "skill_semantic_similarity") * weights["skill_semantic"],
+        "title_semantic": _feature_column(features, "title_semantic_similarity") * weights["title_semantic"],
+        "experience": normalized_experience * weights["experience"] * exp_factor,
+        "location": location_score * weights["location"],
+        "education": education_bonus * weights["education"],
+        "must_have": must_cov * MUST_HAVE_WEIGHT,
+        "skill_alignment": skill_alignment * compiled.skill_weight_strength,
+    }
+
+    total_score = _builtin_sum([components[name] for name in SCORE_COMPONENTS])
+    if compiled.sum_of_weights > 0:
+        total_score = total_score / compiled.sum_of_weights
+    total_score = np.clip(total_score * coverage_factor, 0.0, 1.0)
+
+    for name in SCORE_COMPONENTS:
+        batch[name] = components[name]
+    # Builtin round(): np.round scales by 10**4 and can land on the other side of a tie
+    batch["score"] = [round(score, 4) for score in total_score.tolist()]
+    batch["ko_reason"] = ko_reason
+    batch["ko"] = [reason is not None for reason in ko_reason]
+    batch["reason"] = [reason or "Score calculated successfully" for reason in ko_reason]
+    return batch
+
+
+def _location_scores(cvs: List[Dict[str, Any]], compiled: CompiledJD, slack_km: float = 0.0) -> np.ndarray:
+    """
+    location_match_score of every CV with one vectorized haversine. `slack_km`
+    counts CVs up to that much farther away as in range and shortens their
+    distance by it, so the column never falls below the per-CV feature.
+    """
+    scores = np.zeros(len(cvs))
+    if compiled.location_type == "remote":
+        return scores + 1.0
+    if compiled.location_type not in ["hybrid", "on-site"] or not compiled.has_city or not compiled.city_coords:
+        return scores
+    rows = [i for i, cv in enumerate(cvs) if "lat" in cv["location"] and "lon" in cv["location"]]
+    if not rows:
+        return scores
+    lat = np.array([cvs[i]["location"]["lat"] for i in rows], dtype=np.float64)
+    lon = np.array([cvs[i]["location"]["lon"] for i in rows], dtype=np.float64)
+    distance = calculate_haversine_distance(lat, lon, *compiled.city_coords)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        falloff = np.maximum(0.0, 1 - ((distance - slack_km) / compiled.falloff_km))
+    scores[rows] = np.where(distance <= compiled.max_km + slack_km, 1.0, np.nan_to_num(falloff, nan=0.0))
+    return scores
+
+
+def rule_score_components(
+    cvs: List[Dict[str, Any]],
+    compiled: CompiledJD,
+    skill_matrix: SkillMatrix,
+    location_slack_km: float = 0.0,
+) -> Dict[str, np.ndarray]:
+    """
+    The RULE_COMPONENTS columns of calculate_scores_batch computed straight
+    from the CVs and their SkillMatrix: no embeddings and no feature dicts.
+    Values match the scorer's up to float rounding in the location distance.
+    """
+    n = len(cvs)
+    years = np.fromiter((cv.get("experience_years_total", 0) or 0 for cv in cvs), dtype=np.float64, count=n)
+    exp_factor = np.ones(n)
+    if compiled.min_total_years:
+        exp_factor = np.maximum(0.3, np.minimum(1.0, years / compiled.min_total_years))
+    total_years = np.fromiter((cv["experience_years_total"] for cv in cvs), dtype=np.float64, count=n)
+
+    must_total = len(compiled.must_have)
+    must_cov = skill_matrix.count([skill for _, skill in compiled.must_have]) / must_total if must_total else np.ones(n)
+    skill_alignment = np.zeros(n)
+    if compiled.total_skill_weight > 0:
+        skill_alignment = _builtin_sum(skill_matrix.weighted_columns(compiled.skill_weights)) / compiled.total_skill_weight
+
+    weights = compiled.weights
+    return {
+        "experience": total_years / 15 * weights["experience"] * exp_factor,
+        "location": _location_scores(cvs, compiled, location_slack_km) * weights["location"],
+        "education": np.where(np.array([bool(cv["education"]) for cv in cvs], dtype=bool), 1.0, 0.0) * weights["education"],
+        "must_have": must_cov * MUST_HAVE_WEIGHT,
+        "skill_alignment": skill_alignment * compiled.skill_weight_strength,
+    }
+
+
+def rule_scores(
+    cvs: List[Dict[str, Any]],
+    compiled: CompiledJD,
+    skill_matrix: SkillMatrix,
+    location_slack_km: float = 0.0,
+) -> np.ndarray:
+    """Sum of the rule_score_components of every CV (not normalized): the score without its semantic part."""
+    components = rule_score_components(cvs, compiled, skill_matrix, location_slack_km)
+    return _builtin_sum([components[name] for name in RULE_COMPONENTS])
+
+
+def rule_ko_mask(
+    cvs: List[Dict[str, Any]], compiled: CompiledJD, skill_matrix: SkillMatrix, certain: bool = False
+) -> np.ndarray:
+    """
+    True for the CVs calculate_scores_batch would knock out, from the same
+    inputs as rule_score_components (every KO rule is non-semantic). Only a
+    CV exactly at the on-site distance limit can differ, by float rounding;
+    `certain` gives that limit the slack of score_upper_bounds, so only CVs
+    knocked out for sure are flagged (safe to drop before exact scoring).
+    """
+    n = len(cvs)
+    years = np.fromiter((cv["experience_years_total"] for cv in cvs), dtype=np.float64, count=n)
+    ko = years < compiled.min_total_years
+    ko |= skill_matrix.count([skill for _, skill in compiled.must_have]) < len(compiled.must_have)
+    ko |= skill_matrix.count(compiled.min_skill_years) < len(compiled.min_skill_years)
+    if compiled.location_type == "on-site":
+        ko |= _location_scores(cvs, compiled, _BOUND_SLACK_KM if certain else 0.0) == 0.0
+    return ko
+
+
+def score_upper_bounds(
+    cvs: List[Dict[str, Any]],
+    compiled: CompiledJD,
+    skill_matrix: Optional[SkillMatrix] = None,
+) -> np.ndarray:
+    """
+    Admissible bound of the final (rounded) score of every CV: the rule
+    components plus the largest contribution the semantic components can
+    make (|weight| x similarity 1), normalized, clipped and rounded like the
+    score. A CV never scores above its bound, so a CV whose bound is below
+    the K-th best score so far cannot enter a top-K (see ranker/topk.py).
+    """
+    if not cvs:
+        return np.zeros(0)
+    if skill_matrix is None:
+        skill_matrix = SkillMatrix.from_cvs(cvs)
+    semantic_max = abs(compiled.weights["skill_semantic"]) + abs(compiled.weights["title_semantic"])
+    total = rule_scores(cvs, compiled, skill_matrix, location_slack_km=_BOUND_SLACK_KM) + semantic_max
+    if compiled.sum_of_weights > 0:
+        total = total / compiled.sum_of_weights
+    # Slack absorbs summation-order and similarity (|cos| may exceed 1 by an ulp) rounding; round() is monotone
+    total = np.clip(total + _BOUND_SLACK, 0.0, 1.0)
+    return np.array([round(bound, 4) for bound in total.tolist()])
+
+
+def score_details(batch: np.ndarray, index: int, features: Dict[str, Any]) -> Dict[str, Any]:
+    """Row `index` of calculate_scores_batch as the dict calculate_score returns (for explanations)."""
+    row = batch[index]
+    return {
+        "score": float(row["score"]),
+        "reason": row["reason"],
+        "ko_reason": row["ko_reason"],
+        "features": features,
+        "score_components": {name: float(row[name]) for name in SCORE_COMPONENTS},
+    }
+
+
 if __name__ == "__main__":
     import json
     from smart_filtering.generator.cv_generator import generate_cv
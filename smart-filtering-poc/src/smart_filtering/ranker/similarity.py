@@ -0,0 +1,53 @@
+# src/ranker/similarity.py
+
+import numpy as np
+
+from smart_filtering.config import load_config
+
+CONFIG = load_config()
+DEFAULT_MEMORY_BUDGET_MB = float(CONFIG.get("ranking", {}).get("similarity_memory_mb", 128))
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    Row-wise L2 normalization in float64. Zero rows stay zero, so any similarity
+    against them is 0.0 (same result as the offline-mode guard).
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _rows_per_chunk(n_cols: int, dim: int, memory_budget_mb: float) -> int:
+    # Each chunk row holds one float64 input row plus one float64 output row
+    row_bytes = 8 * (n_cols + dim)
+    return max(1, int(memory_budget_mb * 1024 * 1024) // row_bytes)
+
+
+def cosine_similarity_matrix(
+    a: np.ndarray, b: np.ndarray, memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB, normalized: bool = False
+) -> np.ndarray:
+    """
+    Full (N, M) cosine similarity between the rows of `a` and the rows of `b`,
+    computed as one BLAS matrix product per chunk of `a` rows so the working
+    set stays within `memory_budget_mb`. Pass `normalized=True` when both inputs
+    already went through l2_normalize. Quantized float16/int8 matrices
+    (embedder/quantize) can be passed as-is: each chunk is cast while it is
+    normalized, and per-row int8 scales cancel out in the cosine.
+    """
+    b_norm = np.atleast_2d(b) if normalized else l2_normalize(b)
+    a = np.atleast_2d(a)
+    out = np.empty((a.shape[0], b_norm.shape[0]), dtype=np.float64)
+    step = _rows_per_chunk(b_norm.shape[0], b_norm.shape[1], memory_budget_mb)
+    for start in range(0, a.shape[0], step):
+        chunk = a[start:start + step]
+        chunk_norm = np.asarray(chunk, dtype=np.float64) if normalized else l2_normalize(chunk)
+        # BLAS picks kernels by shape, so a CV scored in a subset (top-K block, must-have survivors)
+        # can differ from the full pool in the last bit; score_upper_bounds has slack for that
+        np.matmul(chunk_norm, b_norm.T, out=out[start:start + step])
+    return out
+
+
+def cosine_similarity_to(a: np.ndarray, query: np.ndarray, memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB) -> np.ndarray:
+    """Cosine similarity of every row of `a` against one `query` vector, shape (N,)."""
+    return cosine_similarity_matrix(a, np.atleast_2d(query), memory_budget_mb=memory_budget_mb)[:, 0]
@@ -0,0 +1,125 @@
+# src/ranker/skill_index.py
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from smart_filtering.ranker.compiled import CompiledJD
+
+SKILL_INDEX_FILE = "skill_index.npz"
+
+
+def corpus_fingerprint(cvs: List[Dict[str, Any]]) -> str:
+    """sha1 of every CV id and skill list, in corpus order: an index is only valid for the same corpus."""
+    payload = "\x1e".join("\x1f".join([str(cv.get("id")), *cv.get("skills", {})]) for cv in cvs)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SkillIndex:
+    """
+    Inverted index canonical skill -> sorted posting list of doc ids, where
+    doc id i is cvs[i] of the corpus it was built from (`cv_ids[i]` is its
+    CV id). Retrieving the CVs that list all must-have skills intersects a
+    few posting lists, starting with the shortest, so the cost depends on
+    the list lengths and not on the size of the pool.
+
+    Stored as CSR-like arrays (skills, offsets, postings) and persisted next
+    to the corpus artifacts in data.processed_dir, with the fingerprint of
+    the corpus it indexes.
+    """
+
+    def __init__(self, cv_ids: np.ndarray, skills: List[str], offsets: np.ndarray, postings: np.ndarray, fingerprint: str):
+        self.cv_ids = cv_ids
+        self.skills = skills
+        self.offsets = offsets  # skills[s] lists postings[offsets[s]:offsets[s + 1]]
+        self.postings = postings
+        self.fingerprint = fingerprint
+        self._rows = {skill: row for row, skill in enumerate(skills)}
+
+    def __len__(self) -> int:
+        return int(self.cv_ids.shape[0])
+
+    @classmethod
+    def build(cls, cvs: List[Dict[str, Any]]) -> "SkillIndex":
+        lists: Dict[str, List[int]] = {}
+        for doc, cv in enumerate(cvs):
+            for skill in cv.get("skills", {}):
+                lists.setdefault(skill, []).append(doc)  # docs come in increasing order: lists are sorted
+        skills = sorted(lists)
+        offsets = np.zeros(len(skills) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(lists[skill]) for skill in skills])
+        postings = np.fromiter((doc for skill in skills for doc in lists[skill]), dtype=np.int32, count=int(offsets[-1]))
+        cv_ids = np.array([str(cv.get("id")) for cv in cvs])
+        return cls(cv_ids, skills, offsets, postings, corpus_fingerprint(cvs))
+
+    def posting_list(self, skill: str) -> np.ndarray:
+        """Sorted doc ids of the CVs listing `skill` (empty for unknown skills)."""
+        row = self._rows.get(skill)
+        if row is None:
+            return self.postings[:0]
+        return self.postings[self.offsets[row]:self.offsets[row + 1]]
+
+    def intersect(self, skills: Iterable[str]) -> np.ndarray:
+        """Sorted doc ids of the CVs listing every skill of `skills` (all docs when it is empty)."""
+        lists = sorted((self.posting_list(skill) for skill in set(skills)), key=len)
+        if not lists:
+            return np.arange(len(self), dtype=np.int32)
+        result = lists[0]
+        for posting in lists[1:]:
+            if result.size == 0:
+                break
+            # Binary search of the (short) running result in the longer list
+            found = np.searchsorted(posting, result)
+            result = result[posting[np.minimum(found, posting.size - 1)] == result]
+        return result
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(
+                f,
+                cv_ids=self.cv_ids,
+                skills=np.array(self.skills, dtype=str),
+                offsets=self.offsets,
+                postings=self.postings,
+                fingerprint=self.fingerprint,
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], fingerprint: Optional[str] = None) -> Optional["SkillIndex"]:
+        """The persisted index, or None when missing, unreadable or built for another corpus."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if fingerprint is not None and str(data["fingerprint"]) != fingerprint:
+                    return None
+                return cls(data["cv_ids"], data["skills"].tolist(), data["offsets"], data["postings"], str(data["fingerprint"]))
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def load_or_build_skill_index(cvs: List[Dict[str, Any]], path: Optional[Union[str, Path]] = None) -> SkillIndex:
+    """The index persisted at `path` if it matches `cvs`, otherwise a new one (saved to `path`)."""
+    fingerprint = corpus_fingerprint(cvs)
+    index = SkillIndex.load(path, fingerprint) if path is not None else None
+    if index is None:
+        index = SkillIndex.build(cvs)
+        if path is not None:
+            index.save(path)
+    return index
+
+
+def must_have_candidates(index: SkillIndex, compiled: CompiledJD) -> np.ndarray:
+    """
+    Doc ids (positions in the indexed corpus) of the CVs that list every
+    must-have of the JD, i.e. exactly the CVs without the must-have KO. Only
+    these need feature extraction when knocked-out CVs are not shown.
+    """
+    return index.intersect(skill for _, skill in compiled.must_have)
@@ -0,0 +1,125 @@
+# src/ranker/skill_matrix.py
+
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from smart_filtering.normalizer.skills_taxonomy import SKILL_TAXONOMY
+
+
+class SkillVocabulary:
+    """
+    Stable integer id per canonical skill: the taxonomy skills first, in
+    SKILL_TAXONOMY order, then any other skill (CVs may list skills outside
+    the taxonomy) the first time it is seen. Ids are never reassigned, so a
+    SkillMatrix built earlier stays valid when the vocabulary grows; it just
+    has fewer columns than the vocabulary.
+    """
+
+    def __init__(self, skills: Iterable[str] = ()):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.extend(skills)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, skill: str) -> bool:
+        return skill in self._ids
+
+    @property
+    def skills(self) -> List[str]:
+        """Skill names in id order."""
+        return list(self._ids)
+
+    def extend(self, skills: Iterable[str]) -> None:
+        """Give an id to every skill that has none yet."""
+        new = [skill for skill in skills if skill not in self._ids]
+        if not new:
+            return
+        with self._lock:
+            for skill in new:
+                self._ids.setdefault(skill, len(self._ids))
+
+    def sync_taxonomy(self) -> None:
+        """Pick up skills added to SKILL_TAXONOMY since the vocabulary was created."""
+        self.extend(SKILL_TAXONOMY)
+
+    def id_of(self, skill: str) -> Optional[int]:
+        return self._ids.get(skill)
+
+
+# Shared by every matrix of the process so ids mean the same skill everywhere
+SKILL_VOCABULARY = SkillVocabulary(SKILL_TAXONOMY)
+
+
+class SkillMatrix:
+    """
+    Skill sets of a CV corpus as a boolean matrix: row i is cvs[i], column j
+    the skill with id j in `vocabulary` (1 byte per cell: 100k CVs x 64
+    skills is ~6 MB). Skill checks for a whole corpus become column gathers
+    and row sums (must-have coverage, min-skill-years coverage, missing
+    must-haves, skill alignment) instead of one dict lookup per CV and skill.
+
+    Build it once per corpus (from_cvs) and pass it as `skill_matrix=` to
+    extract_features_batch / calculate_scores_batch; append() adds CVs and
+    widens the matrix when new skills show up.
+    """
+
+    def __init__(self, rows: np.ndarray, vocabulary: SkillVocabulary = SKILL_VOCABULARY):
+        self.rows = np.asarray(rows, dtype=bool)
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_cvs(cls, cvs: Sequence[Dict[str, Any]], vocabulary: SkillVocabulary = SKILL_VOCABULARY) -> "SkillMatrix":
+        matrix = cls(np.zeros((0, len(vocabulary)), dtype=bool), vocabulary)
+        matrix.append(cvs)
+        return matrix
+
+    def __len__(self) -> int:
+        return int(self.rows.shape[0])
+
+    @property
+    def width(self) -> int:
+        return int(self.rows.shape[1])
+
+    def append(self, cvs: Sequence[Dict[str, Any]]) -> None:
+        """Add one row per CV, growing the columns if the vocabulary grew."""
+        skill_sets = [cv.get("skills", {}) for cv in cvs]
+        self.vocabulary.sync_taxonomy()
+        self.vocabulary.extend(skill for skills in skill_sets for skill in skills)
+        width = len(self.vocabulary)
+        if width > self.width:
+            self.rows = np.pad(self.rows, ((0, 0), (0, width - self.width)))
+        new_rows = np.zeros((len(skill_sets), width), dtype=bool)
+        row_ids = [row for row, skills in enumerate(skill_sets) for _ in skills]
+        col_ids = [self.vocabulary.id_of(skill) for skills in skill_sets for skill in skills]
+        new_rows[row_ids, col_ids] = True
+        self.rows = np.concatenate([self.rows, new_rows]) if len(self) else new_rows
+
+    def take(self, docs: Sequence[int]) -> "SkillMatrix":
+        """Matrix of the CVs at positions `docs` (e.g. the survivors of a SkillIndex retrieval)."""
+        return SkillMatrix(self.rows[np.asarray(docs, dtype=np.int64)], self.vocabulary)
+
+    def membership(self, skills: Sequence[str]) -> np.ndarray:
+        """
+        (N CVs x len(skills)) bool: does each CV list each canonical skill.
+        Repeated skills give repeated columns; skills no CV of the matrix has
+        (unknown to the vocabulary or newer than the matrix) give False columns.
+        """
+        out = np.zeros((len(self), len(skills)), dtype=bool)
+        ids = [self.vocabulary.id_of(skill) for skill in skills]
+        known = [j for j, skill_id in enumerate(ids) if skill_id is not None and skill_id < self.width]
+        if known:
+            out[:, known] = self.rows[:, [ids[j] for j in known]]
+        return out
+
+    def count(self, skills: Sequence[str]) -> np.ndarray:
+        """How many of `skills` (with repetitions) each CV lists."""
+        return self.membership(skills).sum(axis=1)
+
+    def weighted_columns(self, weights: Mapping[str, float]) -> List[np.ndarray]:
+        """One column per weighted skill: its weight where the CV lists it, else 0.0 (sum them in order)."""
+        membership = self.membership(list(weights))
+        return [np.where(membership[:, j], float(w), 0.0) for j, w in enumerate(weights.values())]
@@ -0,0 +1,120 @@
+# src/ranker/topk.py
+
+import heapq
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from smart_filtering.ranker.compiled import CompiledJD
+from smart_filtering.ranker.features import extract_features_batch
+from smart_filtering.ranker.score import SCORE_DTYPE, calculate_scores_batch, rule_ko_mask, score_upper_bounds
+from smart_filtering.ranker.skill_matrix import SkillMatrix
+
+# CVs scored per step; the bound check runs between steps
+DEFAULT_BLOCK_SIZE = 128
+
+
+class TopK:
+    """
+    Result of rank_top_k, best first: `docs` are positions in the ranked
+    `cvs`, `batch` their calculate_scores_batch rows and `features` their
+    feature dicts (score_details(result.batch, i, result.features[i]) gives
+    the explanation input of the i-th). `evaluated` counts the CVs that got
+    features and an exact score; the rest were discarded by their bound.
+    """
+
+    def __init__(self, docs: np.ndarray, batch: np.ndarray, features: List[Dict[str, Any]], evaluated: int):
+        self.docs = docs
+        self.batch = batch
+        self.features = features
+        self.evaluated = evaluated
+
+    def __len__(self) -> int:
+        return int(self.docs.shape[0])
+
+
+def rank_top_k(
+    cvs: List[Dict[str, Any]],
+    jd: Dict[str, Any],
+    k: int,
+    compiled: Optional[CompiledJD] = None,
+    skill_matrix: Optional[SkillMatrix] = None,
+    exclude_ko: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    prepare: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+) -> TopK:
+    """
+    The K best CVs, exactly the first K of sorting every score in descending
+    order (ties keep the order of `cvs`, like a stable sort), without
+    extracting features for the whole pool.
+
+    Every CV first gets an admissible upper bound of its score
+    (score_upper_bounds: rule components plus the best possible similarity).
+    CVs are then scored in blocks, highest bound first, through the usual
+    extract_features_batch / calculate_scores_batch path, keeping the K best
+    in a heap; as soon as the next bound is below the K-th best score no
+    remaining CV can enter and the rest of the pool is never scored.
+    `exclude_ko` leaves knocked-out CVs out of the top-K (the "only pass" view):
+    the ones the rules knock out for certain are dropped before any bound or
+    feature is computed, and the scorer's own KO flag settles the rest.
+    `prepare(block_cvs)`, when given, runs on each block right before its
+    features (e.g. DeferredCVIngest, so only scored CVs are embedded).
+    """
+    compiled = CompiledJD.of(jd, compiled)
+    if skill_matrix is None:
+        skill_matrix = SkillMatrix.from_cvs(cvs)
+    if k <= 0 or not cvs:
+        return TopK(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=SCORE_DTYPE), [], 0)
+
+    # The pool: positions in `cvs` that can still make the top-K
+    pool = np.arange(len(cvs))
+    pool_cvs, pool_matrix = cvs, skill_matrix
+    if exclude_ko:
+        pool = np.flatnonzero(~rule_ko_mask(cvs, compiled, skill_matrix, certain=True))
+        if pool.size < len(cvs):
+            pool_cvs, pool_matrix = [cvs[doc] for doc in pool.tolist()], skill_matrix.take(pool)
+
+    bounds = score_upper_bounds(pool_cvs, compiled, pool_matrix)
+    # Highest bound first; equal bounds in corpus order (rows of the pool from here on)
+    order = np.lexsort((pool, -bounds))
+    block_size = max(block_size, k)
+
+    # Min-heap of (score, -doc, row, features): the root is the worst kept CV (lowest score, latest
+    # in corpus order); docs are unique, so comparisons never reach the row or the features
+    heap: List[Tuple[float, int, np.void, Dict[str, Any]]] = []
+    evaluated = 0
+    while evaluated < len(order):
+        block = order[evaluated:evaluated + block_size]
+        if len(heap) == k:
+            # Bounds are sorted: keep the prefix that could still beat (or tie) the K-th score
+            block = block[: int(np.searchsorted(-bounds[block], -heap[0][0], side="right"))]
+            if block.size == 0:
+                break
+        docs = pool[block].tolist()
+        block_cvs = [pool_cvs[row] for row in block.tolist()]
+        block_matrix = pool_matrix.take(block)
+        if prepare is not None:
+            prepare(block_cvs)
+        features = extract_features_batch(block_cvs, jd, compiled=compiled, skill_matrix=block_matrix)
+        batch = calculate_scores_batch(block_cvs, jd, features=features, compiled=compiled, skill_matrix=block_matrix)
+        evaluated += len(docs)
+
+        for row, (doc, score, ko) in enumerate(zip(docs, batch["score"].tolist(), batch["ko"].tolist())):
+            if exclude_ko and ko:
+                continue
+            entry = (score, -doc, batch[row], features[row])
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+    best = sorted(heap, key=lambda entry: entry[:2], reverse=True)
+    result_batch = np.zeros(len(best), dtype=SCORE_DTYPE)
+    for i, entry in enumerate(best):
+        result_batch[i] = entry[2]
+    return TopK(
+        np.array([-entry[1] for entry in best], dtype=np.int64),
+        result_batch,
+        [entry[3] for entry in best],
+        evaluated,
+    )
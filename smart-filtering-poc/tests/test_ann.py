@@ -0,0 +1,120 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smart_filtering.ranker import ann as ann_mod
+from smart_filtering.ranker.ann import IVFIndex, build_cv_index, load_or_build_cv_index, retrieve_candidates
+
+
+def _clustered_vectors(n: int = 600, dim: int = 16, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(12, dim))
+    return centers[rng.integers(0, 12, size=n)] + 0.3 * rng.normal(size=(n, dim))
+
+
+def _exact_top(vectors: np.ndarray, query: np.ndarray, k: int) -> set:
+    norm = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return set(np.argsort(-(norm @ (query / np.linalg.norm(query))))[:k].tolist())
+
+
+def test_ivf_full_probe_is_exact_and_partial_probe_has_high_recall():
+    vectors = _clustered_vectors()
+    index = IVFIndex.build(vectors, list(range(len(vectors))), n_lists=16)
+    query = vectors[7] + 0.1
+
+    exact = _exact_top(vectors, query, 20)
+    full = {cv_id for cv_id, _ in index.search(query, 20, n_probe=index.n_lists)}
+    partial = {cv_id for cv_id, _ in index.search(query, 20, n_probe=4)}
+
+    assert full == exact
+    assert len(partial & exact) >= 16
+
+
+def test_ivf_save_load_roundtrip(tmp_path: Path):
+    vectors = _clustered_vectors(n=100)
+    index = IVFIndex.build(vectors, [f"cv_{i}" for i in range(100)], n_lists=8)
+    path = tmp_path / "index.npz"
+    index.save(path)
+
+    loaded = IVFIndex.load(path)
+    assert loaded.search(vectors[3], 5, n_probe=8) == index.search(vectors[3], 5, n_probe=8)
+
+
+def test_retrieve_candidates_returns_closest_cvs():
+    vectors = _clustered_vectors(n=50)
+    cvs = [{"id": f"cv_{i}", "embeddings": {"skills_vec": vectors[i]}} for i in range(50)]
+    jd = {"embeddings": {"jd_vec": vectors[10]}}
+
+    top = retrieve_candidates(cvs, jd, top_m=5, n_probe=100)
+    assert len(top) == 5
+    assert top[0]["id"] == "cv_10"
+
+    offline_jd = {"embeddings": {"jd_vec": np.zeros(16)}}
+    assert retrieve_candidates(cvs, offline_jd, top_m=5) is cvs
+
+
+def test_ivf_save_replaces_atomically(tmp_path: Path, monkeypatch):
+    vectors = _clustered_vectors(n=40)
+    path = tmp_path / "index.npz"
+    IVFIndex.build(vectors, list(range(40)), n_lists=4).save(path)
+    before = path.read_bytes()
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "savez", crash)
+    with pytest.raises(OSError):
+        IVFIndex.build(vectors[:20], list(range(20)), n_lists=2).save(path)
+    assert path.read_bytes() == before  # the previous index is untouched
+
+
+def test_retrieve_candidates_keeps_unindexed_and_duplicate_cvs():
+    vectors = _clustered_vectors(n=30)
+    cvs = [{"id": f"cv_{i}", "embeddings": {"model": "m", "skills_vec": vectors[i]}} for i in range(30)]
+    cvs[4] = {"id": "cv_4"}  # no precomputed vector
+    cvs[5]["embeddings"] = {"model": "other", "skills_vec": vectors[5]}  # built with another model
+    cvs.append({"id": "cv_10", "embeddings": {"model": "m", "skills_vec": vectors[10]}})  # duplicate id
+    jd = {"embeddings": {"model": "m", "jd_vec": vectors[10]}}
+
+    top = retrieve_candidates(cvs, jd, top_m=2, n_probe=100)
+    assert [cv["id"] for cv in top] == ["cv_10", "cv_10", "cv_4", "cv_5"]
+    assert top[0] is cvs[10] and top[1] is cvs[30]
+
+    # A JD vector from another model or dimension cannot be compared: nothing is filtered
+    index = build_cv_index(cvs)
+    assert index.model == "m" and sorted(index.ids.tolist()) == [i for i in range(31) if i not in (4, 5)]
+    assert retrieve_candidates(cvs, {"embeddings": {"model": "other", "jd_vec": vectors[10]}}, 2, index=index) is cvs
+    assert retrieve_candidates(cvs, {"embeddings": {"model": "m", "jd_vec": vectors[10][:8]}}, 2, index=index) is cvs
+
+
+def test_cv_index_is_persisted_and_rebuilt_only_when_vectors_change(tmp_path: Path, monkeypatch):
+    vectors = _clustered_vectors(n=80)
+    cvs = [{"id": f"cv_{i}", "embeddings": {"model": "m", "skills_vec": vectors[i]}} for i in range(80)]
+    path = tmp_path / "cv_ann_index.npz"
+    builds = []
+    original_build = IVFIndex.build
+    monkeypatch.setattr(IVFIndex, "build", lambda *args, **kwargs: builds.append(1) or original_build(*args, **kwargs))
+
+    first = load_or_build_cv_index(cvs, path)
+    second = load_or_build_cv_index(cvs, path)
+    assert len(builds) == 1
+    assert second.fingerprint == first.fingerprint
+    assert second.search(vectors[3], 5) == first.search(vectors[3], 5)
+
+    cvs[5]["embeddings"]["skills_vec"] = vectors[6]
+    load_or_build_cv_index(cvs, path)
+    assert len(builds) == 2
+    assert IVFIndex.load(path, "other corpus") is None
+    assert load_or_build_cv_index([{"id": "cv_0", "embeddings": {}}], tmp_path / "none.npz") is None
+
+
+def test_retrieve_candidates_without_index_is_exact(monkeypatch):
+    vectors = _clustered_vectors(n=120)
+    cvs = [{"id": f"cv_{i}", "embeddings": {"model": "m", "skills_vec": vectors[i]}} for i in range(120)]
+    query = vectors[7] + 0.1
+    jd = {"embeddings": {"model": "m", "jd_vec": query}}
+    monkeypatch.setattr(ann_mod, "build_cv_index", lambda *args, **kwargs: pytest.fail("no index expected"))
+
+    top = retrieve_candidates(cvs, jd, top_m=15)
+    assert {int(cv["id"][3:]) for cv in top} == _exact_top(vectors, query, 15)
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+pytest.importorskip("streamlit")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+APP_PATH = PROJECT_ROOT / "app" / "ui_streamlit" / "app.py"
+
+# Runs the app with every ranking control off, then on one at a time and all together
+APP_SCRIPT = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+errors = [e.value for e in at.exception]
+settings = [(True, 0, False), (False, 5, False), (False, 0, True), (True, 5, True)]
+for only_pass, top_k, cascade in settings:
+    at.toggle[0].set_value(only_pass)
+    at.number_input[0].set_value(top_k)
+    at.toggle[1].set_value(cascade)
+    at.run()
+    errors += [e.value for e in at.exception]
+print(json.dumps(errors))
+"""
+
+
+def test_app_runs_with_ranking_controls(tmp_path: Path):
+    config = yaml.safe_load((PROJECT_ROOT / "config" / "default.yaml").read_text(encoding="utf-8"))
+    config["data"].update(
+        cvs_dir=str(tmp_path / "cvs"),
+        jds_dir=str(tmp_path / "jds"),
+        processed_dir=str(tmp_path / "processed"),
+        outputs_dir=str(tmp_path / "outputs"),
+        cvs_archive=None,
+    )
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+    # A fresh process: load_config() is cached, and the app generates its sample CVs/JDs on first run
+    env = dict(os.environ, SMART_FILTERING_CONFIG=str(config_path), SMART_FILTERING_EMBEDDER_MODE="hashing")
+    out = subprocess.run(
+        [sys.executable, "-c", APP_SCRIPT, str(APP_PATH)], capture_output=True, text=True, check=True, env=env
+    )
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,326 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smart_filtering.embedder.cache import LRUEmbeddingCache
+from smart_filtering.embedder.embed import Embedder
+from smart_filtering.embedder.hashing import HashingEncoder
+from smart_filtering.embedder.planner import EncodePlan
+from smart_filtering.embedder.skills import SkillEmbeddingTable, get_skill_table, taxonomy_vocabulary
+from smart_filtering.embedder.store import EmbeddingStore
+from smart_filtering.embedder.vectors import DeferredCVIngest, ingest_cv_embeddings
+
+
+class FakeModel:
+    """SentenceTransformer stand-in with deterministic vectors and a call log."""
+
+    def __init__(self, dim: int = 4):
+        self.dim = dim
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        rows = [[len(t) + i for i in range(self.dim)] for t in texts]
+        return np.array(rows, dtype=np.float32)
+
+
+def test_store_roundtrip_and_reload(tmp_path: Path):
+    store = EmbeddingStore(tmp_path, "fake-model")
+    vectors = np.arange(8, dtype=np.float32).reshape(2, 4)
+    assert store.add(["Data Engineer", "Project Manager"], vectors) == 2
+    assert store.add(["Data  Engineer"], vectors[:1]) == 0  # same normalized text
+
+    reopened = EmbeddingStore(tmp_path, "fake-model")
+    found = reopened.get_many(["Project Manager", "QA", "Data Engineer"])
+    assert len(reopened) == 2
+    np.testing.assert_array_equal(found[0], vectors[1])
+    assert found[1] is None
+    np.testing.assert_array_equal(found[2], vectors[0])
+
+
+def test_store_trims_interrupted_append(tmp_path: Path):
+    store = EmbeddingStore(tmp_path, "fake-model")
+    store.add(["a", "b"], np.ones((2, 4), dtype=np.float32))
+    with (store.path / "vectors.f32").open("ab") as f:
+        f.write(b"\x00" * 6)  # half-written row
+
+    reopened = EmbeddingStore(tmp_path, "fake-model")
+    assert len(reopened) == 2
+    assert (reopened.path / "vectors.f32").stat().st_size == 2 * 4 * 4
+
+
+def test_store_instances_sharing_a_folder_keep_rows_aligned(tmp_path: Path):
+    a = EmbeddingStore(tmp_path, "fake-model")
+    a.add(["x"], np.full((1, 4), 1, dtype=np.float32))
+    b = EmbeddingStore(tmp_path, "fake-model")
+    b.add(["bee"], np.full((1, 4), 2, dtype=np.float32))
+    a.add(["ay", "bee"], np.full((2, 4), 3, dtype=np.float32))  # a has not seen b's row
+
+    np.testing.assert_array_equal(a.get_many(["ay"])[0], np.full(4, 3))
+    np.testing.assert_array_equal(a.get_many(["bee"])[0], np.full(4, 2))
+    fresh = EmbeddingStore(tmp_path, "fake-model")
+    assert len(fresh) == 3
+    np.testing.assert_array_equal(fresh.get_many(["ay"])[0], np.full(4, 3))
+
+
+def test_embedder_reuses_persistent_store(tmp_path: Path):
+    texts = ["python sql", "Data Engineer", "python sql"]
+    first = Embedder("fake-model", store=EmbeddingStore(tmp_path, "fake-model"), model=FakeModel())
+    expected = first.embed_text(texts)
+
+    model = FakeModel()
+    second = Embedder("fake-model", store=EmbeddingStore(tmp_path, "fake-model"), model=model)
+    np.testing.assert_array_equal(second.embed_text(texts), expected)
+    assert model.encoded == []
+    assert second.stats["store_hits"] == 2  # the repeated text is looked up once
+
+
+def test_lru_cache_evicts_least_recently_used():
+    vector = np.zeros(4, dtype=np.float32)  # 16 bytes
+    cache = LRUEmbeddingCache(max_bytes=32)
+    cache.put("a", vector)
+    cache.put("b", vector)
+    assert cache.get("a") is not None  # "b" is now the oldest
+    cache.put("c", vector)
+
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_embedder_memory_tier_skips_model_on_repeats():
+    model = FakeModel()
+    embedder = Embedder("fake-model", model=model, memory_cache=LRUEmbeddingCache(max_bytes=1024))
+    first = embedder.embed_text(["Data Engineer", "QA"])
+    second = embedder.embed_text(["QA", "Data Engineer"])
+
+    np.testing.assert_array_equal(second, first[::-1])
+    assert model.encoded == ["QA", "Data Engineer"]  # one length-sorted batch
+    assert embedder.cache_stats()["memory"]["hits"] == 2
+
+
+def test_encode_plan_dedups_and_buckets_by_length():
+    texts = ["Data Engineer", "QA", "Data  Engineer", "Project Manager", "QA"]
+    plan = EncodePlan(texts, batch_size=2)
+    assert plan.unique_texts == ["Data Engineer", "QA", "Project Manager"]
+    assert plan.dedup_ratio == pytest.approx(0.4)
+    assert plan.buckets() == [[1, 0], [2]]
+
+    model = FakeModel()
+    embedder = Embedder("fake-model", model=model)
+    vectors = embedder.embed_text(texts, batch_size=2)
+    # Normalized duplicates share the vector of the first spelling
+    np.testing.assert_array_equal(vectors, FakeModel().encode([plan.unique_texts[i] for i in plan.inverse]))
+    assert model.encoded == ["QA", "Data Engineer", "Project Manager"]
+    assert embedder.cache_stats()["dedup_ratio"] == pytest.approx(0.4)
+
+
+def _cv(cv_id: str, title: str):
+    return {
+        "id": cv_id,
+        "title": title,
+        "skills": {"python": "advanced", "sql": "basic"},
+        "experiences": [{"role": title, "skills": ["python"]}],
+        "education": ["BSc Computer Science"],
+    }
+
+
+def test_ingest_persists_cv_vectors(tmp_path: Path):
+    cache_path = tmp_path / "cv_embeddings.npz"
+    cvs = [_cv("cv_1", "Data Engineer"), _cv("cv_2", "Project Manager")]
+    ingest_cv_embeddings(cvs, cache_path=cache_path, embedder=Embedder("fake-model", model=FakeModel()))
+    assert set(cvs[0]["embeddings"]) == {"model", "skills_vec", "title_vec", "profile_vec"}
+
+    model = FakeModel()
+    reloaded = [_cv("cv_1", "Data Engineer"), _cv("cv_2", "QA Automation Engineer")]
+    ingest_cv_embeddings(reloaded, cache_path=cache_path, embedder=Embedder("fake-model", model=model))
+
+    np.testing.assert_array_equal(reloaded[0]["embeddings"]["profile_vec"], cvs[0]["embeddings"]["profile_vec"])
+    # Only the edited CV goes back to the model
+    assert "QA Automation Engineer" in model.encoded
+    assert "Data Engineer" not in model.encoded
+
+
+def test_deferred_ingest_embeds_on_demand_and_merges_the_cache(tmp_path: Path):
+    cache_path = tmp_path / "cv_embeddings.npz"
+    ingest_cv_embeddings([_cv("cv_1", "Data Engineer")], cache_path, Embedder("fake-model", model=FakeModel()))
+
+    model = FakeModel()
+    cvs = [_cv("cv_1", "Data Engineer"), _cv("cv_2", "Project Manager"), _cv("cv_3", "QA Engineer")]
+    deferred = DeferredCVIngest(cvs, cache_path, Embedder("fake-model", model=model))
+    assert "embeddings" in cvs[0] and "embeddings" not in cvs[1]  # cache hits attached up front, no model work
+    assert model.encoded == []
+    deferred(cvs[:2])
+    assert "Project Manager" in model.encoded and "QA Engineer" not in model.encoded
+    deferred.save()
+
+    with np.load(cache_path) as data:
+        assert sorted(data["ids"].tolist()) == ["cv_1", "cv_2"]  # cv_1 kept, cv_3 never embedded
+
+
+def test_reingest_keeps_loaded_quantized_vectors(tmp_path: Path, monkeypatch):
+    from smart_filtering.embedder import vectors as vectors_mod
+
+    cache_path = tmp_path / "cv_embeddings.npz"
+    titles = ["Data Engineer", "Project Manager", "QA Engineer", "Backend Developer", "Data Scientist"]
+    embedder = Embedder("hashing", model=HashingEncoder(dim=64))
+    ingest_cv_embeddings([_cv(f"cv_{i}", title) for i, title in enumerate(titles)], cache_path, embedder, dtype="int8")
+    with np.load(cache_path) as data:
+        stored = {key: data[key].copy() for key in data.files}
+
+    # A new CV triggers a re-ingest: the loaded int8 rows must not be quantized a second time
+    quantized_rows = []
+    real_quantize = vectors_mod.quantize
+    monkeypatch.setattr(
+        vectors_mod, "quantize", lambda matrix, dtype: quantized_rows.append(len(matrix)) or real_quantize(matrix, dtype)
+    )
+    cvs = [_cv(f"cv_{i}", title) for i, title in enumerate(titles)] + [_cv("cv_new", "DevOps Engineer")]
+    ingest_cv_embeddings(cvs, cache_path, embedder, dtype="int8")
+    assert quantized_rows == [1, 1, 1]
+    for row, cv in enumerate(cvs[:-1]):
+        for slot in ("skills_vec", "title_vec", "profile_vec"):
+            assert cv["embeddings"][slot].dtype == np.int8
+            np.testing.assert_array_equal(cv["embeddings"][slot], stored[slot][row])
+            assert cv["embeddings"][f"{slot}_scale"] == stored[f"{slot}_scale"][row]
+    with np.load(cache_path) as data:
+        for slot in ("skills_vec", "title_vec", "profile_vec"):
+            np.testing.assert_array_equal(data[slot][: len(titles)], stored[slot])
+            np.testing.assert_array_equal(data[f"{slot}_scale"][: len(titles)], stored[f"{slot}_scale"])
+
+
+def test_hashing_encoder_is_deterministic_and_skill_aware():
+    texts = ["python pyspark sql", "py spark postgresql", "scrum jira planning", ""]
+    first = HashingEncoder(dim=256).encode(texts)
+    np.testing.assert_array_equal(first, HashingEncoder(dim=256).encode(texts))
+    assert first.shape == (4, 256) and first.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(first[:3], axis=1), 1.0, rtol=1e-6)
+    assert not first[3].any()  # empty text stays a zero vector
+
+    # Synonyms resolve to the same canonical skills; another profile shares nothing
+    assert first[0] @ first[1] > 0.3
+    assert first[0] @ first[1] > first[0] @ first[2]
+
+
+def test_hashing_backend_plugs_into_embedder():
+    encoder = HashingEncoder(dim=128)
+    embedder = Embedder(encoder.name, model=encoder)
+    vectors = embedder.embed_text(["aws", "gcp"], batch_size=64)
+    assert not embedder.offline
+    assert vectors.shape == (2, 128)
+    assert vectors[0] @ vectors[1] > 0  # same taxonomy category ("cloud")
+
+
+def test_skill_table_pools_by_level_and_is_reused_from_disk(tmp_path: Path):
+    model = FakeModel()
+    embedder = Embedder("fake-model", store=EmbeddingStore(tmp_path, "fake-model"), model=model)
+    table = get_skill_table(embedder)
+    assert len(table) == len(taxonomy_vocabulary())
+    assert get_skill_table(embedder) is table
+
+    weights = {"basic": 0.5, "advanced": 1.0}
+    pooled = table.pool_many([{"python": "advanced", "sql": "basic"}, ["python"], {}], embedder, level_weights=weights)
+    python, sql = table.pool_many([["python"], ["sql"]], embedder)
+    np.testing.assert_allclose(pooled[0], (python + 0.5 * sql) / 1.5, rtol=1e-6)
+    np.testing.assert_allclose(pooled[1], python)
+    assert not pooled[2].any()
+
+    # A skill outside the taxonomy is embedded once, then served from the table
+    encoded = len(model.encoded)
+    table.pool(["terraform"], embedder)
+    table.pool(["terraform"], embedder)
+    assert model.encoded[encoded:] == ["terraform"]
+
+    # A second process loads the table from disk instead of re-encoding the taxonomy
+    fresh_model = FakeModel()
+    fresh = Embedder("fake-model", store=EmbeddingStore(tmp_path, "fake-model"), model=fresh_model)
+    reloaded = get_skill_table(fresh)
+    np.testing.assert_array_equal(reloaded.matrix, table.matrix)
+    assert fresh_model.encoded == []
+    assert SkillEmbeddingTable.load(embedder.store.path / "skill_table.npz", "fake-model", ["python"]) is None
+
+
+def test_embed_corpus_with_worker_processes_matches_in_process():
+    texts = [f"python sql engineer {i % 7}" for i in range(40)] + ["", "Project Manager"]
+    encoder = HashingEncoder(dim=64)
+    embedder = Embedder(encoder.name, model=encoder)
+    calls = []
+
+    vectors = embedder.embed_corpus(
+        texts, n_workers=2, chunk_size=3, progress=lambda done, total: calls.append((done, total))
+    )
+
+    np.testing.assert_array_equal(vectors, encoder.encode(texts))
+    unique = embedder.stats["unique"]
+    assert unique == 9
+    assert calls[-1] == (unique, unique)
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
+
+
+class UndeclaredDimEncoder(HashingEncoder):
+    """Encoder that does not declare its dimension, so a worker has to measure it."""
+
+    def get_sentence_embedding_dimension(self):
+        return None
+
+
+def test_encode_corpus_workers_and_dimension_come_from_config_and_encoder():
+    import os
+
+    from smart_filtering.embedder.corpus import embedding_dim, encode_corpus
+    from smart_filtering.embedder.embed import resolve_corpus_workers
+
+    # embedder.corpus.workers reads like parser.workers
+    assert resolve_corpus_workers(0) == (os.cpu_count() or 1) and resolve_corpus_workers(1) == 1
+
+    texts = [f"python sql engineer {i}" for i in range(7)]
+    assert embedding_dim(HashingEncoder(dim=32)) == 32
+    assert embedding_dim(UndeclaredDimEncoder(dim=32)) is None
+    for encoder in [HashingEncoder(dim=32), UndeclaredDimEncoder(dim=32)]:
+        vectors = encode_corpus(texts, "hashing", model=encoder, n_workers=2, chunk_size=3)
+        np.testing.assert_array_equal(vectors, encoder.encode(texts))
+
+
+def test_micro_batching_merges_concurrent_requests():
+    import threading
+
+    model = FakeModel()
+    embedder = Embedder("fake-model", model=model)
+    dispatcher = embedder.start_micro_batching(window_ms=200, max_batch_texts=100)
+    assert embedder.start_micro_batching() is dispatcher
+
+    requests = [[f"text {i}", f"text {i} extra"] for i in range(6)]
+    results = [None] * len(requests)
+    barrier = threading.Barrier(len(requests))
+
+    def worker(n):
+        barrier.wait()
+        results[n] = embedder.embed_text(requests[n])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    embedder.stop_micro_batching()
+
+    for texts, vectors in zip(requests, results):
+        np.testing.assert_array_equal(vectors, FakeModel().encode(texts))
+    stats = dispatcher.stats
+    assert stats["requests"] == len(requests)
+    assert stats["batches"] < len(requests)
+
+
+def test_micro_batching_propagates_errors():
+    class BrokenModel:
+        def encode(self, texts, batch_size=32, convert_to_numpy=True):
+            raise RuntimeError("model failed")
+
+    embedder = Embedder("broken", model=BrokenModel())
+    embedder.start_micro_batching(window_ms=1)
+    with pytest.raises(RuntimeError, match="model failed"):
+        embedder.embed_text(["Data Engineer"])
+    embedder.stop_micro_batching()
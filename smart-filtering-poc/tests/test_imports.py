@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+
+# Generous wall-clock cap for a cold import; loading torch alone takes several seconds
+IMPORT_BUDGET_SECONDS = 3.0
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers")
+
+
+def _cold_import(statement: str, env_mode: str = "") -> dict:
+    code = (
+        "import json, os, sys, time\n"
+        f"os.environ['SMART_FILTERING_EMBEDDER_MODE'] = {env_mode!r}\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_cli_import_does_not_load_model_stack():
+    result = _cold_import("import smart_filtering.cli")
+    assert result["heavy"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_ranker_import_and_offline_embedding_stay_light():
+    result = _cold_import(
+        "from smart_filtering.ranker.score import calculate_score\n"
+        "from smart_filtering.embedder.embed import get_embedder\n"
+        "get_embedder().embed_text(['Data Engineer'])",
+        env_mode="offline",
+    )
+    assert result["heavy"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_ranker_import_does_not_build_embedder():
+    # get_embedder() is cached, so its cache_info shows whether anything built one while importing
+    _cold_import(
+        "import smart_filtering.cli, smart_filtering.ranker.features\n"
+        "from smart_filtering.embedder.embed import get_embedder\n"
+        "assert get_embedder.cache_info().misses == 0, 'embedder built at import'"
+    )
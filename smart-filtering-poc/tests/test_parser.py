@@ -1,5 +1,7 @@
 from pathlib import Path
 
+import pytest
+
 from docx import Document
 
 from smart_filtering.parser.docx_parser import parse_docx_cv, parse_docx_jd
@@ -96,3 +98,297 @@ def test_parse_docx_jd(tmp_path: Path):
     assert "python" in parsed["must_have"]
     assert parsed["min_total_years"] == 3
     assert parsed["weights"]["skill_semantic"] == 0.5
+
+
+def test_load_docx_files_parallel_keeps_order_and_collects_errors(tmp_path: Path):
+    from smart_filtering.parser.loader import list_docx, load_docx_files
+
+    paths = []
+    for n in range(5):
+        folder = tmp_path / f"cv_{n}"
+        folder.mkdir()
+        path = _write_cv_docx(folder)
+        target = tmp_path / f"cv_{n}.docx"
+        path.rename(target)
+        paths.append(target)
+    broken = tmp_path / "cv_2_broken.docx"
+    broken.write_bytes(b"not a zip")
+    (tmp_path / "~$cv_lock.docx").write_bytes(b"")
+
+    listed = list_docx(tmp_path)
+    assert [p.name for p in listed] == sorted(p.name for p in paths + [broken])
+
+    sequential = load_docx_files(listed, kind="cv", workers=1)
+    parallel = load_docx_files(listed, kind="cv", workers=2, chunk_size=2)
+    assert parallel.records == sequential.records
+    assert len(parallel) == 5
+    assert [path for path, _ in parallel.errors] == [str(broken)]
+    assert parallel.records[0] == parse_docx_cv(str(paths[0]))
+
+
+def test_parse_cache_reparses_only_new_or_changed_files(tmp_path: Path, monkeypatch):
+    import os
+
+    from smart_filtering.parser import loader
+    from smart_filtering.parser.cache import ParseCache
+
+    cv_dir = tmp_path / "cvs"
+    cv_dir.mkdir()
+    first = _write_cv_docx(cv_dir)
+    second = cv_dir / "cv_second.docx"
+    second.write_bytes(first.read_bytes())
+    cache_dir = tmp_path / "parse_cache"
+
+    cold = loader.load_docx_dir(cv_dir, cache_dir=cache_dir)
+    assert (len(cold), cold.cached) == (2, 0)
+
+    # Warm start: python-docx is never reached, even for a touched-but-identical file
+    def fail(path):
+        raise AssertionError(f"{path} should come from the parse cache")
+
+    monkeypatch.setattr(loader, "read_docx_paragraphs", fail)
+    stat = first.stat()
+    os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    warm = loader.load_docx_dir(cv_dir, cache_dir=cache_dir)
+    assert warm.records == cold.records
+    assert warm.cached == 2
+    monkeypatch.undo()
+
+    # A deleted file is evicted; a rewritten one is parsed again
+    second.unlink()
+    doc = Document(str(first))
+    doc.paragraphs[1].text = "Name: Renamed User"
+    doc.save(str(first))
+    updated = loader.load_docx_dir(cv_dir, cache_dir=cache_dir)
+    assert (len(updated), updated.cached) == (1, 0)
+    assert updated.records[0]["name"] == "Renamed User"
+    assert len(ParseCache(cache_dir)) == 1
+
+
+def test_parse_cache_keeps_cv_and_jd_records_of_the_same_bytes(tmp_path: Path):
+    from smart_filtering.parser.cache import ParseCache
+
+    path = _write_cv_docx(tmp_path)
+    cache_dir = tmp_path / "parse_cache"
+    cache = ParseCache(cache_dir)
+    cache.put(str(path), "cv", {"id": "CV-1", "kind": "cv"})
+    cache.put(str(path), "jd", {"id": "JD-1", "kind": "jd"})
+    cache.save()
+
+    reloaded = ParseCache(cache_dir)
+    for kind in ("cv", "jd"):
+        hits, misses = reloaded.lookup([str(path)], kind)
+        assert misses == []
+        assert hits[str(path)]["kind"] == kind
+    assert len(reloaded) == 2
+
+
+def test_fast_docx_reader_matches_python_docx(tmp_path: Path):
+    import zipfile
+
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    from smart_filtering.generator.run_generation import create_cvs_as_docx
+    from smart_filtering.generator.run_jd_generation import JD_ROLES, create_jds_as_docx
+    from smart_filtering.parser.docx_parser import read_docx_paragraphs
+    from smart_filtering.parser.fast_docx import UnsupportedDocx, read_docx_paragraphs_fast
+
+    create_cvs_as_docx(str(tmp_path), num_cvs=20)
+    create_jds_as_docx(str(tmp_path), JD_ROLES)
+
+    # Hand-made corner cases: tabs, line/page breaks, hyperlink runs and a table (not a body paragraph)
+    doc = Document()
+    para = doc.add_paragraph("Id:\tcv_edge")
+    para.add_run().add_break()
+    para.add_run("after break")
+    link = OxmlElement("w:hyperlink")
+    run = OxmlElement("w:r")
+    text = OxmlElement("w:t")
+    text.text = " linked"
+    run.append(text)
+    link.append(run)
+    para._p.append(link)
+    doc.add_paragraph("")
+    page = doc.add_paragraph("before page")
+    br = OxmlElement("w:br")
+    br.set(qn("w:type"), "page")
+    page.runs[0]._r.append(br)
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "inside table"
+    doc.add_paragraph("Ünïcode — ñ & <tags>")
+    doc.save(str(tmp_path / "edge.docx"))
+
+    paths = sorted(tmp_path.glob("*.docx"))
+    assert len(paths) > 20
+    for path in paths:
+        expected = [p.text for p in Document(str(path)).paragraphs]
+        assert read_docx_paragraphs_fast(str(path)) == expected, path.name
+    edge = read_docx_paragraphs_fast(str(tmp_path / "edge.docx"))
+    assert edge[0] == "Id:\tcv_edge\nafter break linked"
+    assert "inside table" not in edge
+
+    # An unusual package (a .dotx main part) is left to python-docx, which reports the real error
+    odd = tmp_path / "odd.docx"
+    with zipfile.ZipFile(tmp_path / "edge.docx") as src, zipfile.ZipFile(odd, "w") as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == "[Content_Types].xml":
+                data = data.replace(b"document.main+xml", b"template.main+xml")
+            dst.writestr(item, data)
+    with pytest.raises(UnsupportedDocx):
+        read_docx_paragraphs_fast(str(odd))
+    with pytest.raises(ValueError, match="not a Word file"):
+        read_docx_paragraphs(str(odd))
+
+
+def test_fast_docx_fallback_is_limited_to_unreadable_packages(tmp_path: Path, monkeypatch):
+    from docx.opc.exceptions import PackageNotFoundError
+
+    from smart_filtering.parser import docx_parser
+
+    not_zip = tmp_path / "not_zip.docx"
+    not_zip.write_bytes(b"not a zip")
+    with pytest.raises(PackageNotFoundError):  # BadZipFile in the fast reader, python-docx reports it
+        docx_parser.read_docx_paragraphs(str(not_zip))
+
+    def buggy(source):
+        raise AttributeError("bug in the fast reader")
+
+    monkeypatch.setattr(docx_parser, "read_docx_paragraphs_fast", buggy)
+    with pytest.raises(AttributeError, match="bug in the fast reader"):
+        docx_parser.read_docx_paragraphs(str(not_zip))
+
+
+def test_section_tokenizer_cuts_regular_and_irregular_layouts():
+    from smart_filtering.parser.docx_parser import parse_cv_paragraphs
+    from smart_filtering.parser.sections import tokenize_sections
+
+    edge = [
+        "Id: cv_edge", "Title : QA ", "### Skills ### python: advanced", "SQL:basic",
+        "### Experience ###", "Role: QA", "Company: A---B", "--", "Skills: py, SQL", "----", "Role: Dev",
+        "### Education ###", "  ", "BSc", "### Education ###", "MSc",
+    ]
+    parsed = parse_cv_paragraphs(edge)
+    assert parsed["id"] == "cv_edge" and parsed["title"] == "QA"
+    assert parsed["skills"] == {"python": "advanced", "sql": "basic"}
+    assert [exp.get("company") for exp in parsed["experiences"]] == ["A", None, None]
+    assert parsed["education"] == ["MSc"]
+
+    # A marker split over two lines and an unclosed one take the re.split cut of the same tokenizer
+    irregular = ["Id: cv_odd", "### Skills", "###", "python: advanced", "### Languages ###", "es: native", "### x"]
+    assert tokenize_sections(irregular) == [
+        (None, ["Id: cv_odd", ""]),
+        ("skills", ["", "python: advanced", ""]),
+        ("languages", ["", "es: native", "### x"]),
+    ]
+    parsed = parse_cv_paragraphs(irregular)
+    assert parsed["id"] == "cv_odd"
+    assert parsed["skills"] == {"python": "advanced"}
+    assert parsed["languages"] == {"es": "native"}
+
+
+def test_jd_sections_repeat_and_ignore_inline_markers():
+    from smart_filtering.parser.docx_parser import parse_jd_paragraphs
+
+    parsed = parse_jd_paragraphs([
+        " Id: jd_x ", "Role: QA", "", "### Must Have ###", "python, sql", "### Description ###", "first",
+        "### must have###", "go", "C### is not a marker", "### Description ###", "second",
+        "### Weights ###", "skill_semantic: 0.5", "no colon here",
+    ])
+    assert (parsed["id"], parsed["role"]) == ("jd_x", "QA")
+    assert parsed["must_have"] == ["python", "sql", "go", "C### is not a marker"]
+    assert parsed["description"] == "first second"
+    assert parsed["weights"] == {"skill_semantic": 0.5}
+
+
+def test_load_docx_archive_matches_folder_without_extracting(tmp_path: Path, monkeypatch):
+    import tarfile
+    import zipfile
+
+    from smart_filtering.generator.run_generation import create_cvs_as_docx
+    from smart_filtering.parser import loader
+
+    cv_dir = tmp_path / "cvs"
+    cv_dir.mkdir()
+    create_cvs_as_docx(str(cv_dir), num_cvs=6)
+    (cv_dir / "cv_broken.docx").write_bytes(b"not a zip")
+    from_dir = loader.load_docx_dir(cv_dir, workers=1)
+    assert len(from_dir) >= 6 and len(from_dir.errors) == 1
+
+    zip_path = tmp_path / "cvs.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for path in sorted(cv_dir.glob("*.docx"), reverse=True):
+            archive.write(path, f"batch/{path.name}")
+        archive.writestr("batch/~$lock.docx", b"")
+        archive.writestr("__MACOSX/batch/._cv.docx", b"")
+        archive.writestr("batch/notes.txt", b"ignored")
+    tar_path = tmp_path / "cvs.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as archive:
+        for path in sorted(cv_dir.glob("*.docx")):
+            archive.add(path, arcname=path.name)
+
+    broken_members = {zip_path: f"{zip_path}!batch/cv_broken.docx", tar_path: f"{tar_path}!cv_broken.docx"}
+    for archive_path, broken in broken_members.items():
+        sequential = loader.load_docx_source(archive_path, workers=1)
+        parallel = loader.load_docx_archive(archive_path, workers=2, chunk_size=2)
+        assert sequential.records == parallel.records == from_dir.records
+        assert [path for path, _ in parallel.errors] == [broken]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cvs", "cvs.tar.gz", "cvs.zip"]
+
+    # Cached by member content: a warm start only retries the broken member, removed members are evicted
+    cache_dir = tmp_path / "parse_cache"
+    cold = loader.load_docx_archive(zip_path, cache_dir=cache_dir)
+    read = []
+    real_read = loader.read_docx_paragraphs
+    monkeypatch.setattr(loader, "read_docx_paragraphs", lambda source: read.append(source) or real_read(source))
+    warm = loader.load_docx_archive(zip_path, cache_dir=cache_dir)
+    assert read == [b"not a zip"]
+    assert (warm.records, warm.cached) == (cold.records, len(from_dir))
+    monkeypatch.undo()
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.write(sorted(cv_dir.glob("cv_*.docx"))[0], "only.docx")
+    assert loader.load_docx_archive(zip_path, cache_dir=cache_dir).cached == 1
+    assert len(loader.ParseCache(cache_dir)) == 1
+
+
+def test_load_docx_archive_reports_unreadable_members(tmp_path: Path):
+    import tarfile
+    import zipfile
+
+    from smart_filtering.generator.run_generation import create_cvs_as_docx
+    from smart_filtering.parser import loader
+
+    cv_dir = tmp_path / "cvs"
+    cv_dir.mkdir()
+    create_cvs_as_docx(str(cv_dir), num_cvs=3)
+    paths = sorted(cv_dir.glob("*.docx"))
+
+    # Zero the compressed bytes of the middle member: its CRC/deflate check fails, the others still load
+    zip_path = tmp_path / "cvs.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            archive.write(path, path.name)
+    with zipfile.ZipFile(zip_path) as archive:
+        info = archive.getinfo(paths[1].name)
+    raw = bytearray(zip_path.read_bytes())
+    start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    raw[start + 10:start + 200] = bytes(190)
+    zip_path.write_bytes(bytes(raw))
+
+    result = loader.load_docx_archive(zip_path, workers=1)
+    assert [path for path, _ in result.errors] == [f"{zip_path}!{paths[1].name}"]
+    assert len(result) == len(paths) - 1
+
+    # An uncompressed tar is not mistaken for a zip; truncated, it stops at the member it cannot finish reading
+    tar_path = tmp_path / "cvs.tar"
+    with tarfile.open(tar_path, "w") as archive:
+        for path in paths:
+            archive.add(path, arcname=path.name)
+    assert len(loader.load_docx_archive(tar_path, workers=1)) == len(paths)
+    with tarfile.open(tar_path) as archive:
+        cut = archive.getmember(paths[1].name).offset_data + 100
+    tar_path.write_bytes(tar_path.read_bytes()[:cut])
+
+    result = loader.load_docx_archive(tar_path, workers=1)
+    assert [path for path, _ in result.errors] == [f"{tar_path}!{paths[1].name}"]
+    assert len(result) == 1
@@ -0,0 +1,53 @@
+import numpy as np
+
+from smart_filtering.embedder.quantize import compare_rankings, quantization_report, quantize
+from smart_filtering.embedder.vectors import quantize_cv_embeddings
+from smart_filtering.ranker.similarity import cosine_similarity_matrix
+
+
+def _corpus(n: int = 300, dim: int = 32) -> np.ndarray:
+    return np.random.default_rng(1).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_int8_roundtrip_and_zero_rows():
+    corpus = _corpus()
+    corpus[5] = 0.0
+    quantized = quantize(corpus, "int8")
+
+    assert quantized.data.dtype == np.int8
+    assert quantized.nbytes < corpus.nbytes / 3
+    np.testing.assert_allclose(quantized.dequantize(), corpus, atol=float(np.abs(corpus).max()) / 127)
+    assert not quantized.data[5].any()
+    assert cosine_similarity_matrix(quantized.data, corpus[:3])[5].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_quantized_scoring_stays_close_to_float32():
+    corpus = _corpus()
+    queries = corpus[:10] + 0.1
+    for dtype, max_delta in (("float16", 1e-3), ("int8", 2e-2)):
+        report = quantization_report(corpus, queries, dtype, k=10)
+        assert report["max_abs_delta"] < max_delta
+        assert report["top_k_overlap"] >= 0.9
+        assert report["bytes_quantized"] < report["bytes_float32"]
+
+
+def test_compare_rankings_identical_scores():
+    scores = np.linspace(0, 1, 50)
+    report = compare_rankings(scores, scores, k=5)
+    assert report == {"max_abs_delta": 0.0, "mean_abs_delta": 0.0, "top_k_overlap": 1.0, "spearman": 1.0}
+
+
+def test_quantize_cv_embeddings_keeps_cosine():
+    corpus = _corpus(n=6, dim=8)
+    cvs = [
+        {"id": f"cv_{i}", "embeddings": {"model": "m", "skills_vec": corpus[i], "title_vec": corpus[i], "profile_vec": corpus[i]}}
+        for i in range(6)
+    ]
+    quantize_cv_embeddings(cvs, "int8")
+
+    assert cvs[0]["embeddings"]["skills_vec"].dtype == np.int8
+    assert "skills_vec_scale" in cvs[0]["embeddings"]
+    stacked = np.vstack([cv["embeddings"]["skills_vec"] for cv in cvs])
+    np.testing.assert_allclose(
+        cosine_similarity_matrix(stacked, corpus[:2]), cosine_similarity_matrix(corpus, corpus[:2]), atol=2e-2
+    )
@@ -1,38 +1,33 @@
-import importlib
 from types import ModuleType
 from typing import Tuple
 
 import numpy as np
+import pytest
 
 
 def _stub_embedder(monkeypatch) -> Tuple[ModuleType, ModuleType]:
     """
-    Replace SentenceTransformer with a lightweight stub and reload modules
-    so ranker features don't try to load the real model during tests.
+    Replace the SentenceTransformer loader with a lightweight stub and give the
+    ranker a fresh embedder, so features don't try to load the real model.
     """
     from smart_filtering.embedder import embed as embed_mod  # type: ignore
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+    from smart_filtering.ranker import score as score_mod  # type: ignore
 
     class DummySentenceTransformer:
         def __init__(self, *args, **kwargs):
             pass
 
-        def encode(self, texts, convert_to_numpy=True):
+        def encode(self, texts, batch_size=32, convert_to_numpy=True):
             if isinstance(texts, str):
                 return np.zeros((1, 5))
             return np.zeros((len(texts), 5))
 
-    monkeypatch.setattr(embed_mod, "SentenceTransformer", DummySentenceTransformer)
-    importlib.reload(embed_mod)
-
-    # Reload ranker modules so they pick the stubbed embedder
-    from smart_filtering.ranker import features as features_mod  # type: ignore
-    from smart_filtering.ranker import score as score_mod  # type: ignore
-
-    importlib.reload(features_mod)
-    importlib.reload(score_mod)
+    monkeypatch.setattr(embed_mod, "_load_sentence_transformer", lambda model_name: DummySentenceTransformer())
 
-    # Inject a stub embedder instance on the reloaded features module
-    features_mod.embedder = embed_mod.get_embedder()
+    # Inject a stub embedder instance (no disk store) on the features module
+    stub = embed_mod.Embedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: stub)
     return features_mod, score_mod
 
 
@@ -92,3 +87,390 @@ def test_score_penalizes_missing_must_have(monkeypatch):
 
     assert result_missing["features"]["must_have_coverage"] == 0
     assert result_missing["score"] < 0.5
+
+
+class _CountingEmbedder:
+    """Deterministic non-zero embeddings that also count encode calls."""
+
+    model_name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_text(self, texts, batch_size=None):
+        if isinstance(texts, str):
+            texts = [texts]
+        self.calls += 1
+        return np.array([[len(t), t.count("a") + 1, t.count("e") + 1, t.count(" ") + 1] for t in texts], dtype=float)
+
+
+def test_extract_features_batch_matches_single(monkeypatch):
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    jd = _sample_jd()
+    cvs = [_sample_cv() for _ in range(3)]
+    cvs[1]["title"] = "Project Manager"
+    cvs[2]["skills"] = {}
+
+    single = [features_mod.extract_features(cv, jd) for cv in cvs]
+    fake.calls = 0
+    batch = features_mod.extract_features_batch(cvs, jd)
+
+    assert batch == [pytest.approx(f) for f in single]
+    assert fake.calls == 2  # role query + one batch of titles; skills come from the skill table
+
+
+def test_precomputed_jd_vectors_are_reused(monkeypatch):
+    from smart_filtering.embedder.vectors import attach_jd_embeddings
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    cvs = [_sample_cv(), _sample_cv()]
+    expected = features_mod.extract_features_batch(cvs, _sample_jd())
+
+    jd = attach_jd_embeddings(_sample_jd(), embedder=fake)
+    fake.calls = 0
+    batch = features_mod.extract_features_batch(cvs, jd)
+
+    assert batch == [pytest.approx(f) for f in expected]
+    assert fake.calls == 1  # only the CV titles are encoded
+    assert features_mod.extract_features(cvs[0], jd) == pytest.approx(expected[0])
+
+
+def test_precomputed_cv_vectors_are_reused(monkeypatch):
+    from smart_filtering.embedder.vectors import attach_cv_embeddings, attach_jd_embeddings
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    cvs = [_sample_cv(), _sample_cv()]
+    cvs[1]["skills"] = {}
+    expected = features_mod.extract_features_batch(cvs, _sample_jd())
+
+    jd = attach_jd_embeddings(_sample_jd(), embedder=fake)
+    attach_cv_embeddings(cvs, embedder=fake)
+    fake.calls = 0
+
+    assert features_mod.extract_features_batch(cvs, jd) == [pytest.approx(f) for f in expected]
+    assert [features_mod.extract_features(cv, jd) for cv in cvs] == [pytest.approx(f) for f in expected]
+    assert fake.calls == 0  # pure vector math
+
+
+def test_title_role_memo_matches_pairwise(monkeypatch):
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    cvs = [_sample_cv() for _ in range(6)]
+    for cv, title in zip(cvs, ["Data Engineer", "Project Manager", "Data Engineer", "", "QA", "QA"]):
+        cv["title"] = title
+    jds = [_sample_jd(), dict(_sample_jd(), role="Project Manager"), _sample_jd()]
+
+    fake.calls = 0
+    matrix = features_mod.title_role_similarity_matrix(cvs, jds)
+    assert fake.calls == 2  # distinct titles and distinct roles, one batch each
+    expected = [[features_mod.get_semantic_similarity(cv["title"], jd["role"]) for jd in jds] for cv in cvs]
+    np.testing.assert_allclose(matrix, expected, atol=1e-12)
+
+
+def test_similarity_matrix_matches_pairwise_and_zero_guard():
+    from smart_filtering.ranker.similarity import cosine_similarity_matrix
+
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=(7, 5))
+    a[3] = 0.0  # offline-style zero vector
+    b = rng.normal(size=(4, 5))
+
+    full = cosine_similarity_matrix(a, b)
+    chunked = cosine_similarity_matrix(a, b, memory_budget_mb=1e-4)  # forces one row per chunk
+
+    expected = np.array(
+        [[0.0 if not a[i].any() else a[i] @ b[j] / (np.linalg.norm(a[i]) * np.linalg.norm(b[j])) for j in range(4)] for i in range(7)]
+    )
+    np.testing.assert_allclose(full, expected, atol=1e-12)
+    np.testing.assert_allclose(chunked, full, atol=1e-12)
+    assert (full[3] == 0.0).all()
+
+
+@pytest.mark.parametrize("embedder_mode", ["", "offline"])
+def test_calculate_scores_batch_matches_scalar(monkeypatch, embedder_mode):
+    import random
+
+    from smart_filtering.generator.cv_generator import generate_cv
+    from smart_filtering.generator.jd_generator import generate_jd
+    from smart_filtering.ranker import compiled as compiled_mod  # type: ignore
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+    from smart_filtering.ranker import score as score_mod  # type: ignore
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    monkeypatch.setattr(compiled_mod, "EMBEDDER_MODE", embedder_mode)
+    random.seed(7)
+    cvs = [generate_cv(target_role=role) for role in ["Data Engineer", "Project Manager", "QA Engineer"] * 20]
+    cvs[0]["skills"] = {}
+    cvs[1]["education"] = []
+    cvs[2]["experience_years_total"] = 0
+    cvs.append(_sample_cv())
+
+    onsite = generate_jd("Data Engineer")
+    onsite["location_policy"] = {"type": "on-site", "city": "Madrid", "max_km": 20}
+    onsite["min_skill_years"] = {"python": 2, "docker": 1}
+    jds = [onsite, generate_jd("Project Manager"), dict(_sample_jd(), min_total_years=0)]
+    skill_weights = {"python": 3, "SQL": 0.7, "excel": 0, "docker": 1.3}
+
+    for jd in jds:
+        features = features_mod.extract_features_batch(cvs, jd)
+        for weights, strength in [(None, 0.0), (skill_weights, 0.25)]:
+            batch = score_mod.calculate_scores_batch(cvs, jd, weights, strength, features=features)
+            for i, (cv, feats) in enumerate(zip(cvs, features)):
+                expected = score_mod.calculate_score(cv, jd, weights, strength, features=feats)
+                assert score_mod.score_details(batch, i, feats) == expected
+                assert batch["ko"][i] == (expected["ko_reason"] is not None)
+    assert batch["ko"].any() and not batch["ko"].all()
+    assert len(score_mod.calculate_scores_batch([], jd)) == 0
+
+
+def test_builtin_sum_replay_is_exact():
+    from smart_filtering.ranker.score import _builtin_sum
+
+    rng = np.random.default_rng(3)
+    columns = [rng.normal(scale=10.0 ** rng.integers(-8, 8), size=500) for _ in range(7)]
+    expected = [sum(values) for values in zip(*(column.tolist() for column in columns))]
+    assert _builtin_sum(columns).tolist() == expected
+
+
+def test_compiled_jd_hoists_per_cv_work(monkeypatch):
+    from smart_filtering.ranker import compiled as compiled_mod  # type: ignore
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+    from smart_filtering.ranker import score as score_mod  # type: ignore
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    jd = dict(_sample_jd(), must_have=["Python", "py", "docker"], min_skill_years={"SQL": 1})
+    jd["location_policy"] = {"type": "hybrid", "city": "Madrid", "max_km": 30}
+    cvs = [_sample_cv() for _ in range(4)]
+    cvs[1]["skills"]["docker"] = "basic"
+    cvs[2]["location"] = {"city": "Madrid", "country": "ES", "lat": 40.42, "lon": -3.70}
+    skill_weights = {"Python": 2.0, "docker": 1.0}
+
+    uncompiled = features_mod.extract_features_batch(cvs, jd)
+    expected = [score_mod.calculate_score(cv, jd, skill_weights, 0.3, features=f) for cv, f in zip(cvs, uncompiled)]
+
+    compiled = compiled_mod.CompiledJD(jd, skill_weights, 0.3)
+    assert compiled.must_have == [("Python", "python"), ("py", "python"), ("docker", "docker")]
+    assert compiled.city_coords is not None and compiled.total_skill_weight == 3.0
+
+    # With the compiled JD nothing is canonicalized per CV any more
+    def fail(name):
+        raise AssertionError(f"get_canonical_skill({name!r}) called per CV")
+
+    monkeypatch.setattr(compiled_mod, "get_canonical_skill", fail)
+    features = features_mod.extract_features_batch(cvs, jd, compiled=compiled)
+    assert [score_mod.calculate_score(cv, jd, features=f, compiled=compiled) for cv, f in zip(cvs, features)] == expected
+    batch = score_mod.calculate_scores_batch(cvs, jd, features=features, compiled=compiled)
+    assert [score_mod.score_details(batch, i, f) for i, f in enumerate(features)] == expected
+    assert features == uncompiled
+    assert [e["features"]["location_match_score"] for e in expected] == [0.0, 0.0, 1.0, 0.0]
+    assert [e["ko_reason"] for e in expected] == ["Faltan must-have: docker", None, "Faltan must-have: docker", "Faltan must-have: docker"]
+
+
+def test_skill_matrix_ids_are_stable_and_grow(monkeypatch):
+    from smart_filtering.normalizer import skills_taxonomy
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+    from smart_filtering.ranker import skill_matrix as matrix_mod  # type: ignore
+    from smart_filtering.ranker.compiled import CompiledJD
+
+    vocabulary = matrix_mod.SkillVocabulary(skills_taxonomy.SKILL_TAXONOMY)
+    assert vocabulary.skills[:3] == ["python", "pyspark", "sql"]
+    cvs = [_sample_cv(), dict(_sample_cv(), skills={"docker": "basic", "cobol": "advanced"}), dict(_sample_cv(), skills={})]
+    matrix = matrix_mod.SkillMatrix.from_cvs(cvs, vocabulary)
+    cobol = vocabulary.id_of("cobol")
+    assert cobol == len(skills_taxonomy.SKILL_TAXONOMY) and matrix.width == cobol + 1
+
+    # New taxonomy skills and unseen CV skills get new ids; old ids and rows are untouched
+    monkeypatch.setitem(skills_taxonomy.SKILL_TAXONOMY, "rust", {"category": "programming", "synonyms": []})
+    matrix.append([dict(_sample_cv(), skills={"rust": "basic", "fortran": "basic", "python": "advanced"})])
+    assert vocabulary.id_of("cobol") == cobol and vocabulary.skills[cobol + 1:] == ["rust", "fortran"]
+    assert matrix.rows.shape == (4, cobol + 3)
+    assert matrix.membership(["python", "cobol", "rust", "python", "unknown"]).tolist() == [
+        [True, False, False, True, False],
+        [False, True, False, False, False],
+        [False, False, False, False, False],
+        [True, False, True, True, False],
+    ]
+    assert matrix.count(["python", "py", "rust"]).tolist() == [1, 0, 0, 2]
+
+    # Coverage columns match the per-CV dict lookups
+    cvs = [dict(_sample_cv(), skills=skills) for skills in ({}, {"python": 1}, {"python": 1, "docker": 1, "sql": 1})]
+    jd = dict(_sample_jd(), must_have=["python", "py", "docker"], min_skill_years={"SQL": 2, "python": 1})
+    compiled = CompiledJD(jd)
+    expected = [features_mod._skill_coverage(cv, compiled) for cv in cvs]
+    assert features_mod._skill_coverage_batch(matrix_mod.SkillMatrix.from_cvs(cvs), compiled) == expected
+    assert expected[1] == (0, 2 / 3, 0.5)
+
+
+def test_skill_index_retrieves_exactly_the_must_have_passes(monkeypatch, tmp_path):
+    from smart_filtering.ranker import skill_index as index_mod  # type: ignore
+    from smart_filtering.ranker.compiled import CompiledJD
+    from smart_filtering.ranker.skill_matrix import SkillMatrix
+
+    _, score_mod = _stub_embedder(monkeypatch)
+    pool = ({}, {"python": 1}, {"python": 1, "docker": 1}, {"docker": 1}, {"docker": 1, "sql": 1, "python": 1})
+    cvs = [dict(_sample_cv(), id=f"cv_{i}", skills=skills) for i, skills in enumerate(pool)]
+    index = index_mod.SkillIndex.build(cvs)
+    assert index.posting_list("python").tolist() == [1, 2, 4] and index.posting_list("cobol").size == 0
+
+    # Survivors are exactly the CVs the scorer does not knock out for missing must-haves
+    for must_have in ([], ["python"], ["Python", "docker"], ["py", "docker", "SQL"], ["cobol"]):
+        compiled = CompiledJD(dict(_sample_jd(), must_have=must_have, min_total_years=0))
+        docs = index_mod.must_have_candidates(index, compiled)
+        batch = score_mod.calculate_scores_batch(cvs, compiled.jd, compiled=compiled)
+        no_ko = [i for i, reason in enumerate(batch["ko_reason"]) if "must-have" not in (reason or "")]
+        assert docs.tolist() == no_ko
+        matrix = SkillMatrix.from_cvs(cvs).take(docs)
+        assert matrix.rows.tolist() == SkillMatrix.from_cvs([cvs[i] for i in no_ko]).rows.tolist()
+
+    # Persisted next to the corpus; reused only for the same corpus
+    path = tmp_path / index_mod.SKILL_INDEX_FILE
+    index_mod.load_or_build_skill_index(cvs, path)
+    loaded = index_mod.SkillIndex.load(path, index_mod.corpus_fingerprint(cvs))
+    assert loaded.skills == index.skills and loaded.cv_ids.tolist() == [cv["id"] for cv in cvs]
+    assert loaded.intersect(["python", "docker"]).tolist() == [2, 4]
+    assert index_mod.SkillIndex.load(path, index_mod.corpus_fingerprint(cvs[1:])) is None
+    assert len(index_mod.load_or_build_skill_index(cvs[1:], path)) == 4
+
+
+def _assert_same_scores(actual, expected):
+    """
+    Score rows and feature dicts from a subset of the pool against the full
+    pool: ranking fields exactly, similarity-derived floats up to the last bit
+    (BLAS may sum a row differently with the rows around it).
+    """
+    from smart_filtering.ranker.score import SCORE_COMPONENTS  # type: ignore
+
+    for field in ("score", "ko", "ko_reason", "reason"):
+        assert actual[field].tolist() == expected[field].tolist()
+    for field in SCORE_COMPONENTS:
+        np.testing.assert_allclose(actual[field], expected[field], rtol=0, atol=1e-12)
+
+
+def _assert_same_features(actual, expected):
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got.keys() == want.keys()
+        for key, value in want.items():
+            if isinstance(value, float):
+                assert got[key] == pytest.approx(value, rel=0, abs=1e-12), key
+            else:
+                assert got[key] == value, key
+
+
+def test_rank_top_k_equals_full_sort(monkeypatch):
+    import random
+
+    from smart_filtering.generator.cv_generator import generate_cv
+    from smart_filtering.generator.jd_generator import generate_jd
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+    from smart_filtering.ranker import score as score_mod  # type: ignore
+    from smart_filtering.ranker import topk as topk_mod  # type: ignore
+    from smart_filtering.ranker.compiled import CompiledJD
+    from smart_filtering.ranker.topk import rank_top_k
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    featurized = []
+    real_extract = topk_mod.extract_features_batch
+    monkeypatch.setattr(
+        topk_mod,
+        "extract_features_batch",
+        lambda block, *args, **kwargs: featurized.extend(map(id, block)) or real_extract(block, *args, **kwargs),
+    )
+    random.seed(11)
+    cvs = [generate_cv(target_role=role) for role in ["Data Engineer", "Project Manager", "QA Engineer"] * 30]
+    cvs += [_sample_cv(), _sample_cv()]  # identical CVs: ties keep corpus order
+
+    onsite = dict(generate_jd("Data Engineer"), location_policy={"type": "on-site", "city": "Madrid", "max_km": 20})
+    evaluated = []
+    for jd in [onsite, generate_jd("QA Engineer"), _sample_jd()]:
+        compiled = CompiledJD(jd, {"python": 2, "SQL": 1}, 0.25)
+        features = features_mod.extract_features_batch(cvs, jd, compiled=compiled)
+        batch = score_mod.calculate_scores_batch(cvs, jd, features=features, compiled=compiled)
+        assert (score_mod.score_upper_bounds(cvs, compiled) >= batch["score"]).all()
+        ranked = sorted(range(len(cvs)), key=lambda i: batch["score"][i], reverse=True)
+
+        knocked_out = {id(cvs[i]) for i in np.flatnonzero(batch["ko"]).tolist()}
+        for k, exclude_ko in [(1, False), (10, False), (10, True), (200, True), (200, False)]:
+            featurized.clear()
+            prepared = []
+            top = rank_top_k(
+                cvs, jd, k, compiled=compiled, exclude_ko=exclude_ko, block_size=8,
+                prepare=lambda block, prepared=prepared: prepared.extend(map(id, block)),
+            )
+            assert prepared == featurized  # prepare (on-demand embedding) sees only the scored CVs
+            if exclude_ko:
+                # Knocked-out CVs are filtered before bounding, so none of them is featurized
+                assert not knocked_out & set(featurized)
+            expected = [i for i in ranked if not (exclude_ko and batch["ko"][i])][:k]
+            assert top.docs.tolist() == expected
+            _assert_same_scores(top.batch, batch[expected])
+            _assert_same_features(top.features, [features[i] for i in expected])
+            evaluated.append(top.evaluated)
+    assert min(evaluated) < len(cvs)  # the bound did discard CVs without scoring them
+    assert len(rank_top_k(cvs, _sample_jd(), 0)) == 0
+
+
+def test_rank_cascade_stages(monkeypatch):
+    import random
+
+    from smart_filtering.generator.cv_generator import generate_cv
+    from smart_filtering.generator.jd_generator import generate_jd
+    from smart_filtering.ranker import cascade as cascade_mod  # type: ignore
+    from smart_filtering.ranker import features as features_mod  # type: ignore
+    from smart_filtering.ranker import score as score_mod  # type: ignore
+    from smart_filtering.ranker.compiled import CompiledJD
+    from smart_filtering.ranker.skill_matrix import SkillMatrix
+
+    fake = _CountingEmbedder()
+    monkeypatch.setattr(features_mod, "get_embedder", lambda: fake)
+    random.seed(5)
+    cvs = [generate_cv(target_role=role) for role in ["Data Engineer", "Project Manager", "QA Engineer"] * 20]
+    jd = dict(generate_jd("Data Engineer"), location_policy={"type": "on-site", "city": "Madrid", "max_km": 20})
+    compiled = CompiledJD(jd, {"python": 2}, 0.25)
+    matrix = SkillMatrix.from_cvs(cvs)
+    features = features_mod.extract_features_batch(cvs, jd, compiled=compiled)
+    batch = score_mod.calculate_scores_batch(cvs, jd, features=features, compiled=compiled)
+    ranked = sorted(range(len(cvs)), key=lambda i: batch["score"][i], reverse=True)
+
+    # Without cuts the cascade is the full ranking; the KO mask matches the scorer's KO
+    result = cascade_mod.rank_cascade(cvs, jd, top_m=0, top_k=0, explain=False, compiled=compiled)
+    assert result.docs.tolist() == ranked
+    _assert_same_scores(result.batch, batch[ranked])
+    assert result.explanations is None and list(result.timings) == ["rules", "semantic"]
+    assert score_mod.rule_ko_mask(cvs, compiled, matrix).tolist() == batch["ko"].tolist()
+    passing = cascade_mod.rank_cascade(cvs, jd, top_m=0, top_k=0, explain=False, compiled=compiled, exclude_ko=True)
+    assert passing.docs.tolist() == [i for i in ranked if not batch["ko"][i]]
+
+    # Only the rule top-M reach the semantic stage; explanations for the top-K
+    rule_score = score_mod.rule_scores(cvs, compiled, matrix)
+    top_m = sorted(range(len(cvs)), key=lambda i: rule_score[i], reverse=True)[:15]
+    fake.calls = 0
+    prepared = []
+    result = cascade_mod.rank_cascade(
+        cvs, jd, top_m=15, top_k=5, compiled=compiled, skill_matrix=matrix, prepare=prepared.extend
+    )
+    assert sorted(map(id, prepared)) == sorted(id(cvs[i]) for i in top_m)  # only the top-M get embedded
+    assert result.sizes == {"rules": len(cvs), "semantic": 15, "explain": 5}
+    assert result.docs.tolist() == [i for i in ranked if i in top_m][:5]
+    _assert_same_features(result.features, [features[i] for i in result.docs.tolist()])
+    assert len(result.explanations) == 5 and result.explanations[0].startswith("**Análisis de Candidato")
+    assert list(result.timings) == list(cascade_mod.STAGES) and fake.calls <= 2
+
+    # None falls back to ranking.cascade in the config
+    monkeypatch.setattr(cascade_mod, "DEFAULT_TOP_M", 10)
+    monkeypatch.setattr(cascade_mod, "DEFAULT_TOP_K", 3)
+    monkeypatch.setattr(cascade_mod, "DEFAULT_EXPLAIN", False)
+    result = cascade_mod.rank_cascade(cvs, jd, compiled=compiled)
+    assert result.sizes == {"rules": len(cvs), "semantic": 10} and len(result) == 3